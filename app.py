@@ -5,9 +5,12 @@ HabitStack - Flask backend with Tailwind CSS frontend
 import os
 from flask import Flask, render_template, redirect, url_for, Blueprint
 from datetime import datetime
-from database import init_db
+from database import init_db, init_app as init_db_app
 from models import Habit
 from utils import get_current_user
+from utils.sql_profiler import sql_profiler
+from maintenance import maintenance_scheduler
+from news_refresher import news_refresher
 
 # Import blueprints
 from auth import auth_bp
@@ -19,11 +22,24 @@ from birthdays import birthdays_bp
 from watchlist import watchlist_bp
 from sports import sports_bp
 from settings import settings_bp
+from monitoring import monitoring_bp
 
 # Flask app setup
 app = Flask(__name__, static_url_path='/habitstack/static')
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
 
+# Share one pooled connection per request
+init_db_app(app)
+
+# Profile a sample of requests' SQL (SQL_PROFILE_SAMPLE_RATE, off by default)
+sql_profiler.init_app(app)
+
+# WAL checkpoints and idle-time incremental vacuum (MAINTENANCE_ENABLED=0 turns them off)
+maintenance_scheduler.init_app(app)
+
+# Keep the sports news cache fresh in the background (NEWS_REFRESHER=0 fetches on Refresh instead)
+news_refresher.init_app(app)
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(habits_bp)
@@ -34,6 +50,7 @@ app.register_blueprint(birthdays_bp)
 app.register_blueprint(watchlist_bp)
 app.register_blueprint(sports_bp)
 app.register_blueprint(settings_bp)
+app.register_blueprint(monitoring_bp)
 
 # Create main blueprint for dashboard and landing
 main_bp = Blueprint('main', __name__)
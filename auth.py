@@ -2,19 +2,25 @@
 Authentication routes and handlers for HabitStack
 """
 
+import logging
+import time
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from models import User
 from utils import validate_password_strength
 from utils.encryption import encryption_manager
+from utils.key_derivation import key_derivation_pool, KeyDerivationBusy
 from utils.preferences import preference_manager
 from database import get_db
 
 # Create authentication blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/habitstack')
 
+logger = logging.getLogger(__name__)
+
 
 def setup_user_encryption_key(user_id: int, password: str):
-    """Set up encryption key in session after login"""
+    """Set up encryption key in session after login.
+    Raises KeyDerivationBusy when the key derivation pool is saturated."""
     try:
         with get_db() as conn:
             user = conn.execute("SELECT encryption_salt FROM users WHERE id = ?", 
@@ -28,14 +34,16 @@ def setup_user_encryption_key(user_id: int, password: str):
                 conn.commit()
             else:
                 salt = user['encryption_salt']
+        
+        # Derive on the bounded pool and store encryption key in session
+        encryption_key = key_derivation_pool.derive_key(password, salt)
+        session['encryption_key'] = encryption_key
+        
+        # Apply smart defaults for any new fields
+        preference_manager.apply_smart_defaults(user_id)
             
-            # Derive and store encryption key in session
-            encryption_key = encryption_manager.derive_encryption_key(password, salt)
-            session['encryption_key'] = encryption_key
-            
-            # Apply smart defaults for any new fields
-            preference_manager.apply_smart_defaults(user_id)
-            
+    except KeyDerivationBusy:
+        raise
     except Exception as e:
         # Log error but don't break login
         print(f"Error setting up encryption key: {e}")
@@ -48,18 +56,29 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        user = User.authenticate(username, password)
-        if user:
-            session['user_id'] = user['id']
-            session['username'] = user['username']
+        started = time.perf_counter()
+        try:
+            user = User.authenticate(username, password)
+            authenticated = time.perf_counter()
             
-            # Setup encryption key for this session
-            setup_user_encryption_key(user['id'], password)
-            
-            flash('Welcome back!', 'success')
-            return redirect(url_for('main.dashboard'))
-        else:
-            flash('Invalid username or password', 'error')
+            if user:
+                # Setup encryption key for this session
+                setup_user_encryption_key(user['id'], password)
+                logger.info(
+                    "login user=%s auth_ms=%.1f key_ms=%.1f",
+                    user['id'], (authenticated - started) * 1000,
+                    (time.perf_counter() - authenticated) * 1000
+                )
+                
+                session['user_id'] = user['id']
+                session['username'] = user['username']
+                flash('Welcome back!', 'success')
+                return redirect(url_for('main.dashboard'))
+            else:
+                flash('Invalid username or password', 'error')
+        except KeyDerivationBusy:
+            session.pop('encryption_key', None)
+            flash('The server is busy right now. Please try logging in again in a moment.', 'error')
     
     return render_template('login.html')
 
@@ -89,7 +108,12 @@ def signup():
             session['username'] = username
             
             # Setup encryption key for new user
-            setup_user_encryption_key(user_id, password)
+            try:
+                setup_user_encryption_key(user_id, password)
+            except KeyDerivationBusy:
+                session.clear()
+                flash('Account created, but the server is busy. Please log in in a moment.', 'info')
+                return redirect(url_for('auth.login'))
             
             flash('Account created successfully! Welcome to HabitStack!', 'success')
             return redirect(url_for('main.dashboard'))
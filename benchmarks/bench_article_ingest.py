@@ -0,0 +1,124 @@
+"""
+Microbenchmark: saving a refresh's articles into a growing sports news cache
+
+For several cache sizes, saves a refresh of 40 articles (half of them already
+cached) the previous way, one INSERT OR IGNORE per article on a table deduped
+by UNIQUE(title, source), and through SportsNews.ingest_articles, one
+executemany per source on the 8-byte content_hash index. Also reports the
+size of each dedup index where SQLite was built with the dbstat table.
+
+Usage: uv run python benchmarks/bench_article_ingest.py [rounds]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+database.init_db()
+
+from models.sports import SportsNews, article_hash
+
+SOURCES = ['BBC Sport', 'Sky Sports', 'Goal.com', 'Reddit r/soccer']
+
+
+def article(i: int) -> dict:
+    source = SOURCES[i % len(SOURCES)]
+    return {
+        'title': f"Club {i} agree fee with rivals to sign midfielder {i} on a long-term transfer deal",
+        'link': f"https://news.example/{source.split()[0].lower()}/football/transfer-news/{i}",
+        'source': source,
+        'published': 'Recent',
+        'summary': 'Summary text ' * 10
+    }
+
+
+def legacy_save(conn, articles: list) -> int:
+    """The previous save_articles loop against the old UNIQUE(title, source) table"""
+    saved = 0
+    for a in articles:
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO legacy_news (title, link, source, published, summary)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (a['title'], a['link'], a['source'], a['published'], a['summary']))
+        saved += cursor.rowcount
+    conn.commit()
+    return saved
+
+
+def index_kb(conn, name: str):
+    try:
+        pages = conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = ?", (name,)).fetchone()[0]
+    except Exception:
+        return None
+    return pages * conn.execute("PRAGMA page_size").fetchone()[0] / 1024
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    with database.get_db() as conn:
+        conn.execute('''
+            CREATE TABLE legacy_news (
+                id INTEGER PRIMARY KEY, title TEXT NOT NULL, link TEXT, source TEXT NOT NULL,
+                published TEXT, summary TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(title, source)
+            )
+        ''')
+        conn.commit()
+
+    cached = 0
+    print(f"refreshes of 40 articles (20 new), best of {rounds}")
+    for size in (1_000, 10_000, 50_000):
+        # Grow both caches to size
+        with database.get_db() as conn:
+            rows = [article(i) for i in range(cached, size)]
+            conn.executemany('''
+                INSERT INTO legacy_news (title, link, source, published, summary)
+                VALUES (:title, :link, :source, :published, :summary)
+            ''', rows)
+            conn.executemany('''
+                INSERT INTO sports_news (content_hash, title, link, source, published, summary)
+                VALUES (:hash, :title, :link, :source, :published, :summary)
+            ''', [dict(a, hash=article_hash(a['title'], a['link'])) for a in rows])
+            conn.commit()
+        cached = size
+
+        results = {}
+        for label in ('per-row (title, source)', 'executemany content_hash'):
+            best = float('inf')
+            for r in range(rounds):
+                # 20 already cached, 20 new (removed again so every round sees the same mix)
+                batch = [article(i) for i in range(size - 20, size + 20)]
+                with database.get_db() as conn:
+                    started = time.perf_counter()
+                    if label.startswith('per-row'):
+                        saved = legacy_save(conn, batch)
+                    else:
+                        saved = SportsNews.save_articles(batch)
+                    best = min(best, time.perf_counter() - started)
+                    table = 'legacy_news' if label.startswith('per-row') else 'sports_news'
+                    conn.execute(f"DELETE FROM {table} WHERE id > (SELECT MAX(id) - 20 FROM {table})")
+                    conn.commit()
+                assert saved == 20, saved
+            results[label] = best
+
+        with database.get_read_db() as conn:
+            legacy_kb = index_kb(conn, 'sqlite_autoindex_legacy_news_1')
+            hash_kb = index_kb(conn, 'idx_sports_news_content_hash')
+        for label, best in results.items():
+            kb = legacy_kb if label.startswith('per-row') else hash_kb
+            size_note = f"  dedup index {kb:8.0f} KB" if kb is not None else ''
+            print(f"  {size:6} cached  {label:26} {best * 1000:7.2f} ms{size_note}")
+
+    database.close_db_pool()
+
+
+if __name__ == "__main__":
+    main()
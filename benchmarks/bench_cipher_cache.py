@@ -0,0 +1,53 @@
+"""
+Microbenchmark: per-field encryption cost and ciphertext size
+
+Compares building a Fernet object per field (the old behaviour) with the
+cached ciphers in EncryptionManager, for the legacy Fernet format and the
+versioned AEAD envelopes.
+
+Usage: uv run python benchmarks/bench_cipher_cache.py [fields]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from utils import encryption
+from utils.encryption import EncryptionManager
+
+
+def per_field_us(func, count: int) -> float:
+    """Run func count times and return microseconds per call"""
+    start = time.perf_counter()
+    func(count)
+    return (time.perf_counter() - start) / count * 1_000_000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    manager = EncryptionManager()
+    key = Fernet.generate_key()
+    value = "Finish the quarterly report and send it to the team"
+
+    print(f"{count} fields of {len(value)} chars, microseconds per field")
+
+    token = Fernet(key).encrypt(value.encode()).decode()
+    encrypt_uncached = per_field_us(lambda n: [Fernet(key).encrypt(value.encode()) for _ in range(n)], count)
+    decrypt_uncached = per_field_us(lambda n: [Fernet(key).decrypt(token.encode()) for _ in range(n)], count)
+    print(f"  {'fernet, new cipher per field':30} encrypt {encrypt_uncached:7.2f}  "
+          f"decrypt {decrypt_uncached:7.2f}  size {len(token)}")
+
+    for cipher in ['fernet', 'aesgcm', 'chacha20']:
+        encryption.ENCRYPTION_CIPHER = cipher
+        stored = manager.encrypt_data(value, key)
+        encrypt = per_field_us(lambda n: manager.encrypt_many([value] * n, key), count)
+        decrypt = per_field_us(lambda n: manager.decrypt_many([stored] * n, key), count)
+        print(f"  {cipher + ', cached cipher':30} encrypt {encrypt:7.2f}  "
+              f"decrypt {decrypt:7.2f}  size {len(stored)}")
+
+
+if __name__ == "__main__":
+    main()
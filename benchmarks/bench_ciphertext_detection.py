@@ -0,0 +1,108 @@
+"""
+Microbenchmark: ciphertext detection on import analysis
+
+Builds an export-shaped payload of daily notes and todos with note sizes
+typical of journaling (a few hundred bytes up to ~16 KB), encrypted with the
+legacy Fernet format, and times DataImporter.analyze_import_file with the old
+full base64 decode check and the structural check in EncryptionManager.
+
+Usage: uv run python benchmarks/bench_ciphertext_detection.py [notes]
+"""
+
+import base64
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+database.init_db()
+
+from cryptography.fernet import Fernet
+from models.data_manager import DataImporter
+from utils.encryption import EncryptionManager, encryption_manager
+
+NOTE_SIZES = [300, 800, 1500, 3000, 6000, 16000]
+
+
+def full_decode_is_encrypted(text: str) -> bool:
+    """The previous check: prefix, length and a base64 decode of the whole value"""
+    try:
+        if not isinstance(text, str):
+            return False
+        if not (text.startswith('gAAAAA') and len(text) > 60):
+            return False
+        base64.urlsafe_b64decode(text + '==')
+        return True
+    except Exception:
+        return False
+
+
+def build_export(count: int, key: bytes) -> dict:
+    """Export payload with a mix of encrypted and plain fields"""
+    rng = random.Random(7)
+    words = "today walked ran read wrote called met planned slept cooked finished started".split()
+    fernet = Fernet(key)
+
+    def note(size: int) -> str:
+        text = []
+        while sum(len(w) + 1 for w in text) < size:
+            text.append(rng.choice(words))
+        return ' '.join(text)
+
+    notes = []
+    for i in range(count):
+        content = note(rng.choice(NOTE_SIZES))
+        if i % 4:
+            content = fernet.encrypt(content.encode()).decode()
+        notes.append({'date': f'2024-01-{i % 28 + 1:02d}', 'content': content})
+
+    todos = [{'title': fernet.encrypt(note(40).encode()).decode(),
+              'description': note(120), 'category': 'personal'} for _ in range(count)]
+
+    return {'export_info': {'version': '2.0'}, 'daily_notes': notes, 'todos': todos}
+
+
+def time_analysis(data: dict, rounds: int) -> float:
+    """Milliseconds per analyze_import_file call"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        DataImporter.analyze_import_file(data)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = 5
+    data = build_export(count, Fernet.generate_key())
+    size_kb = sum(len(n['content']) for n in data['daily_notes']) / 1024
+
+    print(f"{count} notes ({size_kb:.0f} KB of note content) and {count} todos, "
+          f"milliseconds per analyze_import_file")
+
+    structural = time_analysis(data, rounds)
+    expected = DataImporter.analyze_import_file(data)['encrypted_field_count']
+
+    original = EncryptionManager.is_encrypted
+    EncryptionManager.is_encrypted = lambda self, text: full_decode_is_encrypted(text)
+    try:
+        full_decode = time_analysis(data, rounds)
+        found = DataImporter.analyze_import_file(data)['encrypted_field_count']
+    finally:
+        EncryptionManager.is_encrypted = original
+
+    print(f"  {'full base64 decode':22} {full_decode:8.2f}  ({found} encrypted fields)")
+    print(f"  {'structural check':22} {structural:8.2f}  ({expected} encrypted fields)")
+    print(f"  speedup {full_decode / structural:.1f}x")
+
+    assert encryption_manager.is_encrypted(data['todos'][0]['title'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: concurrent logins with key derivation inline vs on the bounded pool
+
+Simulates a login spike: each simulated request thread verifies a bcrypt hash
+and derives the PBKDF2 encryption key. Reports per-login latency and, for the
+pool, queue depth and time spent waiting versus deriving.
+
+Usage: uv run python benchmarks/bench_concurrent_logins.py [logins] [request_threads]
+"""
+
+import os
+import sys
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from utils.encryption import encryption_manager
+from utils.key_derivation import KeyDerivationPool
+
+PASSWORD = "CorrectHorse1"
+PASSWORD_HASH = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt())
+SALT = encryption_manager.generate_user_salt()
+
+
+def login_inline(_):
+    started = time.perf_counter()
+    bcrypt.checkpw(PASSWORD.encode(), PASSWORD_HASH)
+    encryption_manager.derive_encryption_key(PASSWORD, SALT)
+    return time.perf_counter() - started
+
+
+def make_pooled_login(pool: KeyDerivationPool):
+    def login_pooled(_):
+        started = time.perf_counter()
+        pool.check_password(PASSWORD, PASSWORD_HASH)
+        pool.derive_key(PASSWORD, SALT)
+        return time.perf_counter() - started
+    return login_pooled
+
+
+def run(name: str, login, logins: int, threads: int):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {name:28} {logins / elapsed:7.1f} logins/s  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(f"{logins} logins from {threads} concurrent request threads")
+
+    run("inline", login_inline, logins, threads)
+
+    pool = KeyDerivationPool(max_queue=logins)
+    run(f"pool ({pool.max_workers} workers)", make_pooled_login(pool), logins, threads)
+    stats = pool.get_stats()
+    print(f"  pool: max queue depth {stats['max_queue_depth']}, "
+          f"avg wait {stats['avg_wait_ms']:.1f} ms, avg derive {stats['avg_run_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
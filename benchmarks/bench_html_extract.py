@@ -0,0 +1,162 @@
+"""
+Benchmark: Sky Sports and Goal.com headline extraction
+
+Parses a Sky Sports and a Goal.com transfers page with the previous
+BeautifulSoup code (html.parser, whole tree, then find_all) and with the lxml
+extractors in utils/news_extractors.py, which stop after the first 6 or 8
+headlines. Reports the best time over a number of runs and the peak RSS each
+approach adds (Linux VmHWM), measured in a fresh child process because lxml
+allocates outside the Python heap. Both must return the same articles.
+
+Without arguments it uses synthetic pages shaped like the real ones (tiles
+or cards near the top, then several hundred kilobytes of further listings,
+inline scripts and footer). Pass saved copies of the real pages instead:
+
+    curl -so sky.html https://www.skysports.com/football/transfer-news
+    curl -so goal.html https://www.goal.com/en/transfers
+
+Usage: uv run python benchmarks/bench_html_extract.py [sky.html goal.html] [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from utils.news_extractors import SkyHeadlineExtractor, GoalHeadlineExtractor
+
+TITLES = [
+    "Arsenal agree fee to sign midfielder in record transfer",
+    "Premier League round-up: five things we learned",
+    "Chelsea bid rejected as striker move stalls",
+    "Manager confirms defender will join on loan deal",
+    "Injury update ahead of the weekend fixtures",
+    "Winger completes move abroad after medical",
+]
+
+FILLER = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 12 + "</p>"
+SCRIPT = "<script>window.__STATE__ = {" + ",".join(f'"k{i}": {i}' for i in range(400)) + "};</script>"
+
+
+def sky_page(tiles: int = 240) -> bytes:
+    parts = ["<!DOCTYPE html><html><head><title>Transfer news</title>", SCRIPT * 3, "</head><body>",
+             "<nav>" + "<a href='/football'>Football</a>" * 50 + "</nav>"]
+    for i in range(tiles):
+        parts.append(
+            f"<div class='sdc-site-tile sdc-site-tile--has-link'><div class='sdc-site-tile__body'>"
+            f"<h3 class='sdc-site-tile__headline'><a class='sdc-site-tile__headline-link' "
+            f"href='/football/news/{i}'><span class='sdc-site-tile__headline-text'>{TITLES[i % len(TITLES)]}"
+            f"</span></a></h3>{FILLER}</div></div>"
+        )
+        if i % 20 == 0:
+            parts.append(SCRIPT)
+    parts.append("<footer>" + FILLER * 20 + "</footer></body></html>")
+    return ''.join(parts).encode()
+
+
+def goal_page(cards: int = 240) -> bytes:
+    parts = ["<!DOCTYPE html><html><head><title>Transfers</title>", SCRIPT * 3, "</head><body>",
+             "<h1>Transfer news</h1>"]
+    for i in range(cards):
+        tag = 'h2' if i % 3 else 'h3'
+        parts.append(
+            f"<article><a href='/en/news/{i}'><{tag}>{TITLES[(i + 1) % len(TITLES)]}</{tag}></a>"
+            f"{FILLER}</article>"
+        )
+        if i % 20 == 0:
+            parts.append(SCRIPT)
+    parts.append("<footer><h4>More from Goal</h4>" + FILLER * 20 + "</footer></body></html>")
+    return ''.join(parts).encode()
+
+
+def soup_extract(content: bytes, source: str) -> list:
+    """The previous fetch_sky_sports_transfers / fetch_goal_transfers parsing"""
+    soup = BeautifulSoup(content, 'html.parser')
+    if source == 'sky':
+        headlines, limit, base = soup.find_all('h3', class_='sdc-site-tile__headline'), 6, 'https://www.skysports.com'
+        keywords = ['transfer', 'sign', 'move', 'deal', 'join', 'bid']
+    else:
+        headlines, limit, base = soup.find_all(['h1', 'h2', 'h3', 'h4']), 8, 'https://www.goal.com'
+        keywords = ['transfer', 'sign', 'move', 'deal', 'join']
+
+    transfers = []
+    for headline in headlines[:limit]:
+        title = headline.get_text(strip=True)
+        if title and len(title) > 15 and any(word in title.lower() for word in keywords):
+            link_elem = headline.find('a') or headline.find_parent('a')
+            link = ''
+            if link_elem:
+                link = link_elem.get('href', '')
+                if link and not link.startswith('http'):
+                    link = base + link
+            transfers.append({
+                'title': title,
+                'link': link,
+                'published': 'Recent',
+                'summary': title[:150] + '...' if len(title) > 150 else title,
+                'source': 'Sky Sports' if source == 'sky' else 'Goal.com'
+            })
+    return transfers
+
+
+EXTRACTORS = {'sky': SkyHeadlineExtractor(), 'goal': GoalHeadlineExtractor()}
+
+
+def parse(content: bytes, source: str, parser: str) -> list:
+    return soup_extract(content, source) if parser == 'bs4' else EXTRACTORS[source].extract(content)
+
+
+def load(paths: list, sources=('sky', 'goal')) -> dict:
+    if paths:
+        return {source: open(path, 'rb').read() for source, path in zip(('sky', 'goal'), paths) if source in sources}
+    return {source: {'sky': sky_page, 'goal': goal_page}[source]() for source in sources}
+
+
+def peak_kb(paths: list, source: str, parser: str) -> int:
+    """Extra peak RSS (KB) for one parse, in a child process"""
+    out = subprocess.run([sys.executable, __file__, '--peak', source, parser, *paths],
+                         capture_output=True, text=True, check=True).stdout
+    return int(out.strip())
+
+
+def high_water_kb() -> int:
+    """VmHWM (Linux); unlike ru_maxrss it is not inherited from the parent across exec"""
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+
+
+def child_peak(source: str, parser: str, paths: list):
+    content = load(paths, [source])[source]
+    before = high_water_kb()
+    parse(content, source, parser)
+    print(high_water_kb() - before)
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == '--peak':
+        return child_peak(args[1], args[2], args[3:])
+
+    runs = int(args.pop()) if args and args[-1].isdigit() else 20
+    paths = args[:2]
+    pages = load(paths)
+
+    print(f"{'synthetic' if not paths else 'saved'} pages, best of {runs} runs")
+    for source, content in pages.items():
+        expected = parse(content, source, 'bs4')
+        assert parse(content, source, 'lxml') == expected, f"{source}: extractors disagree"
+        for parser in ('bs4', 'lxml'):
+            best = float('inf')
+            for _ in range(runs):
+                started = time.perf_counter()
+                parse(content, source, parser)
+                best = min(best, time.perf_counter() - started)
+            print(f"  {source:5} {parser:5} {len(content) / 1024:7.0f} KB  {best * 1000:8.2f} ms  "
+                  f"peak +{peak_kb(paths, source, parser) / 1024:6.1f} MB  {len(expected)} articles")
+
+
+if __name__ == "__main__":
+    main()
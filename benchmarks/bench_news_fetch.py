@@ -0,0 +1,148 @@
+"""
+Benchmark: sports news refresh against local stub sources
+
+Starts one local HTTP server per source (BBC RSS, Sky and Goal HTML, Reddit
+JSON) and times a refresh done the old way (sources one after another with a
+0.5 s pause between them) and with the concurrent fetcher. It then runs the
+concurrent fetcher with one source hanging and one returning HTTP 500, which
+should give partial results by the deadline. Finally it refreshes twice
+against unchanged sources: BBC, Sky and Goal answer the second request with
+304 Not Modified and Reddit (no ETag) is caught by its content hash, so
+nothing is parsed.
+
+Usage: uv run python benchmarks/bench_news_fetch.py [slow_seconds]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+database.init_db()
+
+import sports
+from models.sports import SportsNews
+from sports import HabitStackTransferNewsFetcher, HostThrottle
+
+HEADLINES = [f"Striker {i} completes transfer move to new club" for i in range(8)]
+
+BODIES = {
+    'bbc': ('application/rss+xml', "<?xml version='1.0'?><rss version='2.0'><channel><title>BBC</title>" + ''.join(
+        f"<item><title>{title}</title><link>http://bbc.test/{i}</link></item>" for i, title in enumerate(HEADLINES)
+    ) + "</channel></rss>"),
+    'sky': ('text/html', "<html><body>" + ''.join(
+        f"<h3 class='sdc-site-tile__headline'><a href='/news/{i}'>{title}</a></h3>" for i, title in enumerate(HEADLINES)
+    ) + "</body></html>"),
+    'goal': ('text/html', "<html><body>" + ''.join(
+        f"<h2><a href='/en/news/{i}'>{title}</a></h2>" for i, title in enumerate(HEADLINES)
+    ) + "</body></html>"),
+    'reddit': ('application/json', json.dumps({'data': {'children': [
+        {'data': {'title': title, 'permalink': f'/r/soccer/{i}', 'created_utc': 1700000000, 'selftext': ''}}
+        for i, title in enumerate(HEADLINES)
+    ]}})),
+}
+
+
+def stub_server(kind: str, behaviour: dict) -> ThreadingHTTPServer:
+    """Serve BODIES[kind], after behaviour['delay'] seconds or with behaviour['status']"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(behaviour.get('delay', 0.05))
+            status = behaviour.get('status', 200)
+            content_type, body = BODIES[kind]
+            # Reddit sends no validators, like many JSON APIs
+            etag = None if kind == 'reddit' else f'"{hashlib.md5(body.encode()).hexdigest()}"'
+            if etag and self.headers.get('If-None-Match') == etag:
+                status, body = 304, ''
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body.encode())
+            except OSError:
+                pass  # The client gave up on a slow response
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubFetcher(HabitStackTransferNewsFetcher):
+    """The real fetcher pointed at the stub servers"""
+
+    def __init__(self, urls: dict, **kwargs):
+        super().__init__(**kwargs)
+        self.BBC_FEED_URL = urls['bbc']
+        self.SKY_TRANSFERS_URL = urls['sky']
+        self.GOAL_TRANSFERS_URL = urls['goal']
+        self.REDDIT_SEARCH_URL = urls['reddit']
+
+
+def sequential(fetcher) -> tuple:
+    """The previous fetch_all_sources: one source at a time, 0.5 s apart"""
+    articles, outcomes = [], {}
+    for name, fetch_func in fetcher.sources():
+        found, outcome, _ = fetcher._fetch_source(name, fetch_func)
+        articles.extend(found)
+        outcomes[name] = outcome
+        time.sleep(0.5)
+    return articles, outcomes
+
+
+def run(label: str, behaviours: dict, concurrent: bool, deadline: float, repeat: bool = False):
+    servers = {kind: stub_server(kind, behaviours.get(kind, {})) for kind in BODIES}
+    urls = {kind: f"http://127.0.0.1:{server.server_address[1]}/" for kind, server in servers.items()}
+
+    for attempt in (['first', 'again'] if repeat else [None]):
+        # A long deadline for the sequential run so it only stops at each source's timeout
+        fetcher = StubFetcher(urls, deadline=deadline if concurrent else 3600, throttle=HostThrottle())
+        started = time.perf_counter()
+        if concurrent:
+            articles, outcomes = fetcher.fetch_all_sources(), fetcher.last_fetch
+            SportsNews.save_articles(articles)
+            fetcher.save_validators()
+        else:
+            articles, outcomes = sequential(fetcher)
+        elapsed = time.perf_counter() - started
+
+        summary = ', '.join(f"{name.split()[0]} {outcome['status']}" for name, outcome in outcomes.items())
+        name = f"{label}, {attempt}" if attempt else label
+        print(f"  {name:34} {elapsed:6.2f} s  {len(articles):3} articles  ({summary})")
+    for server in servers.values():
+        server.shutdown()
+
+
+def main():
+    slow = float(sys.argv[1]) if len(sys.argv) > 1 else 6.0
+    deadline = 3.0
+    # Each stalled request gives up after this long, like the 10 s timeout in production
+    sports.NEWS_SOURCE_TIMEOUT = slow / 2
+
+    print(f"4 stub sources, per-request timeout {sports.NEWS_SOURCE_TIMEOUT:.1f} s, "
+          f"deadline {deadline:.1f} s, slow source {slow:.1f} s")
+    run('sequential, all healthy', {}, False, deadline)
+    run('concurrent, all healthy', {}, True, deadline)
+    degraded = {'sky': {'delay': slow}, 'goal': {'status': 500}}
+    run('sequential, Sky slow + Goal 500', degraded, False, deadline)
+    run('concurrent, Sky slow + Goal 500', degraded, True, deadline)
+    run('concurrent, unchanged', {}, True, deadline, repeat=True)
+
+
+if __name__ == "__main__":
+    main()
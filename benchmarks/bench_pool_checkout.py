@@ -0,0 +1,46 @@
+"""
+Microbenchmark: connection pool checkout latency
+
+Compares probing every pooled connection with SELECT 1 on checkout (the old
+behaviour, validate_idle_seconds=0) with idle- and error-based validation,
+using the pool's own checkout latency histogram.
+
+Usage: uv run python benchmarks/bench_pool_checkout.py [checkouts]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SQLiteConnectionPool
+
+
+def run(validate_idle_seconds: float, count: int) -> dict:
+    """Check connections out and back in, returning the pool's stats"""
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    pool = SQLiteConnectionPool(path, validate_idle_seconds=validate_idle_seconds)
+    for _ in range(count):
+        pool.return_connection(pool.get_connection())
+    stats = pool.get_stats()
+    pool.close_all()
+    return stats
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{count} checkouts, microseconds per checkout")
+
+    for label, idle in [('SELECT 1 on every checkout', 0), ('idle/error validation', 60)]:
+        stats = run(idle, count)
+        latency = stats['checkout_latency']
+        print(f"  {label:28} avg {latency['avg_ms'] * 1000:6.2f}  "
+              f"max {latency['max_ms'] * 1000:8.2f}  validations {stats['validations']}")
+        for bucket, hits in latency['buckets'].items():
+            if hits:
+                print(f"      {bucket:>12} {hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Microbenchmark: statement preparation on hot model reads
+
+Runs the queries behind Habit.get_user_habits and Todo.get_todos_by_status
+the way the code did before the query registry (inline SQL literals, on a
+connection with sqlite3's default cache of 128 statements) and through the
+registry (models/queries.py, cached_statements=DB_CACHED_STATEMENTS). Both
+sides reuse one identical string per query, so both hit sqlite3's statement
+cache; the delta shows what the registry itself changes on these reads.
+
+Usage: uv run python benchmarks/bench_statement_cache.py [calls]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+database.init_db()
+
+from models import queries
+
+# The SQL text at the call sites before the registry
+BASELINE_HABITS_WITH_TODAY_STATUS = """
+                SELECT h.*, 
+                       CASE WHEN hc.completion_date IS NOT NULL THEN 1 ELSE 0 END as completed_today
+                FROM habits h
+                LEFT JOIN habit_completions hc ON h.id = hc.habit_id AND hc.completion_date = ?
+                WHERE h.user_id = ?
+                ORDER BY h.created_at
+            """
+
+BASELINE_HABIT_STREAKS_FOR_USER = """
+            SELECT h.id as habit_id, s.habit_id as streak_habit_id,
+                   s.current_streak, s.last_completion_date
+            FROM habits h
+            LEFT JOIN habit_streaks s ON s.habit_id = h.id
+            WHERE h.user_id = ?
+        """
+
+BASELINE_TODOS_FOR_USER = """
+                SELECT * FROM todos 
+                WHERE user_id = ? AND deleted_at IS NULL
+                ORDER BY 
+                    completed ASC,
+                    CASE priority 
+                        WHEN 'high' THEN 1 
+                        WHEN 'medium' THEN 2 
+                        WHEN 'low' THEN 3 
+                        ELSE 4 
+                    END,
+                    due_date ASC,
+                    created_at ASC
+            """
+
+ROUNDS = 5
+
+# name: [(baseline SQL, registry SQL, params)]
+HOT_READS = {
+    'get_user_habits': [
+        (BASELINE_HABITS_WITH_TODAY_STATUS, queries.HABITS_WITH_TODAY_STATUS, lambda today: (today, 1)),
+        (BASELINE_HABIT_STREAKS_FOR_USER, queries.HABIT_STREAKS_FOR_USER, lambda today: (1,)),
+    ],
+    'get_todos_by_status': [
+        (BASELINE_TODOS_FOR_USER, queries.TODOS_FOR_USER, lambda today: (1,)),
+    ],
+}
+
+
+def seed():
+    """One user with a few habits, a month of completions and some todos"""
+    with database.get_db() as conn:
+        conn.execute("INSERT INTO users (id, username, password_hash) VALUES (1, 'bench', '')")
+        for habit_id in range(1, 9):
+            conn.execute("INSERT INTO habits (id, user_id, name) VALUES (?, 1, ?)", (habit_id, f"Habit {habit_id}"))
+            for days in range(30):
+                day = (date.today() - timedelta(days=days)).isoformat()
+                conn.execute("INSERT INTO habit_completions (habit_id, user_id, completion_date) VALUES (?, 1, ?)",
+                             (habit_id, day))
+        for i in range(40):
+            conn.execute("INSERT INTO todos (user_id, title, priority) VALUES (1, ?, 'medium')", (f"Todo {i}",))
+        conn.commit()
+
+
+def per_call_us(conn, statements, calls: int) -> float:
+    """Microseconds per page-worth of queries"""
+    today = date.today().isoformat()
+    start = time.perf_counter()
+    for _ in range(calls):
+        for sql, params in statements:
+            conn.execute(sql, params(today)).fetchall()
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seed()
+    print(f"{len(queries.QUERIES)} registered queries, DB_CACHED_STATEMENTS={database.DB_CACHED_STATEMENTS}")
+    print(f"{calls} calls, best of {ROUNDS} rounds, microseconds per call")
+
+    # sqlite3's default cached_statements is 128
+    baseline = sqlite3.connect(database.DB_PATH)
+    registry = sqlite3.connect(database.DB_PATH, cached_statements=database.DB_CACHED_STATEMENTS)
+    for name, statements in HOT_READS.items():
+        # Alternate the two and keep each one's best round, so drift hits both alike
+        before = after = float('inf')
+        for _ in range(ROUNDS):
+            before = min(before, per_call_us(baseline, [(old, params) for old, _, params in statements], calls))
+            after = min(after, per_call_us(registry, [(new, params) for _, new, params in statements], calls))
+        print(f"  {name:22} baseline {before:8.1f}  registry {after:8.1f}  "
+              f"delta {after - before:+6.1f} ({(after - before) / before:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
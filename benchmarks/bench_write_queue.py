@@ -0,0 +1,79 @@
+"""
+Microbenchmark: concurrent writes through the pool vs the single-writer queue
+
+Many threads insert todos through database.run_write, first with each write
+committing on its own pooled connection (competing for SQLite's write lock),
+then with DB_WRITE_QUEUE batching them on the writer thread.
+
+Usage: uv run python benchmarks/bench_write_queue.py [threads] [writes_per_thread]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def run(threads: int, writes: int) -> list:
+    """Insert todos from many threads, returning per-write latencies in ms"""
+    latencies = []
+    lock = threading.Lock()
+
+    def insert(conn):
+        return conn.execute(
+            "INSERT INTO todos (user_id, title, priority) VALUES (1, 'Benchmark todo', 'medium')"
+        ).lastrowid
+
+    def worker():
+        mine = []
+        for _ in range(writes):
+            started = time.perf_counter()
+            database.run_write(insert)
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sorted(latencies)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"{threads} threads x {writes} writes")
+    for label, queued in [('pooled connections', False), ('single-writer queue', True)]:
+        database.close_db_pool()
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        database.init_db()
+        with database.get_db() as conn:
+            conn.execute("INSERT INTO users (id, username, password_hash) VALUES (1, 'bench', '')")
+            conn.commit()
+        database.DB_WRITE_QUEUE = queued
+
+        started = time.perf_counter()
+        latencies = run(threads, writes)
+        elapsed = time.perf_counter() - started
+
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"  {label:20} {len(latencies) / elapsed:8.0f} writes/s  "
+              f"p50 {p50:6.2f} ms  p99 {p99:7.2f} ms  max {latencies[-1]:7.2f} ms")
+        if queued:
+            stats = database.get_write_queue().get_stats()
+            print(f"  {'':20} {stats['batches']} batches, avg {stats['avg_batch_size']:.1f} writes per commit")
+
+    database.close_db_pool()
+
+
+if __name__ == "__main__":
+    main()
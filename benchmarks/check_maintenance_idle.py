@@ -0,0 +1,90 @@
+"""
+Maintenance check: idle-time vacuum still runs with the news refresher on
+
+Builds a fresh database with free pages to reclaim, then alternates news
+refresher and maintenance ticks the way the two daemon threads do in the
+default deployment (no source is due, so nothing is fetched). The
+refresher's lease renewal every tick must not count as app activity, so the
+maintenance scheduler has to find the app idle and vacuum. A request that
+uses the database between two ticks must still make the next tick busy.
+The exit status is 1 when either expectation fails.
+
+Usage: uv run python benchmarks/check_maintenance_idle.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'maintenance.db')
+database.init_db()
+
+from flask import Flask
+from maintenance import MaintenanceScheduler
+from news_refresher import NewsRefresher, NEWS_SOURCE_INTERVALS
+from models.sports import SportsNews
+
+
+def free_pages(count: int = 2000):
+    """Fill and drop a table so the freelist has pages for incremental_vacuum"""
+    with database.get_db() as conn:
+        conn.execute("CREATE TABLE filler (data BLOB)")
+        conn.executemany("INSERT INTO filler VALUES (zeroblob(4000))", [()] * count)
+        conn.commit()
+        conn.execute("DROP TABLE filler")
+        conn.commit()
+
+
+def tick(refresher: NewsRefresher, scheduler: MaintenanceScheduler) -> dict:
+    refresher.run_once()
+    return scheduler.run_once()
+
+
+def main():
+    # Every source was just fetched, so refresher ticks only renew the lease
+    for name in NEWS_SOURCE_INTERVALS:
+        SportsNews.record_fetch(name, {'status': 'unchanged'}, 0, 0, time.time())
+    free_pages()
+
+    app = Flask(__name__)
+    database.init_app(app)
+    refresher = NewsRefresher()
+    scheduler = MaintenanceScheduler(interval=3600, vacuum_min_free_pages=16)
+    scheduler.init_app(app)
+
+    @app.route('/habits')
+    def habits():
+        with database.get_read_db() as conn:
+            return str(conn.execute("SELECT COUNT(*) FROM habits").fetchone()[0])
+
+    failures = 0
+    for _ in range(3):
+        stats = tick(refresher, scheduler)
+    print(f"refresher on, no requests: {stats['idle_ticks']} idle ticks, {stats['vacuum_runs']} vacuum runs, "
+          f"{stats['pages_vacuumed']} pages vacuumed, freelist {stats['freelist_pages']}")
+    if not stats['vacuum_runs'] or not stats['pages_vacuumed']:
+        failures += 1
+        print("FAIL the refresher's lease renewals kept the app from ever being idle")
+
+    idle_ticks = stats['idle_ticks']
+    app.test_client().get('/habits')
+    stats = tick(refresher, scheduler)
+    print(f"request between ticks: {'idle' if stats['idle_ticks'] > idle_ticks else 'busy'}")
+    if stats['idle_ticks'] > idle_ticks:
+        failures += 1
+        print("FAIL a request between ticks was not counted as activity")
+
+    scheduler.stop()
+    refresher.stop()
+    database.close_db_pool()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Query plan check: hot model queries must be served by an index, in order
+
+Builds a fresh database with every schema migration applied, runs EXPLAIN
+QUERY PLAN on each registered query in models/queries.py (plus the per-user
+deletes behind account deletion and data reset) and fails when a plan scans a
+table or sorts in a temp B-tree. Run it after changing a query or an index;
+the exit status is 1 on a regression so it can gate CI.
+
+Usage: uv run python benchmarks/check_query_plans.py [-v]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+# Importing the models registers encryptable fields; keep that out of the real database
+database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'plans.db')
+database.init_db()
+
+from models import queries
+
+# Registered queries allowed to scan or sort, and why
+EXEMPT = {
+    'BOOKS_BY_STATUS_ORDER': "not used by any page; a user's books are sorted in memory",
+    'WATCHLIST_BY_STATUS_ORDER': "not used by any page; a user's items are sorted in memory",
+    'TODO_CATEGORIES': "DISTINCT over a user's few categories; cheaper than a third todos index",
+    'ARTICLE_COUNT': "counts the whole table through the smallest (covering) index",
+    'NEWS_SOURCE_STATUS': "read whole by design; one row per configured news source, so never more than a handful",
+}
+
+# Unregistered statements that must find a user's rows without a table scan
+USER_SCOPED = {
+    f"DELETE_{table.upper()}": f"DELETE FROM {table} WHERE user_id = ?"
+    for table in ('habits', 'habit_completions', 'habit_streaks', 'daily_notes', 'todos',
+                  'reading_list', 'birthdays', 'watchlist', 'user_encryption_preferences')
+}
+
+
+def problems(plan) -> list:
+    """Plan lines that scan a table or sort in a temp B-tree"""
+    return [detail for detail in plan if detail.startswith('SCAN ') or 'USE TEMP B-TREE' in detail]
+
+
+def main():
+    verbose = '-v' in sys.argv[1:]
+    conn = database.open_connection(database.DB_PATH)
+    failures = 0
+
+    for name, sql in list(queries.QUERIES.items()) + list(USER_SCOPED.items()):
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", [1] * sql.count('?'))]
+        bad = problems(plan)
+        if bad and name not in EXEMPT:
+            failures += 1
+            print(f"FAIL {name}: {'; '.join(bad)}")
+        elif verbose:
+            note = f"  (exempt: {EXEMPT[name]})" if bad else ''
+            print(f"ok   {name}: {' | '.join(plan)}{note}")
+
+    conn.close()
+    checked = len(queries.QUERIES) + len(USER_SCOPED)
+    print(f"{checked} statements checked, {failures} with a table scan or temp B-tree sort")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
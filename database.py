@@ -2,25 +2,168 @@
 Database connection and initialization for HabitStack
 """
 
+import os
+import bisect
+import json
+import logging
 import sqlite3
 import threading
 import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from contextlib import contextmanager
 from queue import Queue, Empty
+from urllib.request import pathname2url
+from flask import current_app, g, has_app_context
 
 # Database setup
 DB_PATH = "habitstack.db"
 
+logger = logging.getLogger(__name__)
+
+# Pooled connections idle longer than this are checked with SELECT 1 before reuse
+DB_POOL_VALIDATE_IDLE_SECONDS = float(os.environ.get('DB_POOL_VALIDATE_IDLE_SECONDS', 60))
+
+# Seconds between db_pool_stats log lines (0 disables them)
+DB_POOL_LOG_INTERVAL = float(os.environ.get('DB_POOL_LOG_INTERVAL', 300))
+
+# Prepared statements kept per connection; sized for models/queries.py plus ad-hoc writes
+DB_CACHED_STATEMENTS = int(os.environ.get('DB_CACHED_STATEMENTS', 256))
+
+# Enable with DB_TRANSACTION_PER_REQUEST=1: each request runs in one transaction,
+# committed when the request ends (or rolled back if it raised)
+DB_TRANSACTION_PER_REQUEST = os.environ.get('DB_TRANSACTION_PER_REQUEST') == '1'
+
+# Enable with DB_WRITE_QUEUE=1: writes passed to run_write are applied by a single
+# writer thread in group-committed batches instead of competing for the write lock
+DB_WRITE_QUEUE = os.environ.get('DB_WRITE_QUEUE') == '1'
+
+# Read-only pool used by get_read_db (DB_READ_POOL=0 sends reads to the main pool)
+DB_READ_POOL = os.environ.get('DB_READ_POOL', '1') == '1'
+DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 20))
+DB_READ_MMAP_SIZE = int(os.environ.get('DB_READ_MMAP_SIZE', 256 * 1024 * 1024))
+DB_READ_CACHE_SIZE = int(os.environ.get('DB_READ_CACHE_SIZE', -64000))  # negative = KiB, so 64MB
+DB_WRITE_BATCH_SIZE = int(os.environ.get('DB_WRITE_BATCH_SIZE', 64))
+DB_WRITE_TIMEOUT = float(os.environ.get('DB_WRITE_TIMEOUT', 5))
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of durations in milliseconds with fixed buckets"""
+    
+    BUCKETS_MS = (0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def observe(self, ms: float):
+        """Record one duration"""
+        index = bisect.bisect_left(self.BUCKETS_MS, ms)
+        with self.lock:
+            self.counts[index] += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+    
+    def snapshot(self) -> dict:
+        """Bucket counts keyed by upper bound ('+Inf' for the overflow bucket)"""
+        with self.lock:
+            count = sum(self.counts)
+            labels = [f"le_{bound}ms" for bound in self.BUCKETS_MS] + ['+Inf']
+            return {
+                'count': count,
+                'avg_ms': self.total_ms / count if count else 0.0,
+                'max_ms': self.max_ms,
+                'buckets': dict(zip(labels, self.counts))
+            }
+
+
+def open_connection(database_path, timeout=30, read_only=False):
+    """Open a connection configured the way HabitStack uses SQLite"""
+    if read_only:
+        return _open_read_connection(database_path, timeout)
+    
+    conn = sqlite3.connect(
+        database_path,
+        check_same_thread=False,  # Allow use across threads
+        timeout=timeout,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row
+    
+    # Let maintenance.py return freed pages with incremental_vacuum. Must precede
+    # the switch to WAL to apply to a new database; existing ones need a VACUUM
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    
+    # Enable WAL mode for better concurrency
+    conn.execute("PRAGMA journal_mode=WAL")
+    
+    # Other performance optimizations
+    conn.execute("PRAGMA synchronous=NORMAL")  # Faster than FULL, still safe with WAL
+    conn.execute("PRAGMA cache_size=10000")    # 10MB cache
+    conn.execute("PRAGMA foreign_keys=ON")     # Enforce foreign key constraints
+    return conn
+
+def _open_read_connection(database_path, timeout):
+    """Open a read-only connection (the database must already exist)"""
+    conn = sqlite3.connect(
+        f"file:{pathname2url(os.path.abspath(database_path))}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        timeout=timeout,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
+    conn.row_factory = sqlite3.Row
+    
+    conn.execute("PRAGMA query_only=ON")                       # Refuse writes even through ATTACH
+    conn.execute(f"PRAGMA mmap_size={DB_READ_MMAP_SIZE}")      # Read pages straight from the mapping
+    conn.execute(f"PRAGMA cache_size={DB_READ_CACHE_SIZE}")
+    return conn
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection became free within the pool timeout"""
+
+
 class SQLiteConnectionPool:
-    """Simple connection pool for SQLite"""
+    """Simple connection pool for SQLite
+    
+    Connections are not probed on every checkout. A connection is validated
+    only when it sat idle for longer than validate_idle_seconds, or when the
+    last code that used it raised an exception.
+    """
     
-    def __init__(self, database_path, max_connections=10, timeout=30):
+    def __init__(self, database_path, max_connections=10, timeout=30,
+                 validate_idle_seconds=DB_POOL_VALIDATE_IDLE_SECONDS, read_only=False, name='main'):
         self.database_path = database_path
+        self.read_only = read_only
+        self.name = name
         self.max_connections = max_connections
         self.timeout = timeout
+        self.validate_idle_seconds = validate_idle_seconds
+        # Idle entries are (connection, returned_at, suspect)
         self.pool = Queue(maxsize=max_connections)
         self.lock = threading.Lock()
         self._created_connections = 0
+        self.checkout_latency = LatencyHistogram()
+        self.wait_latency = LatencyHistogram()
+        self._checkouts = 0
+        self._in_use = 0
+        self._max_in_use = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._created_total = 0
+        self._destroyed_total = 0
+        self._rollbacks = 0
+        self._validations = 0
+        self._validation_failures = 0
+        self._requests = 0
+        self._rows_written = 0
+        # conn -> its total_changes when last returned, to count rows written per checkout
+        self._changes_seen = {}
+        self._request_checkouts = 0
+        self._max_request_checkouts = 0
+        self._last_stats_log = time.monotonic()
         
         # Pre-create some connections
         self._initialize_pool()
@@ -28,88 +171,195 @@ class SQLiteConnectionPool:
     def _initialize_pool(self):
         """Initialize the pool with a few connections"""
         for _ in range(min(3, self.max_connections)):
+            with self.lock:
+                self._created_connections += 1
             conn = self._create_connection()
             if conn:
-                self.pool.put(conn)
+                self.pool.put((conn, time.monotonic(), False))
     
     def _create_connection(self):
-        """Create a new database connection"""
+        """Create a new database connection in a slot the caller has already
+        counted in _created_connections; the slot is given back on failure"""
         try:
-            conn = sqlite3.connect(
-                self.database_path,
-                check_same_thread=False,  # Allow use across threads
-                timeout=self.timeout
-            )
-            conn.row_factory = sqlite3.Row
-            
-            # Enable WAL mode for better concurrency
-            conn.execute("PRAGMA journal_mode=WAL")
-            
-            # Other performance optimizations
-            conn.execute("PRAGMA synchronous=NORMAL")  # Faster than FULL, still safe with WAL
-            conn.execute("PRAGMA cache_size=10000")    # 10MB cache
-            conn.execute("PRAGMA foreign_keys=ON")     # Enforce foreign key constraints
-            
-            with self.lock:
-                self._created_connections += 1
-            
-            return conn
+            conn = open_connection(self.database_path, self.timeout, self.read_only)
         except Exception as e:
-            print(f"Error creating database connection: {e}")
+            with self.lock:
+                self._created_connections -= 1
+            logger.error(f"Error creating database connection ({self.name} pool): {e}")
             return None
+        
+        with self.lock:
+            self._created_total += 1
+        return conn
+    
+    def _discard(self, conn, keep_slot=False):
+        """Close a connection that is leaving the pool for good (keep_slot
+        when a replacement is opened in its place)"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            if not keep_slot:
+                self._created_connections -= 1
+            self._destroyed_total += 1
+            self._changes_seen.pop(id(conn), None)
+    
+    def _validate(self, conn, returned_at, suspect):
+        """Return conn if usable, or a fresh connection in its place"""
+        if not suspect and time.monotonic() - returned_at < self.validate_idle_seconds:
+            return conn
+        
+        with self.lock:
+            self._validations += 1
+        try:
+            conn.execute("SELECT 1")
+            return conn
+        except Exception:
+            # Connection is bad, create a new one
+            with self.lock:
+                self._validation_failures += 1
+            self._discard(conn, keep_slot=True)
+            return self._create_connection()
     
     def get_connection(self):
         """Get a connection from the pool"""
+        started = time.perf_counter()
+        try:
+            conn = self._checkout()
+        finally:
+            self.checkout_latency.observe((time.perf_counter() - started) * 1000)
+        with self.lock:
+            self._checkouts += 1
+            if conn is not None:
+                self._in_use += 1
+                self._max_in_use = max(self._max_in_use, self._in_use)
+        return conn
+    
+    def _checkout(self):
         try:
             # Try to get an existing connection
-            conn = self.pool.get_nowait()
-            
-            # Test if connection is still valid
-            try:
-                conn.execute("SELECT 1")
-                return conn
-            except:
-                # Connection is bad, create a new one
-                conn.close()
-                return self._create_connection()
-                
+            return self._validate(*self.pool.get_nowait())
+        except Empty:
+            pass
+        
+        # No connections available, create new one if under limit (reserving
+        # the slot first, so concurrent callers can't overshoot max_connections)
+        with self.lock:
+            can_create = self._created_connections < self.max_connections
+            if can_create:
+                self._created_connections += 1
+        if can_create:
+            return self._create_connection()
+        
+        # Wait for a connection to become available
+        with self.lock:
+            self._waits += 1
+        started = time.perf_counter()
+        try:
+            entry = self.pool.get(timeout=self.timeout)
         except Empty:
-            # No connections available, create new one if under limit
             with self.lock:
-                if self._created_connections < self.max_connections:
-                    return self._create_connection()
-            
-            # Wait for a connection to become available
-            try:
-                conn = self.pool.get(timeout=self.timeout)
-                return conn
-            except Empty:
-                raise Exception("No database connections available")
+                self._timeouts += 1
+            stats = self.get_stats()
+            self._log_stats('db_pool_timeout', stats, logging.WARNING)
+            raise PoolTimeoutError(
+                f"No database connections available in the {self.name} pool after {self.timeout}s "
+                f"({stats['in_use']} in use of {self.max_connections})"
+            )
+        finally:
+            self.wait_latency.observe((time.perf_counter() - started) * 1000)
+        return self._validate(*entry)
     
-    def return_connection(self, conn):
-        """Return a connection to the pool"""
+    def return_connection(self, conn, failed=False):
+        """Return a connection to the pool; failed marks it for validation on next checkout"""
         if conn:
+            with self.lock:
+                self._in_use -= 1
+                try:
+                    changes = conn.total_changes
+                    self._rows_written += changes - self._changes_seen.get(id(conn), 0)
+                    self._changes_seen[id(conn)] = changes
+                except sqlite3.Error:
+                    pass
             try:
                 # Reset any uncommitted transactions
+                if conn.in_transaction:
+                    with self.lock:
+                        self._rollbacks += 1
                 conn.rollback()
-                self.pool.put_nowait(conn)
+                self.pool.put_nowait((conn, time.monotonic(), failed))
             except:
                 # Pool is full or connection is bad, just close it
-                conn.close()
-                with self.lock:
-                    self._created_connections -= 1
+                self._discard(conn)
+            self._maybe_log_stats()
+    
+    def record_request(self, checkouts):
+        """Count the pool checkouts one request made"""
+        with self.lock:
+            self._requests += 1
+            self._request_checkouts += checkouts
+            self._max_request_checkouts = max(self._max_request_checkouts, checkouts)
+    
+    def get_stats(self) -> dict:
+        """Get pool gauges, counters and latency histograms"""
+        with self.lock:
+            stats = {
+                'name': self.name,
+                'max_connections': self.max_connections,
+                'created_connections': self._created_connections,
+                'in_use': self._in_use,
+                'max_in_use': self._max_in_use,
+                'idle_connections': self.pool.qsize(),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'connections_created': self._created_total,
+                'connections_destroyed': self._destroyed_total,
+                'rollbacks': self._rollbacks,
+                'validations': self._validations,
+                'validation_failures': self._validation_failures,
+                'validate_idle_seconds': self.validate_idle_seconds,
+                'requests': self._requests,
+                'rows_written': self._rows_written,
+                'checkouts_per_request': self._request_checkouts / self._requests if self._requests else 0.0,
+                'max_checkouts_per_request': self._max_request_checkouts
+            }
+        stats['checkout_latency'] = self.checkout_latency.snapshot()
+        stats['wait_latency'] = self.wait_latency.snapshot()
+        return stats
+    
+    def _maybe_log_stats(self):
+        """Log a stats line every DB_POOL_LOG_INTERVAL seconds"""
+        if DB_POOL_LOG_INTERVAL <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now - self._last_stats_log < DB_POOL_LOG_INTERVAL:
+                return
+            self._last_stats_log = now
+        self._log_stats('db_pool_stats', self.get_stats())
+    
+    def _log_stats(self, event, stats, level=logging.INFO):
+        """Write pool stats as one JSON log line (histograms summarized)"""
+        record = {key: value for key, value in stats.items() if not isinstance(value, dict)}
+        for key in ('checkout_latency', 'wait_latency'):
+            record[f"{key}_avg_ms"] = round(stats[key]['avg_ms'], 3)
+            record[f"{key}_max_ms"] = round(stats[key]['max_ms'], 3)
+        logger.log(level, json.dumps({'event': event, **record}))
     
     def close_all(self):
         """Close all connections in the pool"""
         while not self.pool.empty():
             try:
-                conn = self.pool.get_nowait()
+                conn, _, _ = self.pool.get_nowait()
                 conn.close()
             except Empty:
                 break
         
         with self.lock:
             self._created_connections = 0
+            self._changes_seen.clear()
 
 # Global connection pool instance
 _connection_pool = None
@@ -121,224 +371,406 @@ def get_connection_pool():
         _connection_pool = SQLiteConnectionPool(DB_PATH)
     return _connection_pool
 
+# Global read-only connection pool instance
+_read_pool = None
+
+def get_read_pool():
+    """Get the global read-only connection pool, creating it if necessary"""
+    global _read_pool
+    if _read_pool is None:
+        _read_pool = SQLiteConnectionPool(DB_PATH, max_connections=DB_READ_POOL_SIZE, read_only=True, name='read')
+    return _read_pool
+
+# Connections held by threads outside a request (nested get_db calls share one)
+_thread_connections = threading.local()
+
+
+class _DeferredCommitConnection:
+    """Connection proxy used in transaction-per-request mode: commit() is a
+    no-op and the request's transaction is committed at teardown"""
+    
+    def __init__(self, conn):
+        self._conn = conn
+    
+    def commit(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _profiled(conn, profile):
+    """Wrap conn for the SQL profiler when the current request is sampled"""
+    return conn if profile is None else profile.wrap(conn)
+
+def _connection_scope():
+    """Where the shared connection lives: flask.g inside an app set up with
+    init_app, otherwise the current thread"""
+    if has_app_context() and 'habitstack_db' in current_app.extensions:
+        return g
+    return _thread_connections
+
 @contextmanager
 def get_db():
-    """Get database connection from pool with proper cleanup"""
-    pool = get_connection_pool()
-    conn = pool.get_connection()
+    """Get a database connection, reusing the one already held by the
+    current request (or, outside a request, by an enclosing get_db)"""
+    scope = _connection_scope()
+    request_scoped = scope is not _thread_connections
+    transactional = request_scoped and DB_TRANSACTION_PER_REQUEST
+    
+    if getattr(scope, '_db_conn', None) is None:
+        scope._db_conn = get_connection_pool().get_connection()
+        scope._db_depth = 0
+        scope._db_failed = False
+        if request_scoped:
+            scope._db_checkouts = getattr(scope, '_db_checkouts', 0) + 1
+        if transactional:
+            scope._db_conn.execute("BEGIN")
+    
+    conn = scope._db_conn
+    scope._db_depth += 1
+    savepoint = f"get_db_{scope._db_depth}"
+    profile = getattr(scope, '_sql_profile', None)
+    
     try:
-        yield conn
+        if transactional:
+            # Each block can still fail on its own without losing the rest of the request
+            conn.execute(f"SAVEPOINT {savepoint}")
+            yield _profiled(_DeferredCommitConnection(conn), profile)
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            yield _profiled(conn, profile)
+    except Exception:
+        scope._db_failed = True
+        if transactional:
+            try:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            except sqlite3.Error:
+                pass
+        else:
+            # Don't let a later block's commit() save this block's partial writes
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+        raise
     finally:
-        pool.return_connection(conn)
+        scope._db_depth -= 1
+        if scope._db_depth == 0 and not request_scoped:
+            scope._db_conn = None
+            get_connection_pool().return_connection(conn, failed=scope._db_failed)
 
-def init_db():
-    """Initialize database tables with WAL mode"""
-    with get_db() as conn:
-        # Enable WAL mode (will be applied to all subsequent connections via pool)
-        conn.execute("PRAGMA journal_mode=WAL")
-        
-        # Create tables
-        conn.executescript("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                deleted_at TIMESTAMP NULL
-            );
-            
-            CREATE TABLE IF NOT EXISTS habits (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                description TEXT,
-                points INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS habit_completions (
-                id INTEGER PRIMARY KEY,
-                habit_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                completion_date DATE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (habit_id) REFERENCES habits (id),
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(habit_id, completion_date)
-            );
-            
-            CREATE TABLE IF NOT EXISTS daily_notes (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                note_date DATE NOT NULL,
-                content TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(user_id, note_date)
-            );
-            
-            CREATE TABLE IF NOT EXISTS birthdays (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                birth_date DATE NOT NULL,
-                relationship_type TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS watchlist (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                type TEXT NOT NULL,
-                genre TEXT,
-                status TEXT NOT NULL DEFAULT 'want_to_watch',
-                priority TEXT DEFAULT 'medium',
-                rating INTEGER,
-                notes TEXT,
-                current_episode INTEGER DEFAULT 0,
-                total_episodes INTEGER,
-                release_year INTEGER,
-                date_added DATE DEFAULT CURRENT_DATE,
-                date_completed DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
-        
-        # Create todos table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS todos (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority TEXT DEFAULT 'medium',
-                due_date DATE,
-                category TEXT,
-                completed BOOLEAN DEFAULT 0,
-                completed_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                deleted_at TIMESTAMP NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
-        
-        # Create reading_list table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS reading_list (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                author TEXT NOT NULL,
-                total_pages INTEGER,
-                current_page INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'want_to_read',
-                rating INTEGER,
-                notes TEXT,
-                date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                date_completed TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                deleted_at TIMESTAMP NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
-        
-        # Create sports_news table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS sports_news (
-                id INTEGER PRIMARY KEY,
-                title TEXT NOT NULL,
-                link TEXT,
-                source TEXT NOT NULL,
-                published TEXT,
-                summary TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(title, source)
-            );
-        """)
-        
-        # Add deleted_at column to existing users table if it doesn't exist
+@contextmanager
+def get_read_db():
+    """Get a read-only connection for queries, shared the same way as get_db
+    
+    Falls back to get_db when the read pool is disabled or cannot open the
+    database, and in transaction-per-request mode, where reads must see the
+    request's uncommitted writes.
+    """
+    if not DB_READ_POOL or DB_TRANSACTION_PER_REQUEST:
+        with get_db() as conn:
+            yield conn
+        return
+    
+    scope = _connection_scope()
+    request_scoped = scope is not _thread_connections
+    
+    if getattr(scope, '_db_read_conn', None) is None:
+        conn = get_read_pool().get_connection()
+        if conn is None:
+            with get_db() as conn:
+                yield conn
+            return
+        scope._db_read_conn = conn
+        scope._db_read_depth = 0
+        scope._db_read_failed = False
+        if request_scoped:
+            scope._db_read_checkouts = getattr(scope, '_db_read_checkouts', 0) + 1
+    
+    conn = scope._db_read_conn
+    scope._db_read_depth += 1
+    try:
+        yield _profiled(conn, getattr(scope, '_sql_profile', None))
+    except Exception:
+        scope._db_read_failed = True
+        raise
+    finally:
+        scope._db_read_depth -= 1
+        if scope._db_read_depth == 0 and not request_scoped:
+            scope._db_read_conn = None
+            get_read_pool().return_connection(conn, failed=scope._db_read_failed)
+
+def _teardown_db(exc):
+    """Return the request's connection to the pool, committing or rolling
+    back the request's transaction if transaction-per-request is on"""
+    read_conn = g.pop('_db_read_conn', None)
+    if read_conn is not None:
+        read_pool = get_read_pool()
+        read_pool.return_connection(read_conn, failed=g.pop('_db_read_failed', False) or exc is not None)
+        read_pool.record_request(g.pop('_db_read_checkouts', 0))
+    
+    conn = g.pop('_db_conn', None)
+    checkouts = g.pop('_db_checkouts', 0)
+    if conn is None:
+        return
+    
+    failed = g.pop('_db_failed', False) or exc is not None
+    if DB_TRANSACTION_PER_REQUEST:
         try:
-            conn.execute("ALTER TABLE users ADD COLUMN deleted_at TIMESTAMP NULL")
-            conn.commit()
-        except sqlite3.OperationalError:
-            # Column already exists, ignore
-            pass
-        
-        # Add encryption_salt column to existing users table if it doesn't exist
+            if exc is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        except sqlite3.Error:
+            failed = True
+    
+    pool = get_connection_pool()
+    pool.return_connection(conn, failed=failed)
+    pool.record_request(checkouts)
+
+def init_app(app):
+    """Bind get_db connections to the app's requests (one checkout per request)"""
+    app.extensions['habitstack_db'] = True
+    app.teardown_appcontext(_teardown_db)
+
+class WriteQueueTimeout(Exception):
+    """Raised when a queued write did not complete within DB_WRITE_TIMEOUT"""
+
+
+class SQLiteWriteQueue:
+    """Single writer thread that owns one connection and applies queued write
+    units in batches, one transaction (and one fsync) per batch
+    
+    Each unit runs inside its own SAVEPOINT, so a unit that raises is rolled
+    back without affecting the rest of its batch. Callers wait for the batch
+    to commit before they see their unit's result.
+    """
+    
+    def __init__(self, database_path, batch_size=DB_WRITE_BATCH_SIZE, timeout=DB_WRITE_TIMEOUT):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.commit_latency = LatencyHistogram()
+        self.wait_latency = LatencyHistogram()
+        self._batches = 0
+        self._units = 0
+        self._failed_units = 0
+        self._timeouts = 0
+        self._max_batch = 0
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+    
+    def submit(self, fn):
+        """Queue fn(conn) and wait for its result once its batch has committed"""
+        future = Future()
+        self.queue.put((fn, future, time.perf_counter()))
         try:
-            conn.execute("ALTER TABLE users ADD COLUMN encryption_salt BLOB")
-            conn.commit()
-        except sqlite3.OperationalError:
-            # Column already exists, ignore
-            pass
-        
-        # Create encryptable_fields table for dynamic field registry
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS encryptable_fields (
-                id INTEGER PRIMARY KEY,
-                module_name TEXT NOT NULL,
-                field_name TEXT NOT NULL,
-                field_display_name TEXT NOT NULL,
-                field_description TEXT,
-                recommended_encrypt BOOLEAN DEFAULT 1,
-                added_version TEXT DEFAULT '1.0',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(module_name, field_name)
-            );
-        """)
-        
-        # Create user_encryption_preferences table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS user_encryption_preferences (
-                user_id INTEGER NOT NULL,
-                field_name TEXT NOT NULL,
-                encrypted BOOLEAN DEFAULT 0,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, field_name),
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # A unit that has not started yet is dropped; one in flight still completes
+            future.cancel()
+            with self.lock:
+                self._timeouts += 1
+            raise WriteQueueTimeout("Database write timed out")
+    
+    def stop(self):
+        """Stop the writer thread after the queued units have been applied"""
+        self.queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        conn = open_connection(self.database_path)
+        # Transactions are managed explicitly below
+        conn.isolation_level = None
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            
+            stopping = batch[-1] is None
+            units = [unit for unit in batch if unit is not None]
+            if units:
+                self._apply(conn, units)
+            if stopping:
+                conn.close()
+                return
+    
+    def _apply(self, conn, units):
+        """Apply one batch of units in a single transaction"""
+        started = time.perf_counter()
+        proxy = _DeferredCommitConnection(conn)
+        done = []
+        failed = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future, submitted in units:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.wait_latency.observe((started - submitted) * 1000)
+                conn.execute("SAVEPOINT write_unit")
+                try:
+                    result = fn(proxy)
+                    conn.execute("RELEASE write_unit")
+                    done.append((future, result))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_unit")
+                    conn.execute("RELEASE write_unit")
+                    future.set_exception(e)
+                    failed += 1
+            conn.execute("COMMIT")
+        except Exception as e:
+            # The batch could not be committed; nothing in it was applied
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, future, _ in units:
+                if not future.done():
+                    if future.running() or future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            done = []
+            failed = len(units)
         
-        # Create indexes for better performance
-        conn.executescript("""
-            CREATE INDEX IF NOT EXISTS idx_habits_user_id ON habits(user_id);
-            CREATE INDEX IF NOT EXISTS idx_completions_habit_date ON habit_completions(habit_id, completion_date);
-            CREATE INDEX IF NOT EXISTS idx_completions_user_date ON habit_completions(user_id, completion_date);
-            CREATE INDEX IF NOT EXISTS idx_notes_user_date ON daily_notes(user_id, note_date);
-            CREATE INDEX IF NOT EXISTS idx_birthdays_user_id ON birthdays(user_id);
-            CREATE INDEX IF NOT EXISTS idx_birthdays_birth_date ON birthdays(birth_date);
-            CREATE INDEX IF NOT EXISTS idx_watchlist_user_id ON watchlist(user_id);
-            CREATE INDEX IF NOT EXISTS idx_watchlist_status ON watchlist(status);
-            CREATE INDEX IF NOT EXISTS idx_watchlist_type ON watchlist(type);
-            CREATE INDEX IF NOT EXISTS idx_users_deleted ON users(deleted_at);
-            CREATE INDEX IF NOT EXISTS idx_todos_user_id ON todos(user_id);
-            CREATE INDEX IF NOT EXISTS idx_todos_due_date ON todos(due_date);
-            CREATE INDEX IF NOT EXISTS idx_todos_priority ON todos(priority);
-            CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos(completed);
-            CREATE INDEX IF NOT EXISTS idx_todos_deleted ON todos(deleted_at);
-            CREATE INDEX IF NOT EXISTS idx_reading_user_id ON reading_list(user_id);
-            CREATE INDEX IF NOT EXISTS idx_reading_status ON reading_list(status);
-            CREATE INDEX IF NOT EXISTS idx_reading_deleted ON reading_list(deleted_at);
-            CREATE INDEX IF NOT EXISTS idx_reading_user_status ON reading_list(user_id, status, deleted_at);
-            CREATE INDEX IF NOT EXISTS idx_sports_news_created_at ON sports_news(created_at);
-            CREATE INDEX IF NOT EXISTS idx_sports_news_source ON sports_news(source);
-            CREATE INDEX IF NOT EXISTS idx_encryption_prefs_user ON user_encryption_preferences(user_id);
-            CREATE INDEX IF NOT EXISTS idx_encryptable_fields_module ON encryptable_fields(module_name);
-        """)
+        for future, result in done:
+            future.set_result(result)
         
+        self.commit_latency.observe((time.perf_counter() - started) * 1000)
+        with self.lock:
+            self._batches += 1
+            self._units += len(units)
+            self._failed_units += failed
+            self._max_batch = max(self._max_batch, len(units))
+    
+    def get_stats(self) -> dict:
+        """Get writer counters and latency histograms"""
+        with self.lock:
+            stats = {
+                'queue_depth': self.queue.qsize(),
+                'batches': self._batches,
+                'units': self._units,
+                'failed_units': self._failed_units,
+                'timeouts': self._timeouts,
+                'avg_batch_size': self._units / self._batches if self._batches else 0.0,
+                'max_batch_size': self._max_batch
+            }
+        stats['commit_latency'] = self.commit_latency.snapshot()
+        stats['wait_latency'] = self.wait_latency.snapshot()
+        return stats
+
+# Global writer instance (only started when DB_WRITE_QUEUE is on)
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue():
+    """Get the global writer, starting it if necessary"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = SQLiteWriteQueue(DB_PATH)
+        return _write_queue
+
+def get_pool_stats():
+    """Stats for the connection pools and the writer that have been started"""
+    stats = {}
+    if _connection_pool is not None:
+        stats['main'] = _connection_pool.get_stats()
+    if _read_pool is not None:
+        stats['read'] = _read_pool.get_stats()
+    if _write_queue is not None:
+        stats['writer'] = _write_queue.get_stats()
+    return stats
+
+def run_write(fn):
+    """Run fn(conn) as one write unit and return its result
+    
+    With DB_WRITE_QUEUE on, the unit is applied by the writer thread (fn must
+    only use the connection it is given and must not call get_db). Otherwise,
+    or inside a transaction-per-request, it runs on get_db() and is committed
+    here. fn should not commit itself.
+    """
+    if DB_WRITE_QUEUE and not DB_TRANSACTION_PER_REQUEST:
+        return get_write_queue().submit(fn)
+    
+    with get_db() as conn:
+        result = fn(conn)
         conn.commit()
+        return result
+
+# Autocommit connection for lease claims, kept out of the pools and the writer
+# so that background jobs renewing leases don't count as app activity
+_lease_conn = None
+_lease_lock = threading.Lock()
+
+def _run_lease(fn):
+    """Run fn(conn) on the lease connection and return its result"""
+    global _lease_conn
+    with _lease_lock:
+        if _lease_conn is None:
+            _lease_conn = open_connection(DB_PATH)
+            _lease_conn.isolation_level = None
+        try:
+            return fn(_lease_conn)
+        except sqlite3.Error:
+            _lease_conn.close()
+            _lease_conn = None
+            raise
+
+def acquire_lease(name, owner, ttl, conn=None):
+    """Take or renew the scheduler_leases row for name; True if owner holds it for ttl seconds
+    
+    Lets one of several processes sharing the database run a background job.
+    The holder renews well before expiry; if it dies, another process takes
+    over once the lease has lapsed. Pass an autocommit conn to claim it on
+    that connection instead of the shared lease connection.
+    """
+    now = time.time()
+    
+    def claim(conn):
+        return conn.execute("""
+            INSERT INTO scheduler_leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE scheduler_leases.owner = excluded.owner OR scheduler_leases.expires_at < ?
+        """, (name, owner, now + ttl, now)).rowcount
+    
+    if conn is not None:
+        return claim(conn) > 0
+    return _run_lease(claim) > 0
+
+def release_lease(name, owner):
+    """Give up a lease early so another process can take it at once"""
+    _run_lease(lambda conn: conn.execute(
+        "DELETE FROM scheduler_leases WHERE name = ? AND owner = ?", (name, owner)
+    ))
+
+def init_db():
+    """Bring the database schema up to date (see schema_migrations.py)"""
+    from schema_migrations import migrate
+    
+    conn = open_connection(DB_PATH)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 def close_db_pool():
     """Close the connection pool (useful for testing or shutdown)"""
-    global _connection_pool
+    global _connection_pool, _read_pool, _write_queue, _lease_conn
     if _connection_pool:
         _connection_pool.close_all()
-        _connection_pool = None
\ No newline at end of file
+        _connection_pool = None
+    if _read_pool:
+        _read_pool.close_all()
+        _read_pool = None
+    with _write_queue_lock:
+        if _write_queue:
+            _write_queue.stop()
+            _write_queue = None
+    with _lease_lock:
+        if _lease_conn is not None:
+            _lease_conn.close()
+            _lease_conn = None
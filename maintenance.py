@@ -0,0 +1,297 @@
+"""
+Background database maintenance for HabitStack
+
+A daemon thread wakes every MAINTENANCE_INTERVAL seconds. It keeps the WAL
+from growing without bound: once the -wal file passes WAL_CHECKPOINT_BYTES it
+runs a PASSIVE checkpoint, which never blocks readers or writers. When that
+copies every frame back into the database, a TRUNCATE checkpoint follows to
+shrink the file again. The TRUNCATE waits at most MAINTENANCE_BUSY_TIMEOUT
+for readers to finish and is retried on a later tick.
+
+Only one process runs maintenance at a time: each tick first takes or renews
+the 'db_maintenance' lease in scheduler_leases (as news_refresher.py does),
+and the other gunicorn workers skip the tick. The app counts as idle when
+this worker served no requests that used the database, wrote no rows and
+queued no writes since the previous tick, and no connection is in use.
+Lease renewals (this one and the news refresher's) and background reads are
+not activity, so the refresher does not keep the app busy forever. Requests
+served by the other workers are not seen; each vacuum step is short and
+waits at most MAINTENANCE_BUSY_TIMEOUT for their writes. When idle, pages
+freed by deletes are returned to the filesystem with
+PRAGMA incremental_vacuum, a few hundred pages at a time, within
+VACUUM_BUDGET_SECONDS per tick, and a checkpoint moves the shorter file
+into place. That needs auto_vacuum=INCREMENTAL, which open_connection sets on
+new databases; an existing database has to be converted once while the app
+is stopped:
+
+    uv run python maintenance.py --enable-incremental-vacuum
+
+Usage: uv run python maintenance.py [--enable-incremental-vacuum]   (without it: one pass now)
+"""
+
+import os
+import sys
+import json
+import socket
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, Optional
+import database
+from database import LatencyHistogram, open_connection, get_pool_stats, acquire_lease, release_lease
+
+# Enable with MAINTENANCE_ENABLED=1 (the default); 0 leaves checkpoints to SQLite
+MAINTENANCE_ENABLED = os.environ.get('MAINTENANCE_ENABLED', '1') == '1'
+MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', 30))
+MAINTENANCE_BUSY_TIMEOUT = float(os.environ.get('MAINTENANCE_BUSY_TIMEOUT', 1))
+MAINTENANCE_LEASE_SECONDS = float(os.environ.get('MAINTENANCE_LEASE_SECONDS', max(90, 3 * MAINTENANCE_INTERVAL)))
+
+# Checkpoint once the WAL file is larger than this
+WAL_CHECKPOINT_BYTES = int(os.environ.get('WAL_CHECKPOINT_BYTES', 64 * 1024 * 1024))
+
+# Vacuum when the freelist has at least VACUUM_MIN_FREE_PAGES, VACUUM_STEP_PAGES at a time
+VACUUM_MIN_FREE_PAGES = int(os.environ.get('VACUUM_MIN_FREE_PAGES', 1024))
+VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', 256))
+VACUUM_BUDGET_SECONDS = float(os.environ.get('VACUUM_BUDGET_SECONDS', 2))
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+LEASE_NAME = 'db_maintenance'
+
+
+class MaintenanceScheduler:
+    """Runs WAL checkpoints and idle-time incremental vacuum on a daemon thread"""
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL,
+                 wal_checkpoint_bytes: int = WAL_CHECKPOINT_BYTES,
+                 vacuum_min_free_pages: int = VACUUM_MIN_FREE_PAGES,
+                 vacuum_step_pages: int = VACUUM_STEP_PAGES,
+                 vacuum_budget_seconds: float = VACUUM_BUDGET_SECONDS,
+                 lease_seconds: float = MAINTENANCE_LEASE_SECONDS):
+        self.logger = logging.getLogger(__name__)
+        self.interval = interval
+        self.wal_checkpoint_bytes = wal_checkpoint_bytes
+        self.vacuum_min_free_pages = vacuum_min_free_pages
+        self.vacuum_step_pages = vacuum_step_pages
+        self.vacuum_budget_seconds = vacuum_budget_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader = False
+        self._conn = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_activity = None
+        self.checkpoint_latency = LatencyHistogram()
+        self.vacuum_latency = LatencyHistogram()
+        self._stats = {
+            'runs': 0,
+            'skipped_not_leader': 0,
+            'wal_bytes': 0,
+            'max_wal_bytes': 0,
+            'passive_checkpoints': 0,
+            'truncate_checkpoints': 0,
+            'busy_checkpoints': 0,
+            'frames_checkpointed': 0,
+            'last_checkpoint_ms': 0.0,
+            'auto_vacuum': None,
+            'page_size': 0,
+            'freelist_pages': 0,
+            'vacuum_runs': 0,
+            'pages_vacuumed': 0,
+            'idle_ticks': 0,
+            'errors': 0
+        }
+
+    def init_app(self, app):
+        """Start the scheduler with the app's first request (after any fork)"""
+        if not MAINTENANCE_ENABLED:
+            return
+        app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        """Start the maintenance thread if it is not running"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the thread, hand the lease over and close the connection"""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        if self._leader:
+            release_lease(LEASE_NAME, self.owner)
+            self._leader = False
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                self.logger.error(f"Database maintenance failed: {e}")
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+    def _connection(self):
+        """The scheduler's own autocommit connection (kept out of the pools' stats)"""
+        if self._conn is None:
+            conn = open_connection(database.DB_PATH, timeout=MAINTENANCE_BUSY_TIMEOUT)
+            conn.isolation_level = None
+            self._conn = conn
+        return self._conn
+
+    def run_once(self, vacuum: Optional[bool] = None) -> Dict:
+        """One maintenance pass: checkpoint if the WAL is large, vacuum if idle
+        (or as told by vacuum). Does nothing unless this process holds the lease"""
+        conn = self._connection()
+        # Renewed on our own connection so the commit stays out of the pools' stats
+        self._leader = acquire_lease(LEASE_NAME, self.owner, self.lease_seconds, conn=conn)
+        if not self._leader:
+            with self._lock:
+                self._stats['skipped_not_leader'] += 1
+            # Another worker's activity would be missed; start afresh if we take over
+            self._last_activity = None
+            return self.get_stats()
+
+        wal_bytes = self._wal_bytes()
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['wal_bytes'] = wal_bytes
+            self._stats['max_wal_bytes'] = max(self._stats['max_wal_bytes'], wal_bytes)
+
+        if wal_bytes >= self.wal_checkpoint_bytes:
+            busy, frames, checkpointed = self._checkpoint(conn, 'PASSIVE')
+            # Everything is back in the database: shrink the file as well
+            if not busy and frames == checkpointed:
+                self._checkpoint(conn, 'TRUNCATE')
+            with self._lock:
+                self._stats['wal_bytes'] = self._wal_bytes()
+
+        if vacuum is None:
+            vacuum = self._idle()
+            if vacuum:
+                with self._lock:
+                    self._stats['idle_ticks'] += 1
+        if vacuum:
+            self._vacuum(conn)
+
+        return self.get_stats()
+
+    def _wal_bytes(self) -> int:
+        try:
+            return os.path.getsize(f"{database.DB_PATH}-wal")
+        except OSError:
+            return 0
+
+    def _checkpoint(self, conn, mode: str):
+        """Run PRAGMA wal_checkpoint(mode), returning (busy, wal frames, frames checkpointed)"""
+        started = time.perf_counter()
+        busy, frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        ms = (time.perf_counter() - started) * 1000
+        self.checkpoint_latency.observe(ms)
+
+        with self._lock:
+            self._stats[f"{mode.lower()}_checkpoints"] += 1
+            self._stats['last_checkpoint_ms'] = ms
+            if busy:
+                self._stats['busy_checkpoints'] += 1
+            if checkpointed > 0:
+                self._stats['frames_checkpointed'] += checkpointed
+        self._log('db_wal_checkpoint', {'mode': mode, 'busy': busy, 'wal_frames': frames,
+                                        'checkpointed': checkpointed, 'ms': round(ms, 3)})
+        return busy, frames, checkpointed
+
+    def _idle(self) -> bool:
+        """No connections in use, and no requests, rows written or queued writes
+        in this process since the last tick"""
+        stats = get_pool_stats()
+        pools = [stats[name] for name in ('main', 'read') if name in stats]
+        activity = (tuple(pool['requests'] for pool in pools),
+                    tuple(pool['rows_written'] for pool in pools),
+                    stats['writer']['units'] + stats['writer']['queue_depth'] if 'writer' in stats else 0)
+        previous, self._last_activity = self._last_activity, activity
+        return activity == previous and not any(pool['in_use'] for pool in pools)
+
+    def _vacuum(self, conn):
+        """Release free pages in small steps until the freelist is short or the budget runs out"""
+        mode = AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        with self._lock:
+            self._stats.update(auto_vacuum=mode, page_size=page_size, freelist_pages=free_pages)
+        if mode != 'incremental' or free_pages < self.vacuum_min_free_pages:
+            return
+
+        deadline = time.monotonic() + self.vacuum_budget_seconds
+        started = time.perf_counter()
+        before = free_pages
+        while free_pages > 0 and time.monotonic() < deadline and not self._stop.is_set():
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_step_pages})").fetchall()
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        ms = (time.perf_counter() - started) * 1000
+        self.vacuum_latency.observe(ms)
+
+        with self._lock:
+            self._stats['vacuum_runs'] += 1
+            self._stats['pages_vacuumed'] += before - free_pages
+            self._stats['freelist_pages'] = free_pages
+        # The shorter database only reaches the main file at the next checkpoint
+        if before > free_pages:
+            self._checkpoint(conn, 'PASSIVE')
+        self._log('db_incremental_vacuum', {'pages': before - free_pages, 'freelist_pages': free_pages,
+                                            'bytes': (before - free_pages) * page_size, 'ms': round(ms, 3)})
+
+    def get_stats(self) -> Dict:
+        """WAL size, checkpoint and vacuum counters and latency histograms"""
+        with self._lock:
+            stats = dict(self._stats, running=self._thread is not None, leader=self._leader,
+                         owner=self.owner, wal_checkpoint_bytes=self.wal_checkpoint_bytes)
+        stats['checkpoint_latency'] = self.checkpoint_latency.snapshot()
+        stats['vacuum_latency'] = self.vacuum_latency.snapshot()
+        return stats
+
+    def _log(self, event: str, fields: Dict):
+        self.logger.info(json.dumps({'event': event, **fields}))
+
+
+def enable_incremental_vacuum(path: Optional[str] = None):
+    """Switch an existing database to auto_vacuum=INCREMENTAL (rewrites the whole file)"""
+    conn = open_connection(path or database.DB_PATH)
+    try:
+        conn.isolation_level = None
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    finally:
+        conn.close()
+
+
+# Global maintenance scheduler instance
+maintenance_scheduler = MaintenanceScheduler()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if '--enable-incremental-vacuum' in sys.argv[1:]:
+        print(f"auto_vacuum is now {enable_incremental_vacuum()}")
+    else:
+        # One pass now: checkpoint whatever is in the WAL and vacuum regardless of load
+        scheduler = MaintenanceScheduler(wal_checkpoint_bytes=0)
+        print(json.dumps(scheduler.run_once(vacuum=True), indent=2))
+        scheduler.stop()
@@ -4,6 +4,7 @@ Models package for HabitStack application
 This package provides all the data models:
 - User: Authentication and user management
 - Habit: Habit tracking and completion management
+- HabitHistory: Optional compact bitmap store of habit completions
 - DailyNote: Daily journaling functionality
 - Todo: Task management and tracking
 - Reading: Book and reading list management
@@ -14,6 +15,7 @@ This package provides all the data models:
 
 from .user import User
 from .habit import Habit
+from .habit_history import HabitHistory
 from .note import DailyNote
 from .todo import Todo
 from .reading import Reading
@@ -22,4 +24,4 @@ from .watchlist import Watchlist
 from .sports import SportsNews
 from .data_manager import DataExporter, DataImporter
 
-__all__ = ['User', 'Habit', 'DailyNote', 'Todo', 'Reading', 'Birthday', 'Watchlist', 'SportsNews', 'DataExporter', 'DataImporter']
\ No newline at end of file
+__all__ = ['User', 'Habit', 'HabitHistory', 'DailyNote', 'Todo', 'Reading', 'Birthday', 'Watchlist', 'SportsNews', 'DataExporter', 'DataImporter']
\ No newline at end of file
@@ -124,18 +124,19 @@ class EncryptedModelMixin:
         if not encryption_key:
             _, encryption_key = self._get_user_session_data()
         
-        result = []
-        for item in items:
-            processed_item = dict(item) if hasattr(item, 'keys') else item
-            
-            # Decrypt each mapped field
-            for field_name, db_column in field_mapping.items():
-                if db_column in processed_item and processed_item[db_column] is not None:
-                    processed_item[field_name] = self._smart_decrypt_field(
-                        str(processed_item[db_column]), encryption_key
-                    )
-            
-            result.append(processed_item)
+        result = [dict(item) if hasattr(item, 'keys') else item for item in items]
+        
+        if not encryption_key:
+            return result
+        
+        # Decrypt one column at a time so the whole batch shares one cipher
+        for field_name, db_column in field_mapping.items():
+            rows = [item for item in result if db_column in item and item[db_column] is not None]
+            values = encryption_manager.decrypt_many(
+                [str(item[db_column]) for item in rows], encryption_key
+            )
+            for item, value in zip(rows, values):
+                item[field_name] = value
         
         return result
     
@@ -4,7 +4,8 @@ Birthday model for birthday reminders
 
 from datetime import datetime, date
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
 
 
@@ -22,12 +23,8 @@ class Birthday(EncryptedModelMixin):
         """Get all birthdays for a user with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            birthdays = conn.execute("""
-                SELECT * FROM birthdays 
-                WHERE user_id = ?
-                ORDER BY substr(birth_date, 6)
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            birthdays = conn.execute(queries.BIRTHDAYS_BY_DAY_OF_YEAR, (user_id,)).fetchall()
             
             result = []
             today = date.today()
@@ -60,11 +57,8 @@ class Birthday(EncryptedModelMixin):
         """Get upcoming birthdays within specified days with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            birthdays = conn.execute("""
-                SELECT * FROM birthdays 
-                WHERE user_id = ?
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            birthdays = conn.execute(queries.BIRTHDAYS_FOR_USER, (user_id,)).fetchall()
             
             result = []
             today = date.today()
@@ -105,13 +99,8 @@ class Birthday(EncryptedModelMixin):
         """Get today's birthdays with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            birthdays = conn.execute("""
-                SELECT * FROM birthdays 
-                WHERE user_id = ?
-                  AND substr(birth_date, 6) = substr(date('now'), 6)
-                ORDER BY name
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            birthdays = conn.execute(queries.BIRTHDAYS_TODAY, (user_id,)).fetchall()
             
             result = []
             for birthday in birthdays:
@@ -130,9 +119,9 @@ class Birthday(EncryptedModelMixin):
         """Get a specific birthday with decryption"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             birthday = conn.execute(
-                "SELECT * FROM birthdays WHERE id = ? AND user_id = ?",
+                queries.BIRTHDAY_BY_ID,
                 (birthday_id, user_id)
             ).fetchone()
             
@@ -4,14 +4,16 @@ Data export and import management for HabitStack
 
 from datetime import datetime
 from typing import Dict, List, Any
-from database import get_db
+from database import get_db, get_read_db
 from .habit import Habit
+from .habit_history import HabitHistory
 from .note import DailyNote
 from .todo import Todo
 from .reading import Reading
 from .birthday import Birthday
 from .watchlist import Watchlist
 from utils.encryption import encryption_manager
+from utils.bulk_crypto import bulk_crypto
 from utils.preferences import preference_manager
 from utils.field_registry import field_registry
 from flask import session
@@ -142,7 +144,7 @@ class DataExporter:
         """Get count of items in each module for user"""
         counts = {}
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             # Habits
             result = conn.execute("SELECT COUNT(*) as count FROM habits WHERE user_id = ?", (user_id,)).fetchone()
             counts['habits'] = result['count'] if result else 0
@@ -176,7 +178,7 @@ class DataExporter:
     @staticmethod
     def _export_habits(user_id: int) -> List[Dict]:
         """Export user habits"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             habits = conn.execute("""
                 SELECT id, name, description, points, created_at 
                 FROM habits 
@@ -189,7 +191,7 @@ class DataExporter:
     @staticmethod
     def _export_habit_completions(user_id: int) -> List[Dict]:
         """Export habit completion records"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             completions = conn.execute("""
                 SELECT hc.habit_id, hc.completion_date, hc.created_at
                 FROM habit_completions hc
@@ -203,7 +205,7 @@ class DataExporter:
     @staticmethod
     def _export_notes(user_id: int) -> List[Dict]:
         """Export daily notes"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             notes = conn.execute("""
                 SELECT note_date, content, created_at, updated_at
                 FROM daily_notes 
@@ -216,7 +218,7 @@ class DataExporter:
     @staticmethod
     def _export_todos(user_id: int) -> List[Dict]:
         """Export todos"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             todos = conn.execute("""
                 SELECT title, description, priority, due_date, category, 
                        completed, completed_at, created_at, updated_at
@@ -230,7 +232,7 @@ class DataExporter:
     @staticmethod
     def _export_reading(user_id: int) -> List[Dict]:
         """Export reading list"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             books = conn.execute("""
                 SELECT title, author, total_pages, current_page, status, rating, notes,
                        date_added, date_completed, created_at, updated_at
@@ -244,7 +246,7 @@ class DataExporter:
     @staticmethod
     def _export_birthdays(user_id: int) -> List[Dict]:
         """Export birthdays"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             birthdays = conn.execute("""
                 SELECT name, birth_date, relationship_type, notes, created_at
                 FROM birthdays 
@@ -257,7 +259,7 @@ class DataExporter:
     @staticmethod
     def _export_watchlist(user_id: int) -> List[Dict]:
         """Export watchlist items"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             watchlist = conn.execute("""
                 SELECT title, type, genre, status, priority, rating, notes,
                        current_episode, total_episodes, release_year,
@@ -273,7 +275,7 @@ class DataExporter:
     @staticmethod
     def _export_habits_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export habits with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             habits = conn.execute("""
                 SELECT name, description, points, created_at
                 FROM habits 
@@ -281,21 +283,12 @@ class DataExporter:
                 ORDER BY created_at
             """, (user_id,)).fetchall()
             
-            result = []
-            for habit in habits:
-                habit_dict = dict(habit)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    habit_dict['name'] = encryption_manager.smart_decrypt(habit_dict['name'], encryption_key)
-                    habit_dict['description'] = encryption_manager.smart_decrypt(habit_dict['description'], encryption_key)
-                result.append(habit_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(habits, ['name', 'description'], encryption_key, 'habits')
     
     @staticmethod
     def _export_notes_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export notes with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             notes = conn.execute("""
                 SELECT note_date, content, created_at, updated_at
                 FROM daily_notes 
@@ -303,20 +296,12 @@ class DataExporter:
                 ORDER BY note_date
             """, (user_id,)).fetchall()
             
-            result = []
-            for note in notes:
-                note_dict = dict(note)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    note_dict['content'] = encryption_manager.smart_decrypt(note_dict['content'], encryption_key)
-                result.append(note_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(notes, ['content'], encryption_key, 'daily_notes')
     
     @staticmethod
     def _export_todos_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export todos with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             todos = conn.execute("""
                 SELECT title, description, priority, due_date, category, 
                        completed, completed_at, created_at, updated_at
@@ -325,22 +310,12 @@ class DataExporter:
                 ORDER BY created_at
             """, (user_id,)).fetchall()
             
-            result = []
-            for todo in todos:
-                todo_dict = dict(todo)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    todo_dict['title'] = encryption_manager.smart_decrypt(todo_dict['title'], encryption_key)
-                    todo_dict['description'] = encryption_manager.smart_decrypt(todo_dict['description'], encryption_key)
-                    todo_dict['category'] = encryption_manager.smart_decrypt(todo_dict['category'], encryption_key)
-                result.append(todo_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(todos, ['title', 'description', 'category'], encryption_key, 'todos')
     
     @staticmethod
     def _export_reading_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export reading list with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             books = conn.execute("""
                 SELECT title, author, total_pages, current_page, status, rating, notes,
                        date_added, date_completed, created_at, updated_at
@@ -349,20 +324,12 @@ class DataExporter:
                 ORDER BY created_at
             """, (user_id,)).fetchall()
             
-            result = []
-            for book in books:
-                book_dict = dict(book)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    book_dict['notes'] = encryption_manager.smart_decrypt(book_dict['notes'], encryption_key)
-                result.append(book_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(books, ['notes'], encryption_key, 'reading')
     
     @staticmethod
     def _export_birthdays_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export birthdays with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             birthdays = conn.execute("""
                 SELECT name, birth_date, relationship_type, notes, created_at
                 FROM birthdays 
@@ -370,21 +337,12 @@ class DataExporter:
                 ORDER BY substr(birth_date, 6)
             """, (user_id,)).fetchall()
             
-            result = []
-            for birthday in birthdays:
-                birthday_dict = dict(birthday)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    birthday_dict['name'] = encryption_manager.smart_decrypt(birthday_dict['name'], encryption_key)
-                    birthday_dict['notes'] = encryption_manager.smart_decrypt(birthday_dict['notes'], encryption_key)
-                result.append(birthday_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(birthdays, ['name', 'notes'], encryption_key, 'birthdays')
     
     @staticmethod
     def _export_watchlist_decrypted(user_id: int, encryption_key: bytes) -> List[Dict]:
         """Export watchlist with decryption"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             items = conn.execute("""
                 SELECT title, type, genre, status, priority, rating, notes,
                        current_episode, total_episodes, release_year, 
@@ -394,15 +352,7 @@ class DataExporter:
                 ORDER BY date_added DESC
             """, (user_id,)).fetchall()
             
-            result = []
-            for item in items:
-                item_dict = dict(item)
-                # Decrypt encrypted fields
-                if encryption_key:
-                    item_dict['notes'] = encryption_manager.smart_decrypt(item_dict['notes'], encryption_key)
-                result.append(item_dict)
-            
-            return result
+            return bulk_crypto.decrypt_rows(items, ['notes'], encryption_key, 'watchlist')
 
 
 class DataImporter:
@@ -512,6 +462,9 @@ class DataImporter:
         """Clear data for selected modules only"""
         with get_db() as conn:
             # Delete in order to respect foreign key constraints
+            if 'habit_completions' in modules or 'habits' in modules:
+                conn.execute("DELETE FROM habit_streaks WHERE user_id = ?", (user_id,))
+                HabitHistory.delete_user(conn, user_id)
             if 'habit_completions' in modules:
                 conn.execute("DELETE FROM habit_completions WHERE user_id = ?", (user_id,))
             if 'habits' in modules:
@@ -668,6 +621,8 @@ class DataImporter:
         """Clear all existing user data"""
         with get_db() as conn:
             # Delete in order to respect foreign key constraints
+            conn.execute("DELETE FROM habit_streaks WHERE user_id = ?", (user_id,))
+            HabitHistory.delete_user(conn, user_id)
             conn.execute("DELETE FROM habit_completions WHERE user_id = ?", (user_id,))
             conn.execute("DELETE FROM habits WHERE user_id = ?", (user_id,))
             conn.execute("DELETE FROM daily_notes WHERE user_id = ?", (user_id,))
@@ -700,6 +655,7 @@ class DataImporter:
                     """, (user_id, name, description, points))
                     
                     new_id = cursor.lastrowid
+                    Habit._save_streak(conn, new_id, user_id, 0, 0, None)
                     if old_id:
                         id_mapping[old_id] = new_id
                     count += 1
@@ -718,6 +674,7 @@ class DataImporter:
         
         count = 0
         id_mapping = DataImporter._habit_id_mapping
+        imported_habit_ids = set()
         
         with get_db() as conn:
             for completion in completions_data:
@@ -738,8 +695,15 @@ class DataImporter:
                             INSERT INTO habit_completions (habit_id, user_id, completion_date)
                             VALUES (?, ?, ?)
                         """, (new_habit_id, user_id, completion_date))
+                        imported_habit_ids.add(new_habit_id)
                         count += 1
             
+            # Keep materialized streaks in the same transaction
+            for habit_id in imported_habit_ids:
+                Habit.refresh_streak(conn, habit_id, user_id)
+                if HabitHistory.is_enabled():
+                    HabitHistory.rebuild_habit(conn, habit_id)
+            
             conn.commit()
         
         return f"{count} imported"
@@ -4,8 +4,10 @@ Habit model for habit management and tracking
 
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db, run_write
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
+from models.habit_history import HabitHistory
 
 
 class Habit(EncryptedModelMixin):
@@ -38,6 +40,7 @@ class Habit(EncryptedModelMixin):
                 "INSERT INTO habits (user_id, name, description, points) VALUES (?, ?, ?, ?)",
                 (user_id, encrypted_data['name'], encrypted_data['description'] or None, points)
             )
+            cls._save_streak(conn, cursor.lastrowid, user_id, 0, 0, None)
             conn.commit()
             return cursor.lastrowid
     
@@ -47,17 +50,11 @@ class Habit(EncryptedModelMixin):
         instance = cls()
         today = date.today().isoformat()
         
-        with get_db() as conn:
-            habits = conn.execute("""
-                SELECT h.*, 
-                       CASE WHEN hc.completion_date IS NOT NULL THEN 1 ELSE 0 END as completed_today
-                FROM habits h
-                LEFT JOIN habit_completions hc ON h.id = hc.habit_id AND hc.completion_date = ?
-                WHERE h.user_id = ?
-                ORDER BY h.created_at
-            """, (today, user_id)).fetchall()
+        with get_read_db() as conn:
+            habits = conn.execute(queries.HABITS_WITH_TODAY_STATUS, (today, user_id)).fetchall()
             
-            # Calculate streaks and decrypt fields
+            # Calculate all streaks in one pass and decrypt fields
+            streaks = cls.calculate_streaks(user_id)
             habits_with_streaks = []
             for habit in habits:
                 habit_dict = dict(habit)
@@ -68,9 +65,7 @@ class Habit(EncryptedModelMixin):
                 )
                 habit_dict.update(decrypted_data)
                 
-                # Calculate streak
-                streak = cls.calculate_streak(habit['id'])
-                habit_dict['current_streak'] = streak
+                habit_dict['current_streak'] = streaks.get(habit['id'], 0)
                 
                 habits_with_streaks.append(habit_dict)
             
@@ -81,19 +76,11 @@ class Habit(EncryptedModelMixin):
         """Get all habits for user with completion statistics and decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            habits = conn.execute("""
-                SELECT h.*, 
-                       COUNT(hc.id) as total_completions,
-                       MAX(hc.completion_date) as last_completed
-                FROM habits h
-                LEFT JOIN habit_completions hc ON h.id = hc.habit_id
-                WHERE h.user_id = ?
-                GROUP BY h.id
-                ORDER BY h.created_at
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            habits = conn.execute(queries.HABITS_WITH_STATS, (user_id,)).fetchall()
             
-            # Calculate current streaks and decrypt fields
+            # Calculate all current streaks in one pass and decrypt fields
+            streaks = cls.calculate_streaks(user_id)
             habits_with_stats = []
             for habit in habits:
                 habit_dict = dict(habit)
@@ -104,9 +91,7 @@ class Habit(EncryptedModelMixin):
                 )
                 habit_dict.update(decrypted_data)
                 
-                # Calculate streak
-                streak = cls.calculate_streak(habit['id'])
-                habit_dict['current_streak'] = streak
+                habit_dict['current_streak'] = streaks.get(habit['id'], 0)
                 
                 habits_with_stats.append(habit_dict)
             
@@ -117,9 +102,9 @@ class Habit(EncryptedModelMixin):
         """Get habit by ID with decryption, ensuring it belongs to user"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             habit = conn.execute(
-                "SELECT * FROM habits WHERE id = ? AND user_id = ?",
+                queries.HABIT_BY_ID,
                 (habit_id, user_id)
             ).fetchone()
             
@@ -177,8 +162,10 @@ class Habit(EncryptedModelMixin):
             if not habit:
                 return False
             
-            # Delete completions first (foreign key constraint)
+            # Delete completions and streak first (foreign key constraint)
             conn.execute("DELETE FROM habit_completions WHERE habit_id = ?", (habit_id,))
+            conn.execute("DELETE FROM habit_streaks WHERE habit_id = ?", (habit_id,))
+            HabitHistory.delete_habit(conn, habit_id)
             
             # Delete habit
             conn.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
@@ -190,7 +177,7 @@ class Habit(EncryptedModelMixin):
         """Toggle habit completion for today. Returns completion status or None if error"""
         today = date.today().isoformat()
         
-        with get_db() as conn:
+        def toggle(conn):
             # Verify habit belongs to user
             habit = conn.execute(
                 "SELECT * FROM habits WHERE id = ? AND user_id = ?",
@@ -212,28 +199,26 @@ class Habit(EncryptedModelMixin):
                     "DELETE FROM habit_completions WHERE habit_id = ? AND completion_date = ?",
                     (habit_id, today)
                 )
-                completed = False
-            else:
-                # Add completion
-                conn.execute(
-                    "INSERT INTO habit_completions (habit_id, user_id, completion_date) VALUES (?, ?, ?)",
-                    (habit_id, user_id, today)
-                )
-                completed = True
+                Habit.refresh_streak(conn, habit_id, user_id)
+                HabitHistory.sync_day(conn, habit_id, today, False)
+                return False
             
-            conn.commit()
-            return completed
+            # Add completion
+            conn.execute(
+                "INSERT INTO habit_completions (habit_id, user_id, completion_date) VALUES (?, ?, ?)",
+                (habit_id, user_id, today)
+            )
+            Habit.record_completion(conn, habit_id, user_id, today)
+            HabitHistory.sync_day(conn, habit_id, today, True)
+            return True
+        
+        return run_write(toggle)
     
     @staticmethod
     def calculate_streak(habit_id: int) -> int:
         """Calculate current streak for a habit"""
-        with get_db() as conn:
-            completions = conn.execute("""
-                SELECT completion_date 
-                FROM habit_completions 
-                WHERE habit_id = ? 
-                ORDER BY completion_date DESC
-            """, (habit_id,)).fetchall()
+        with get_read_db() as conn:
+            completions = conn.execute(queries.HABIT_COMPLETION_DATES, (habit_id,)).fetchall()
             
             if not completions:
                 return 0
@@ -257,17 +242,157 @@ class Habit(EncryptedModelMixin):
             
             return streak
     
+    @staticmethod
+    def calculate_streaks(user_id: int) -> Dict[int, int]:
+        """Get current streaks for all of a user's habits from the habit_streaks table.
+
+        Returns a mapping of habit_id to streak; habits without a streak are omitted.
+        Uses the same rule as calculate_streak: consecutive days ending today.
+        """
+        today = date.today().isoformat()
+        
+        with get_read_db() as conn:
+            rows = conn.execute(queries.HABIT_STREAKS_FOR_USER, (user_id,)).fetchall()
+        
+        # A habit whose row is missing, or whose next completion (dated in the
+        # future when the row was saved) is now due, is rebuilt as a write
+        if any(row['streak_habit_id'] is None
+               or (row['next_completion_date'] and row['next_completion_date'] <= today) for row in rows):
+            run_write(lambda conn: Habit._rebuild_streaks(conn, user_id))
+            with get_read_db() as conn:
+                rows = conn.execute(queries.HABIT_STREAKS_FOR_USER, (user_id,)).fetchall()
+        
+        return {
+            row['habit_id']: row['current_streak']
+            for row in rows
+            if row['last_completion_date'] == today and row['current_streak']
+        }
+    
+    @staticmethod
+    def _summarize_completions(completion_dates: List[str]) -> tuple[int, int, Optional[str], Optional[str]]:
+        """Return (streak ending at last completion, longest streak, last completion date,
+        first date after today) for completion dates sorted ascending; dates after
+        today are left out of the streaks until they are due"""
+        today = date.today().isoformat()
+        upcoming = [d for d in completion_dates if d > today]
+        completion_dates = [d for d in completion_dates if d <= today]
+        current = longest = 0
+        previous = None
+        
+        for completion_date in completion_dates:
+            day = datetime.strptime(completion_date, '%Y-%m-%d').date()
+            if previous is not None and day - previous == timedelta(days=1):
+                current += 1
+            elif day != previous:
+                current = 1
+            longest = max(longest, current)
+            previous = day
+        
+        last_completion = completion_dates[-1] if completion_dates else None
+        return current, longest, last_completion, upcoming[0] if upcoming else None
+    
+    @staticmethod
+    def _save_streak(conn, habit_id: int, user_id: int, current: int, longest: int,
+                     last_completion: Optional[str], next_completion: Optional[str] = None):
+        """Upsert a habit_streaks row (caller commits)"""
+        conn.execute("""
+            INSERT INTO habit_streaks (habit_id, user_id, current_streak, longest_streak,
+                                       last_completion_date, next_completion_date, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(habit_id) DO UPDATE SET
+                current_streak = excluded.current_streak,
+                longest_streak = excluded.longest_streak,
+                last_completion_date = excluded.last_completion_date,
+                next_completion_date = excluded.next_completion_date,
+                updated_at = excluded.updated_at
+        """, (habit_id, user_id, current, longest, last_completion, next_completion))
+    
+    @staticmethod
+    def refresh_streak(conn, habit_id: int, user_id: int):
+        """Recompute one habit's streak row from its completion history (caller commits)"""
+        completions = conn.execute("""
+            SELECT completion_date
+            FROM habit_completions
+            WHERE habit_id = ?
+            ORDER BY completion_date
+        """, (habit_id,)).fetchall()
+        
+        Habit._save_streak(conn, habit_id, user_id, *Habit._summarize_completions(
+            [row['completion_date'] for row in completions]
+        ))
+    
+    @staticmethod
+    def record_completion(conn, habit_id: int, user_id: int, completion_date: str):
+        """Extend a habit's streak row for a newly added completion (caller commits)"""
+        streak = conn.execute("""
+            SELECT current_streak, longest_streak, last_completion_date, next_completion_date
+            FROM habit_streaks WHERE habit_id = ?
+        """, (habit_id,)).fetchone()
+        
+        # No row yet, an out-of-order date, a future one or a row with future
+        # completions: fall back to a full recompute
+        if (not streak or completion_date > date.today().isoformat() or streak['next_completion_date']
+                or (streak['last_completion_date'] and streak['last_completion_date'] >= completion_date)):
+            Habit.refresh_streak(conn, habit_id, user_id)
+            return
+        
+        day_before = (datetime.strptime(completion_date, '%Y-%m-%d').date() - timedelta(days=1)).isoformat()
+        if streak['last_completion_date'] == day_before:
+            current = streak['current_streak'] + 1
+        else:
+            current = 1
+        
+        longest = max(streak['longest_streak'], current)
+        Habit._save_streak(conn, habit_id, user_id, current, longest, completion_date)
+    
+    @staticmethod
+    def _rebuild_streaks(conn, user_id: Optional[int] = None) -> int:
+        """Rebuild habit_streaks rows from habit_completions (caller commits)"""
+        if user_id is None:
+            habits = conn.execute("SELECT id, user_id FROM habits").fetchall()
+            completions = conn.execute("""
+                SELECT habit_id, completion_date
+                FROM habit_completions
+                ORDER BY habit_id, completion_date
+            """).fetchall()
+            conn.execute("DELETE FROM habit_streaks")
+        else:
+            habits = conn.execute("SELECT id, user_id FROM habits WHERE user_id = ?", (user_id,)).fetchall()
+            completions = conn.execute("""
+                SELECT hc.habit_id, hc.completion_date
+                FROM habit_completions hc
+                JOIN habits h ON hc.habit_id = h.id
+                WHERE h.user_id = ?
+                ORDER BY hc.habit_id, hc.completion_date
+            """, (user_id,)).fetchall()
+            conn.execute("DELETE FROM habit_streaks WHERE user_id = ?", (user_id,))
+        
+        dates_by_habit = {}
+        for row in completions:
+            dates_by_habit.setdefault(row['habit_id'], []).append(row['completion_date'])
+        
+        for habit in habits:
+            Habit._save_streak(conn, habit['id'], habit['user_id'], *Habit._summarize_completions(
+                dates_by_habit.get(habit['id'], [])
+            ))
+        
+        return len(habits)
+    
+    @staticmethod
+    def rebuild_streaks(user_id: Optional[int] = None) -> int:
+        """Repair habit_streaks from habit_completions for one user or everyone.
+        Returns the number of habits rebuilt"""
+        with get_db() as conn:
+            rebuilt = Habit._rebuild_streaks(conn, user_id)
+            conn.commit()
+            return rebuilt
+    
     @staticmethod
     def get_daily_points(user_id: int) -> int:
         """Calculate total points earned today"""
         today = date.today().isoformat()
         
-        with get_db() as conn:
-            result = conn.execute("""
-                SELECT SUM(h.points) as total_points
-                FROM habits h
-                JOIN habit_completions hc ON h.id = hc.habit_id
-                WHERE h.user_id = ? AND hc.completion_date = ?
-            """, (user_id, today)).fetchone()
+        with get_read_db() as conn:
+            result = conn.execute(queries.HABIT_POINTS_FOR_DAY, (user_id, today)).fetchone()
             
             return result['total_points'] or 0
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Compact bitmap store for habit completion history
+
+Each habit gets one row per year in habit_completion_bitmaps, holding one bit
+per day (bit 0 = January 1st). Range lookups, completion rates and streaks are
+answered with bitwise operations on those bitmaps instead of scanning
+habit_completions. The store is optional (HABITSTACK_COMPLETION_BITMAPS=1) and
+is kept in step with habit_completions, which remains the source of truth for
+toggles and exports. After enabling it on an existing database, run
+HabitHistory.rebuild() once; habits that were never synced are also built
+lazily on first use.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from database import get_db, get_read_db
+
+# Enable with HABITSTACK_COMPLETION_BITMAPS=1
+COMPLETION_BITMAPS_ENABLED = os.environ.get('HABITSTACK_COMPLETION_BITMAPS') == '1'
+
+# 366 days fit in 46 bytes
+BITMAP_BYTES = 46
+
+
+class HabitHistory:
+    """Bitmap-backed completion history for habits"""
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Check if the bitmap store is maintained"""
+        return COMPLETION_BITMAPS_ENABLED
+
+    @staticmethod
+    def _parse_day(day) -> date:
+        """Accept a date or an ISO date string"""
+        if isinstance(day, date):
+            return day
+        return datetime.strptime(day, '%Y-%m-%d').date()
+
+    @staticmethod
+    def _day_index(day: date) -> int:
+        """Bit position of a day within its year's bitmap"""
+        return day.timetuple().tm_yday - 1
+
+    @staticmethod
+    def _to_blob(bits: int) -> bytes:
+        return bits.to_bytes(BITMAP_BYTES, 'little')
+
+    @staticmethod
+    def _from_blob(blob: bytes) -> int:
+        return int.from_bytes(blob, 'little')
+
+    # Maintenance (called with the caller's connection, caller commits)
+
+    @staticmethod
+    def sync_day(conn, habit_id: int, day, completed: bool):
+        """Mirror a single completion change into the bitmap store"""
+        if not COMPLETION_BITMAPS_ENABLED:
+            return
+
+        # A habit first touched after the store was enabled gets a full rebuild
+        has_rows = conn.execute(
+            "SELECT 1 FROM habit_completion_bitmaps WHERE habit_id = ? LIMIT 1", (habit_id,)
+        ).fetchone()
+        if not has_rows:
+            HabitHistory.rebuild_habit(conn, habit_id)
+            return
+
+        day = HabitHistory._parse_day(day)
+        row = conn.execute(
+            "SELECT bits FROM habit_completion_bitmaps WHERE habit_id = ? AND year = ?",
+            (habit_id, day.year)
+        ).fetchone()
+        bits = HabitHistory._from_blob(row['bits']) if row else 0
+
+        if completed:
+            bits |= 1 << HabitHistory._day_index(day)
+        else:
+            bits &= ~(1 << HabitHistory._day_index(day))
+
+        conn.execute("""
+            INSERT INTO habit_completion_bitmaps (habit_id, year, bits)
+            VALUES (?, ?, ?)
+            ON CONFLICT(habit_id, year) DO UPDATE SET bits = excluded.bits
+        """, (habit_id, day.year, HabitHistory._to_blob(bits)))
+
+    @staticmethod
+    def rebuild_habit(conn, habit_id: int):
+        """Rebuild one habit's bitmaps from habit_completions"""
+        completions = conn.execute(
+            "SELECT completion_date FROM habit_completions WHERE habit_id = ?", (habit_id,)
+        ).fetchall()
+
+        years: Dict[int, int] = {}
+        for row in completions:
+            day = HabitHistory._parse_day(row['completion_date'])
+            years[day.year] = years.get(day.year, 0) | (1 << HabitHistory._day_index(day))
+
+        # A habit without completions still gets an (empty) row, marking it as synced
+        if not years:
+            years[date.today().year] = 0
+
+        conn.execute("DELETE FROM habit_completion_bitmaps WHERE habit_id = ?", (habit_id,))
+        conn.executemany(
+            "INSERT INTO habit_completion_bitmaps (habit_id, year, bits) VALUES (?, ?, ?)",
+            [(habit_id, year, HabitHistory._to_blob(bits)) for year, bits in years.items()]
+        )
+
+    @staticmethod
+    def delete_habit(conn, habit_id: int):
+        """Remove a habit's bitmaps"""
+        conn.execute("DELETE FROM habit_completion_bitmaps WHERE habit_id = ?", (habit_id,))
+
+    @staticmethod
+    def delete_user(conn, user_id: int):
+        """Remove the bitmaps of all of a user's habits"""
+        conn.execute("""
+            DELETE FROM habit_completion_bitmaps
+            WHERE habit_id IN (SELECT id FROM habits WHERE user_id = ?)
+        """, (user_id,))
+
+    @staticmethod
+    def rebuild(user_id: Optional[int] = None) -> int:
+        """Repair the bitmap store from habit_completions. Returns habits rebuilt"""
+        with get_db() as conn:
+            if user_id is None:
+                habits = conn.execute("SELECT id FROM habits").fetchall()
+            else:
+                habits = conn.execute("SELECT id FROM habits WHERE user_id = ?", (user_id,)).fetchall()
+
+            for habit in habits:
+                HabitHistory.rebuild_habit(conn, habit['id'])
+
+            conn.commit()
+            return len(habits)
+
+    # Queries
+
+    @staticmethod
+    def _ensure_synced(habit_id: int):
+        """Build bitmaps for a habit that has never been synced into the store"""
+        with get_read_db() as conn:
+            has_rows = conn.execute(
+                "SELECT 1 FROM habit_completion_bitmaps WHERE habit_id = ? LIMIT 1", (habit_id,)
+            ).fetchone()
+        if not has_rows:
+            with get_db() as conn:
+                HabitHistory.rebuild_habit(conn, habit_id)
+                conn.commit()
+
+    @staticmethod
+    def _load_span(conn, habit_id: int, start: date, end: date) -> int:
+        """Load completions between start and end (inclusive) as one integer,
+        where bit 0 is start and bit n is start + n days (0 if end is before start)"""
+        length = (end - start).days + 1
+        if length <= 0:
+            return 0
+
+        rows = conn.execute("""
+            SELECT year, bits FROM habit_completion_bitmaps
+            WHERE habit_id = ? AND year BETWEEN ? AND ?
+        """, (habit_id, start.year, end.year)).fetchall()
+
+        span = 0
+        for row in rows:
+            bits = HabitHistory._from_blob(row['bits'])
+            offset = (date(row['year'], 1, 1) - start).days
+            span |= bits << offset if offset >= 0 else bits >> -offset
+
+        return span & ((1 << length) - 1)
+
+    @staticmethod
+    def is_completed(habit_id: int, day) -> bool:
+        """Check if a habit was completed on a day"""
+        day = HabitHistory._parse_day(day)
+        HabitHistory._ensure_synced(habit_id)
+        with get_read_db() as conn:
+            return bool(HabitHistory._load_span(conn, habit_id, day, day))
+
+    @staticmethod
+    def get_completion_dates(habit_id: int, start, end) -> List[str]:
+        """Get completion dates (ISO strings) between start and end inclusive"""
+        start, end = HabitHistory._parse_day(start), HabitHistory._parse_day(end)
+        HabitHistory._ensure_synced(habit_id)
+        with get_read_db() as conn:
+            span = HabitHistory._load_span(conn, habit_id, start, end)
+
+        dates = []
+        while span:
+            lowest = span & -span
+            dates.append((start + timedelta(days=lowest.bit_length() - 1)).isoformat())
+            span ^= lowest
+        return dates
+
+    @staticmethod
+    def count_completions(habit_id: int, start, end) -> int:
+        """Count completions between start and end inclusive"""
+        start, end = HabitHistory._parse_day(start), HabitHistory._parse_day(end)
+        HabitHistory._ensure_synced(habit_id)
+        with get_read_db() as conn:
+            return HabitHistory._load_span(conn, habit_id, start, end).bit_count()
+
+    @staticmethod
+    def completion_rate(habit_id: int, start, end) -> float:
+        """Fraction of days between start and end inclusive with a completion"""
+        start, end = HabitHistory._parse_day(start), HabitHistory._parse_day(end)
+        days = (end - start).days + 1
+        if days <= 0:
+            return 0.0
+        return HabitHistory.count_completions(habit_id, start, end) / days
+
+    @staticmethod
+    def current_streak(habit_id: int, as_of=None) -> int:
+        """Consecutive completed days ending on as_of (default today),
+        matching Habit.calculate_streak"""
+        as_of = HabitHistory._parse_day(as_of) if as_of else date.today()
+
+        HabitHistory._ensure_synced(habit_id)
+        with get_read_db() as conn:
+            first = conn.execute(
+                "SELECT MIN(year) as year FROM habit_completion_bitmaps WHERE habit_id = ?", (habit_id,)
+            ).fetchone()
+            start = date(first['year'], 1, 1) if first and first['year'] else as_of
+            span = HabitHistory._load_span(conn, habit_id, start, as_of)
+
+        # The streak is the run of ones ending at the highest bit
+        length = (as_of - start).days + 1
+        if length <= 0:
+            return 0
+        gaps = ~span & ((1 << length) - 1)
+        if not gaps:
+            return length
+        return length - gaps.bit_length()
+
+    @staticmethod
+    def longest_streak(habit_id: int) -> int:
+        """Longest run of consecutive completed days"""
+        HabitHistory._ensure_synced(habit_id)
+        with get_read_db() as conn:
+            bounds = conn.execute(
+                "SELECT MIN(year) as first, MAX(year) as last FROM habit_completion_bitmaps WHERE habit_id = ?",
+                (habit_id,)
+            ).fetchone()
+            if not bounds or bounds['first'] is None:
+                return 0
+            span = HabitHistory._load_span(
+                conn, habit_id, date(bounds['first'], 1, 1), date(bounds['last'], 12, 31)
+            )
+
+        # Each step shortens every run by one day; the step count is the longest run
+        longest = 0
+        while span:
+            span &= span >> 1
+            longest += 1
+        return longest
@@ -3,7 +3,8 @@ Daily note model for user journaling
 """
 
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db, run_write
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
 
 
@@ -20,9 +21,9 @@ class DailyNote(EncryptedModelMixin):
         """Get note for a specific date with decryption"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             note = conn.execute(
-                "SELECT * FROM daily_notes WHERE user_id = ? AND note_date = ?",
+                queries.NOTE_BY_DATE,
                 (user_id, note_date)
             ).fetchone()
             
@@ -49,7 +50,7 @@ class DailyNote(EncryptedModelMixin):
             note_data, 'notes', cls.ENCRYPTED_FIELDS
         )
         
-        with get_db() as conn:
+        def save(conn):
             # Try to update existing note first
             cursor = conn.execute(
                 "UPDATE daily_notes SET content = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ? AND note_date = ?",
@@ -62,9 +63,9 @@ class DailyNote(EncryptedModelMixin):
                     "INSERT INTO daily_notes (user_id, note_date, content) VALUES (?, ?, ?)",
                     (user_id, note_date, encrypted_data['content'] or None)
                 )
-            
-            conn.commit()
             return True
+        
+        return run_write(save)
     
     @staticmethod
     def delete_note(user_id: int, note_date: str) -> bool:
@@ -82,14 +83,8 @@ class DailyNote(EncryptedModelMixin):
         """Get recent notes for user with decryption (for navigation/history)"""
         instance = cls()
         
-        with get_db() as conn:
-            notes = conn.execute("""
-                SELECT note_date, content, updated_at
-                FROM daily_notes 
-                WHERE user_id = ? AND content IS NOT NULL AND content != ''
-                ORDER BY note_date DESC 
-                LIMIT ?
-            """, (user_id, limit)).fetchall()
+        with get_read_db() as conn:
+            notes = conn.execute(queries.RECENT_NOTES, (user_id, limit)).fetchall()
             
             result = []
             for note in notes:
@@ -0,0 +1,301 @@
+"""
+Named SQL for the model layer's read paths
+
+sqlite3 prepares each statement once per connection and keeps it in a
+per-connection cache keyed by the SQL text. Keeping every hot query as one
+constant here means each call site passes the identical string, so repeat
+calls skip parsing and planning, and the number of distinct statements stays
+known, so DB_CACHED_STATEMENTS can be sized to hold them all.
+"""
+
+import logging
+from database import DB_CACHED_STATEMENTS
+
+# Habits
+
+HABITS_WITH_TODAY_STATUS = """
+    SELECT h.*,
+           CASE WHEN hc.completion_date IS NOT NULL THEN 1 ELSE 0 END as completed_today
+    FROM habits h
+    LEFT JOIN habit_completions hc ON h.id = hc.habit_id AND hc.completion_date = ?
+    WHERE h.user_id = ?
+    ORDER BY h.created_at
+"""
+
+# Per-habit subqueries rather than JOIN + GROUP BY h.id, so rows come out of
+# idx_habits_user_created already in order instead of being grouped and re-sorted
+HABITS_WITH_STATS = """
+    SELECT h.*,
+           (SELECT COUNT(*) FROM habit_completions hc WHERE hc.habit_id = h.id) as total_completions,
+           (SELECT MAX(hc.completion_date) FROM habit_completions hc WHERE hc.habit_id = h.id) as last_completed
+    FROM habits h
+    WHERE h.user_id = ?
+    ORDER BY h.created_at
+"""
+
+HABIT_BY_ID = "SELECT * FROM habits WHERE id = ? AND user_id = ?"
+
+HABIT_COMPLETION_DATES = """
+    SELECT completion_date
+    FROM habit_completions
+    WHERE habit_id = ?
+    ORDER BY completion_date DESC
+"""
+
+HABIT_STREAKS_FOR_USER = """
+    SELECT h.id as habit_id, s.habit_id as streak_habit_id,
+           s.current_streak, s.last_completion_date, s.next_completion_date
+    FROM habits h
+    LEFT JOIN habit_streaks s ON s.habit_id = h.id
+    WHERE h.user_id = ?
+"""
+
+HABIT_POINTS_FOR_DAY = """
+    SELECT SUM(h.points) as total_points
+    FROM habits h
+    JOIN habit_completions hc ON h.id = hc.habit_id
+    WHERE h.user_id = ? AND hc.completion_date = ?
+"""
+
+
+# Daily notes
+
+NOTE_BY_DATE = "SELECT * FROM daily_notes WHERE user_id = ? AND note_date = ?"
+
+RECENT_NOTES = """
+    SELECT note_date, content, updated_at
+    FROM daily_notes
+    WHERE user_id = ? AND content IS NOT NULL AND content != ''
+    ORDER BY note_date DESC
+    LIMIT ?
+"""
+
+
+# Todos
+
+# Open todos, undated last (Todo.get_user_todos)
+TODOS_OPEN = """
+    SELECT * FROM todos
+    WHERE user_id = ? AND deleted_at IS NULL AND completed = 0
+    ORDER BY
+        completed ASC,
+        CASE priority
+            WHEN 'high' THEN 1
+            WHEN 'medium' THEN 2
+            WHEN 'low' THEN 3
+            ELSE 4
+        END,
+        CASE
+            WHEN due_date IS NULL THEN 1
+            ELSE 0
+        END,
+        due_date ASC,
+        created_at ASC
+"""
+
+TODOS_ALL = """
+    SELECT * FROM todos
+    WHERE user_id = ? AND deleted_at IS NULL
+    ORDER BY
+        completed ASC,
+        CASE priority
+            WHEN 'high' THEN 1
+            WHEN 'medium' THEN 2
+            WHEN 'low' THEN 3
+            ELSE 4
+        END,
+        CASE
+            WHEN due_date IS NULL THEN 1
+            ELSE 0
+        END,
+        due_date ASC,
+        created_at ASC
+"""
+
+TODOS_FOR_USER = """
+    SELECT * FROM todos
+    WHERE user_id = ? AND deleted_at IS NULL
+    ORDER BY
+        completed ASC,
+        CASE priority
+            WHEN 'high' THEN 1
+            WHEN 'medium' THEN 2
+            WHEN 'low' THEN 3
+            ELSE 4
+        END,
+        due_date ASC,
+        created_at ASC
+"""
+
+TODO_BY_ID = "SELECT * FROM todos WHERE id = ? AND user_id = ? AND deleted_at IS NULL"
+
+TODO_STATS = """
+    SELECT
+        COUNT(*) as total,
+        COALESCE(SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END), 0) as completed,
+        COALESCE(SUM(CASE WHEN completed = 0 AND due_date < date('now') THEN 1 ELSE 0 END), 0) as overdue,
+        COALESCE(SUM(CASE WHEN completed = 0 AND due_date = date('now') THEN 1 ELSE 0 END), 0) as due_today
+    FROM todos
+    WHERE user_id = ? AND deleted_at IS NULL
+"""
+
+TODO_CATEGORIES = """
+    SELECT DISTINCT category
+    FROM todos
+    WHERE user_id = ? AND category IS NOT NULL AND category != '' AND deleted_at IS NULL
+    ORDER BY category
+"""
+
+
+# Reading list
+
+BOOKS_WITH_STATUS = """
+    SELECT * FROM reading_list
+    WHERE user_id = ? AND status = ? AND deleted_at IS NULL
+    ORDER BY date_added DESC
+"""
+
+BOOKS_BY_STATUS_ORDER = """
+    SELECT * FROM reading_list
+    WHERE user_id = ? AND deleted_at IS NULL
+    ORDER BY
+        CASE status
+            WHEN 'currently_reading' THEN 1
+            WHEN 'want_to_read' THEN 2
+            WHEN 'completed' THEN 3
+        END,
+        date_added DESC
+"""
+
+BOOKS_FOR_USER = """
+    SELECT * FROM reading_list
+    WHERE user_id = ? AND deleted_at IS NULL
+    ORDER BY date_added DESC
+"""
+
+BOOK_BY_ID = """
+    SELECT * FROM reading_list
+    WHERE id = ? AND user_id = ? AND deleted_at IS NULL
+"""
+
+READING_STATS = """
+    SELECT
+        COUNT(*) as total,
+        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
+        SUM(CASE WHEN status = 'currently_reading' THEN 1 ELSE 0 END) as currently_reading,
+        SUM(CASE WHEN status = 'want_to_read' THEN 1 ELSE 0 END) as want_to_read,
+        SUM(CASE WHEN status = 'completed' AND strftime('%Y', date_completed) = strftime('%Y', 'now') THEN 1 ELSE 0 END) as completed_this_year
+    FROM reading_list
+    WHERE user_id = ? AND deleted_at IS NULL
+"""
+
+READING_PROGRESS = """
+    SELECT
+        COUNT(*) as books_in_progress,
+        AVG(CASE WHEN total_pages > 0 THEN (current_page * 100.0 / total_pages) ELSE 0 END) as avg_progress_percentage,
+        SUM(current_page) as total_pages_read
+    FROM reading_list
+    WHERE user_id = ? AND status = 'currently_reading' AND deleted_at IS NULL
+"""
+
+
+# Watchlist
+
+WATCHLIST_WITH_STATUS = """
+    SELECT * FROM watchlist
+    WHERE user_id = ? AND status = ?
+    ORDER BY date_added DESC
+"""
+
+WATCHLIST_BY_STATUS_ORDER = """
+    SELECT * FROM watchlist
+    WHERE user_id = ?
+    ORDER BY
+        CASE status
+            WHEN 'watching' THEN 1
+            WHEN 'want_to_watch' THEN 2
+            WHEN 'completed' THEN 3
+        END,
+        date_added DESC
+"""
+
+WATCHLIST_FOR_USER = """
+    SELECT * FROM watchlist
+    WHERE user_id = ?
+    ORDER BY date_added DESC
+"""
+
+WATCHLIST_ITEM_BY_ID = "SELECT * FROM watchlist WHERE id = ? AND user_id = ?"
+
+WATCHLIST_STATS = """
+    SELECT
+        COUNT(*) as total,
+        SUM(CASE WHEN status = 'watching' THEN 1 ELSE 0 END) as watching,
+        SUM(CASE WHEN status = 'want_to_watch' THEN 1 ELSE 0 END) as want_to_watch,
+        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
+        SUM(CASE WHEN type = 'movie' THEN 1 ELSE 0 END) as movies,
+        SUM(CASE WHEN type = 'series' THEN 1 ELSE 0 END) as series
+    FROM watchlist
+    WHERE user_id = ?
+"""
+
+
+# Birthdays
+
+BIRTHDAYS_BY_DAY_OF_YEAR = """
+    SELECT * FROM birthdays
+    WHERE user_id = ?
+    ORDER BY substr(birth_date, 6)
+"""
+
+BIRTHDAYS_FOR_USER = """
+    SELECT * FROM birthdays
+    WHERE user_id = ?
+"""
+
+BIRTHDAYS_TODAY = """
+    SELECT * FROM birthdays
+    WHERE user_id = ?
+      AND substr(birth_date, 6) = substr(date('now'), 6)
+    ORDER BY name
+"""
+
+BIRTHDAY_BY_ID = "SELECT * FROM birthdays WHERE id = ? AND user_id = ?"
+
+
+# Users
+
+USER_BY_USERNAME = "SELECT * FROM users WHERE username = ? AND deleted_at IS NULL"
+
+USER_BY_ID = "SELECT * FROM users WHERE id = ? AND deleted_at IS NULL"
+
+USER_DELETED_AT = "SELECT deleted_at FROM users WHERE id = ?"
+
+
+# Sports news
+
+RECENT_ARTICLES = """
+    SELECT title, link, source, published, summary, created_at
+    FROM sports_news
+    WHERE created_at > ?
+    ORDER BY created_at DESC
+"""
+
+ARTICLE_COUNT = "SELECT COUNT(*) FROM sports_news"
+
+LAST_ARTICLE_UPDATE = "SELECT MAX(created_at) FROM sports_news"
+
+# Every source at once (a handful of rows); exempt from the table scan check
+NEWS_SOURCE_STATUS = "SELECT * FROM news_source_status"
+
+HTTP_VALIDATORS = "SELECT etag, last_modified, content_hash FROM http_validators WHERE url = ?"
+
+
+# Every registered statement, by name
+QUERIES = {name: sql for name, sql in list(globals().items()) if name.isupper() and isinstance(sql, str)}
+
+# Leave room for the statements that are not registered (writes, pragmas)
+if len(QUERIES) * 2 > DB_CACHED_STATEMENTS:
+    logging.getLogger(__name__).warning(
+        f"DB_CACHED_STATEMENTS={DB_CACHED_STATEMENTS} is small for {len(QUERIES)} registered queries"
+    )
@@ -4,7 +4,8 @@ Reading list model for book tracking and management
 
 from datetime import datetime
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
 
 
@@ -39,25 +40,11 @@ class Reading(EncryptedModelMixin):
     @classmethod
     def get_user_books(cls, user_id: int, status: str = None) -> List[Dict]:
         """Get reading list for a user, optionally filtered by status"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             if status:
-                books = conn.execute("""
-                    SELECT * FROM reading_list 
-                    WHERE user_id = ? AND status = ? AND deleted_at IS NULL
-                    ORDER BY date_added DESC
-                """, (user_id, status)).fetchall()
+                books = conn.execute(queries.BOOKS_WITH_STATUS, (user_id, status)).fetchall()
             else:
-                books = conn.execute("""
-                    SELECT * FROM reading_list 
-                    WHERE user_id = ? AND deleted_at IS NULL
-                    ORDER BY 
-                        CASE status 
-                            WHEN 'currently_reading' THEN 1 
-                            WHEN 'want_to_read' THEN 2 
-                            WHEN 'completed' THEN 3 
-                        END,
-                        date_added DESC
-                """, (user_id,)).fetchall()
+                books = conn.execute(queries.BOOKS_BY_STATUS_ORDER, (user_id,)).fetchall()
             
             # Decrypt fields for display
             instance = cls()
@@ -77,12 +64,8 @@ class Reading(EncryptedModelMixin):
         """Get reading list organized by status with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            books = conn.execute("""
-                SELECT * FROM reading_list 
-                WHERE user_id = ? AND deleted_at IS NULL
-                ORDER BY date_added DESC
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            books = conn.execute(queries.BOOKS_FOR_USER, (user_id,)).fetchall()
             
             result = {
                 'currently_reading': [],
@@ -116,11 +99,8 @@ class Reading(EncryptedModelMixin):
         """Get specific book by ID for user with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            book = conn.execute("""
-                SELECT * FROM reading_list 
-                WHERE id = ? AND user_id = ? AND deleted_at IS NULL
-            """, (book_id, user_id)).fetchone()
+        with get_read_db() as conn:
+            book = conn.execute(queries.BOOK_BY_ID, (book_id, user_id)).fetchone()
             
             if not book:
                 return None
@@ -226,17 +206,8 @@ class Reading(EncryptedModelMixin):
     @staticmethod
     def get_stats(user_id: int) -> Dict:
         """Get reading statistics for user"""
-        with get_db() as conn:
-            stats = conn.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN status = 'currently_reading' THEN 1 ELSE 0 END) as currently_reading,
-                    SUM(CASE WHEN status = 'want_to_read' THEN 1 ELSE 0 END) as want_to_read,
-                    SUM(CASE WHEN status = 'completed' AND strftime('%Y', date_completed) = strftime('%Y', 'now') THEN 1 ELSE 0 END) as completed_this_year
-                FROM reading_list 
-                WHERE user_id = ? AND deleted_at IS NULL
-            """, (user_id,)).fetchone()
+        with get_read_db() as conn:
+            stats = conn.execute(queries.READING_STATS, (user_id,)).fetchone()
             
             result = dict(stats) if stats else {
                 'total': 0, 'completed': 0, 'currently_reading': 0, 'want_to_read': 0, 'completed_this_year': 0
@@ -254,15 +225,8 @@ class Reading(EncryptedModelMixin):
     @staticmethod
     def get_reading_progress_summary(user_id: int) -> Dict:
         """Get summary of reading progress for currently reading books"""
-        with get_db() as conn:
-            progress = conn.execute("""
-                SELECT 
-                    COUNT(*) as books_in_progress,
-                    AVG(CASE WHEN total_pages > 0 THEN (current_page * 100.0 / total_pages) ELSE 0 END) as avg_progress_percentage,
-                    SUM(current_page) as total_pages_read
-                FROM reading_list 
-                WHERE user_id = ? AND status = 'currently_reading' AND deleted_at IS NULL
-            """, (user_id,)).fetchone()
+        with get_read_db() as conn:
+            progress = conn.execute(queries.READING_PROGRESS, (user_id,)).fetchone()
             
             result = dict(progress) if progress else {
                 'books_in_progress': 0, 'avg_progress_percentage': 0, 'total_pages_read': 0
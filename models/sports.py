@@ -4,9 +4,20 @@ Handles caching and management of sports news articles.
 """
 
 from datetime import datetime, timedelta
-import sqlite3
+import json
+import hashlib
+import logging
 from typing import List, Dict, Optional
-from database import get_db
+from database import get_db, get_read_db
+from models import queries
+
+logger = logging.getLogger(__name__)
+
+
+def article_hash(title: str, link: str) -> int:
+    """64-bit dedup key for an article: its title (case and spacing ignored) and link."""
+    key = ' '.join(title.split()).casefold() + '\n' + (link or '').strip()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
 
 class SportsNews:
     """Model for managing sports news articles with caching."""
@@ -17,47 +28,59 @@ class SportsNews:
         with get_db() as conn:
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS sports_news (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER PRIMARY KEY,
+                    content_hash INTEGER NOT NULL,
                     title TEXT NOT NULL,
                     link TEXT,
                     source TEXT NOT NULL,
                     published TEXT,
                     summary TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(title, source)
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             # Create index for faster queries
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_sports_news_content_hash ON sports_news(content_hash)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_sports_news_created_at ON sports_news(created_at)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_sports_news_source ON sports_news(source)')
     
     @staticmethod
     def save_articles(articles: List[Dict]) -> int:
         """Save articles to database, avoiding duplicates."""
-        if not articles:
-            return 0
+        return sum(counts['inserted'] for counts in SportsNews.ingest_articles(articles).values())
+    
+    @staticmethod
+    def ingest_articles(articles: List[Dict]) -> Dict[str, Dict[str, int]]:
+        """Insert new articles in one transaction, skipping any already cached.
         
-        saved_count = 0
+        Articles are matched on article_hash(title, link). Returns the number
+        inserted and skipped as duplicates for each source.
+        """
+        by_source = {}
+        for article in articles:
+            by_source.setdefault(article['source'], []).append((
+                article_hash(article['title'], article['link']),
+                article['title'],
+                article['link'],
+                article['source'],
+                article['published'],
+                article['summary']
+            ))
+        if not by_source:
+            return {}
+        
+        counts = {}
         with get_db() as conn:
-            for article in articles:
-                try:
-                    cursor = conn.execute('''
-                        INSERT OR IGNORE INTO sports_news 
-                        (title, link, source, published, summary)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        article['title'],
-                        article['link'],
-                        article['source'],
-                        article['published'],
-                        article['summary']
-                    ))
-                    if cursor.rowcount > 0:
-                        saved_count += 1
-                except sqlite3.Error as e:
-                    continue
+            for source, rows in by_source.items():
+                cursor = conn.executemany('''
+                    INSERT OR IGNORE INTO sports_news
+                    (content_hash, title, link, source, published, summary)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+                counts[source] = {'inserted': cursor.rowcount, 'duplicates': len(rows) - cursor.rowcount}
             conn.commit()
-        return saved_count
+        
+        logger.info(json.dumps({'event': 'news_ingest', 'sources': counts}))
+        return counts
     
     @staticmethod
     def get_recent_articles(hours: int = 72) -> List[Dict]:
@@ -66,13 +89,8 @@ class SportsNews:
         # Format cutoff time to match database format (space instead of T)
         cutoff_str = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
         
-        with get_db() as conn:
-            cursor = conn.execute('''
-                SELECT title, link, source, published, summary, created_at
-                FROM sports_news
-                WHERE created_at > ?
-                ORDER BY created_at DESC
-            ''', (cutoff_str,))
+        with get_read_db() as conn:
+            cursor = conn.execute(queries.RECENT_ARTICLES, (cutoff_str,))
             
             articles = []
             for row in cursor.fetchall():
@@ -112,22 +130,21 @@ class SportsNews:
                 DELETE FROM sports_news
                 WHERE created_at < ?
             ''', (cutoff_time.isoformat(),))
+            conn.commit()
             return cursor.rowcount
     
     @staticmethod
     def get_article_count() -> int:
         """Get total number of cached articles."""
-        with get_db() as conn:
-            cursor = conn.execute('SELECT COUNT(*) FROM sports_news')
+        with get_read_db() as conn:
+            cursor = conn.execute(queries.ARTICLE_COUNT)
             return cursor.fetchone()[0]
     
     @staticmethod
     def get_last_update() -> Optional[str]:
         """Get timestamp of most recent article."""
-        with get_db() as conn:
-            cursor = conn.execute('''
-                SELECT MAX(created_at) FROM sports_news
-            ''')
+        with get_read_db() as conn:
+            cursor = conn.execute(queries.LAST_ARTICLE_UPDATE)
             result = cursor.fetchone()[0]
             if result:
                 try:
@@ -142,5 +159,67 @@ class SportsNews:
         """Clear all cached articles."""
         with get_db() as conn:
             cursor = conn.execute('DELETE FROM sports_news')
+            # Otherwise unchanged sources would never be downloaded again
+            conn.execute('DELETE FROM http_validators')
+            conn.commit()
+            return cursor.rowcount
+    
+    @staticmethod
+    def record_fetch(source: str, outcome: Dict, saved: int, duplicates: int, attempted_at: float):
+        """Record one background fetch of a source (see news_refresher.py)."""
+        ok = outcome['status'] in ('ok', 'unchanged')
+        with get_db() as conn:
+            conn.execute('''
+                INSERT INTO news_source_status
+                (source, last_attempt_at, last_success_at, last_status, last_error, last_ms,
+                 last_articles, articles_saved, articles_duplicate, successes, failures)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    last_attempt_at = excluded.last_attempt_at,
+                    last_success_at = COALESCE(excluded.last_success_at, news_source_status.last_success_at),
+                    last_status = excluded.last_status,
+                    last_error = excluded.last_error,
+                    last_ms = excluded.last_ms,
+                    last_articles = excluded.last_articles,
+                    articles_saved = news_source_status.articles_saved + excluded.articles_saved,
+                    articles_duplicate = news_source_status.articles_duplicate + excluded.articles_duplicate,
+                    successes = news_source_status.successes + excluded.successes,
+                    failures = news_source_status.failures + excluded.failures
+            ''', (
+                source, attempted_at, attempted_at if ok else None, outcome['status'], outcome.get('error'),
+                outcome.get('ms'), outcome.get('articles', 0), saved, duplicates, int(ok), int(not ok)
+            ))
+            conn.commit()
+    
+    @staticmethod
+    def request_refresh() -> float:
+        """Ask the background refresher to fetch every source on its next tick."""
+        requested_at = datetime.now().timestamp()
+        with get_db() as conn:
+            conn.execute('UPDATE news_source_status SET refresh_requested_at = ?', (requested_at,))
             conn.commit()
-            return cursor.rowcount
\ No newline at end of file
+        return requested_at
+    
+    @staticmethod
+    def get_source_status() -> Dict[str, Dict]:
+        """Last fetch of each source, keyed by source name."""
+        with get_read_db() as conn:
+            return {row['source']: dict(row) for row in conn.execute(queries.NEWS_SOURCE_STATUS)}
+
+    
+    @staticmethod
+    def get_http_validators(url: str) -> Optional[Dict]:
+        """ETag, Last-Modified and content hash from the last changed response for url."""
+        with get_read_db() as conn:
+            row = conn.execute(queries.HTTP_VALIDATORS, (url,)).fetchone()
+            return dict(row) if row else None
+    
+    @staticmethod
+    def save_http_validators(url: str, etag: Optional[str], last_modified: Optional[str], content_hash: str):
+        """Remember the validators of a changed response for the next conditional fetch."""
+        with get_db() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO http_validators (url, etag, last_modified, content_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (url, etag, last_modified, content_hash, datetime.now().timestamp()))
+            conn.commit()
\ No newline at end of file
@@ -4,7 +4,8 @@ Todo model for task management and tracking
 
 from datetime import datetime, date
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db, run_write
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
 
 
@@ -34,49 +35,26 @@ class Todo(EncryptedModelMixin):
             todo_data, 'todos', cls.ENCRYPTED_FIELDS
         )
         
-        with get_db() as conn:
+        def insert(conn):
             cursor = conn.execute(
                 """INSERT INTO todos (user_id, title, description, priority, due_date, category) 
                    VALUES (?, ?, ?, ?, ?, ?)""",
                 (user_id, encrypted_data['title'], encrypted_data['description'] or None, 
                  priority, due_date, encrypted_data['category'] or None)
             )
-            conn.commit()
             return cursor.lastrowid
+        
+        return run_write(insert)
     
     @classmethod
     def get_user_todos(cls, user_id: int, include_completed: bool = False) -> List[Dict]:
         """Get todos for user organized by priority and due date"""
-        query = """
-            SELECT * FROM todos 
-            WHERE user_id = ? AND deleted_at IS NULL
-        """
-        params = [user_id]
-        
-        if not include_completed:
-            query += " AND completed = 0"
-        
-        query += """
-            ORDER BY 
-                completed ASC,
-                CASE priority 
-                    WHEN 'high' THEN 1 
-                    WHEN 'medium' THEN 2 
-                    WHEN 'low' THEN 3 
-                    ELSE 4 
-                END,
-                CASE 
-                    WHEN due_date IS NULL THEN 1
-                    ELSE 0
-                END,
-                due_date ASC,
-                created_at ASC
-        """
+        query = queries.TODOS_ALL if include_completed else queries.TODOS_OPEN
         
         instance = cls()
         
-        with get_db() as conn:
-            todos = conn.execute(query, params).fetchall()
+        with get_read_db() as conn:
+            todos = conn.execute(query, (user_id,)).fetchall()
             
             # Decrypt fields for display
             result = []
@@ -95,21 +73,8 @@ class Todo(EncryptedModelMixin):
         """Get todos organized by status (overdue, today, upcoming, someday, completed)"""
         today = date.today().isoformat()
         
-        with get_db() as conn:
-            todos = conn.execute("""
-                SELECT * FROM todos 
-                WHERE user_id = ? AND deleted_at IS NULL
-                ORDER BY 
-                    completed ASC,
-                    CASE priority 
-                        WHEN 'high' THEN 1 
-                        WHEN 'medium' THEN 2 
-                        WHEN 'low' THEN 3 
-                        ELSE 4 
-                    END,
-                    due_date ASC,
-                    created_at ASC
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            todos = conn.execute(queries.TODOS_FOR_USER, (user_id,)).fetchall()
             
             organized = {
                 'overdue': [],
@@ -149,9 +114,9 @@ class Todo(EncryptedModelMixin):
         """Get specific todo by ID for user with decryption"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             todo = conn.execute(
-                "SELECT * FROM todos WHERE id = ? AND user_id = ? AND deleted_at IS NULL", 
+                queries.TODO_BY_ID, 
                 (todo_id, user_id)
             ).fetchone()
             
@@ -236,16 +201,8 @@ class Todo(EncryptedModelMixin):
     @staticmethod
     def get_stats(user_id: int) -> Dict:
         """Get todo statistics for user"""
-        with get_db() as conn:
-            stats = conn.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    COALESCE(SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END), 0) as completed,
-                    COALESCE(SUM(CASE WHEN completed = 0 AND due_date < date('now') THEN 1 ELSE 0 END), 0) as overdue,
-                    COALESCE(SUM(CASE WHEN completed = 0 AND due_date = date('now') THEN 1 ELSE 0 END), 0) as due_today
-                FROM todos 
-                WHERE user_id = ? AND deleted_at IS NULL
-            """, (user_id,)).fetchone()
+        with get_read_db() as conn:
+            stats = conn.execute(queries.TODO_STATS, (user_id,)).fetchone()
             
             result = dict(stats) if stats else {
                 'total': 0, 'completed': 0, 'overdue': 0, 'due_today': 0
@@ -262,12 +219,7 @@ class Todo(EncryptedModelMixin):
     @staticmethod
     def get_user_categories(user_id: int) -> List[str]:
         """Get unique categories used by user"""
-        with get_db() as conn:
-            categories = conn.execute("""
-                SELECT DISTINCT category 
-                FROM todos 
-                WHERE user_id = ? AND category IS NOT NULL AND category != '' AND deleted_at IS NULL
-                ORDER BY category
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            categories = conn.execute(queries.TODO_CATEGORIES, (user_id,)).fetchall()
             
             return [cat['category'] for cat in categories]
\ No newline at end of file
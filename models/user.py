@@ -5,7 +5,10 @@ User model for authentication and user management
 import bcrypt
 import sqlite3
 from typing import Optional, Dict
-from database import get_db
+from database import get_db, get_read_db
+from models import queries
+from utils.preferences import preference_manager
+from utils.key_derivation import key_derivation_pool
 
 
 class User:
@@ -30,23 +33,29 @@ class User:
     @staticmethod
     def authenticate(username: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data if valid (excluding deleted accounts)"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             user = conn.execute(
-                "SELECT * FROM users WHERE username = ? AND deleted_at IS NULL", (username,)
+                queries.USER_BY_USERNAME, (username,)
             ).fetchone()
             
-            if user and bcrypt.checkpw(password.encode(), user['password_hash']):
-                return dict(user)
-            return None
+        # Verify outside the connection so the slow hash check doesn't hold it
+        if user and key_derivation_pool.check_password(password, user['password_hash']):
+            return dict(user)
+        return None
     
     @staticmethod
     def get_by_id(user_id: int) -> Optional[Dict]:
         """Get user by ID (excluding deleted accounts)"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             user = conn.execute(
-                "SELECT * FROM users WHERE id = ? AND deleted_at IS NULL", (user_id,)
+                queries.USER_BY_ID, (user_id,)
             ).fetchone()
-            return dict(user) if user else None
+            if not user:
+                return None
+            
+            # Lets the preference cache validate without its own version query
+            preference_manager.note_preferences_version(user_id, user['preferences_version'])
+            return dict(user)
     
     @staticmethod
     def update_password(user_id: int, current_password: str, new_password: str) -> bool:
@@ -102,9 +111,9 @@ class User:
     @staticmethod
     def is_deleted(user_id: int) -> bool:
         """Check if user account is soft deleted"""
-        with get_db() as conn:
+        with get_read_db() as conn:
             user = conn.execute(
-                "SELECT deleted_at FROM users WHERE id = ?", (user_id,)
+                queries.USER_DELETED_AT, (user_id,)
             ).fetchone()
             
             return user and user['deleted_at'] is not None
\ No newline at end of file
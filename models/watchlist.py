@@ -3,7 +3,8 @@ Watchlist model for movies and series tracking
 """
 
 from typing import Optional, List, Dict
-from database import get_db
+from database import get_db, get_read_db
+from models import queries
 from models.base_encrypted import EncryptedModelMixin
 
 
@@ -20,25 +21,11 @@ class Watchlist(EncryptedModelMixin):
         """Get watchlist items for a user with decryption, optionally filtered by status"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             if status:
-                items = conn.execute("""
-                    SELECT * FROM watchlist 
-                    WHERE user_id = ? AND status = ?
-                    ORDER BY date_added DESC
-                """, (user_id, status)).fetchall()
+                items = conn.execute(queries.WATCHLIST_WITH_STATUS, (user_id, status)).fetchall()
             else:
-                items = conn.execute("""
-                    SELECT * FROM watchlist 
-                    WHERE user_id = ?
-                    ORDER BY 
-                        CASE status 
-                            WHEN 'watching' THEN 1 
-                            WHEN 'want_to_watch' THEN 2 
-                            WHEN 'completed' THEN 3 
-                        END,
-                        date_added DESC
-                """, (user_id,)).fetchall()
+                items = conn.execute(queries.WATCHLIST_BY_STATUS_ORDER, (user_id,)).fetchall()
             
             result = []
             for item in items:
@@ -57,12 +44,8 @@ class Watchlist(EncryptedModelMixin):
         """Get watchlist items organized by status with decryption"""
         instance = cls()
         
-        with get_db() as conn:
-            items = conn.execute("""
-                SELECT * FROM watchlist 
-                WHERE user_id = ?
-                ORDER BY date_added DESC
-            """, (user_id,)).fetchall()
+        with get_read_db() as conn:
+            items = conn.execute(queries.WATCHLIST_FOR_USER, (user_id,)).fetchall()
             
             result = {
                 'watching': [],
@@ -89,9 +72,9 @@ class Watchlist(EncryptedModelMixin):
         """Get a specific watchlist item with decryption"""
         instance = cls()
         
-        with get_db() as conn:
+        with get_read_db() as conn:
             item = conn.execute(
-                "SELECT * FROM watchlist WHERE id = ? AND user_id = ?",
+                queries.WATCHLIST_ITEM_BY_ID,
                 (item_id, user_id)
             ).fetchone()
             
@@ -250,18 +233,8 @@ class Watchlist(EncryptedModelMixin):
     @staticmethod
     def get_stats(user_id: int) -> Dict:
         """Get watchlist statistics"""
-        with get_db() as conn:
-            stats = conn.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'watching' THEN 1 ELSE 0 END) as watching,
-                    SUM(CASE WHEN status = 'want_to_watch' THEN 1 ELSE 0 END) as want_to_watch,
-                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN type = 'movie' THEN 1 ELSE 0 END) as movies,
-                    SUM(CASE WHEN type = 'series' THEN 1 ELSE 0 END) as series
-                FROM watchlist 
-                WHERE user_id = ?
-            """, (user_id,)).fetchone()
+        with get_read_db() as conn:
+            stats = conn.execute(queries.WATCHLIST_STATS, (user_id,)).fetchone()
             
             return dict(stats) if stats else {
                 'total': 0, 'watching': 0, 'want_to_watch': 0, 
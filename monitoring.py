@@ -0,0 +1,44 @@
+"""
+Internal monitoring routes for HabitStack
+"""
+
+import os
+import hmac
+from flask import Blueprint, request, jsonify, abort
+from database import get_pool_stats
+from utils.preferences import preference_manager
+from utils.key_derivation import key_derivation_pool
+from utils.bulk_crypto import bulk_crypto
+from utils.sql_profiler import sql_profiler
+from maintenance import maintenance_scheduler
+from news_refresher import news_refresher
+
+# Shared secret for /internal/stats; the endpoint is disabled (404) without it.
+# Behind nginx every client arrives from loopback, so the address proves nothing.
+STATS_TOKEN = os.environ.get('STATS_TOKEN')
+
+monitoring_bp = Blueprint('monitoring', __name__, url_prefix='/habitstack')
+
+
+def _stats_allowed() -> bool:
+    """Check the X-Stats-Token header against STATS_TOKEN"""
+    if not STATS_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Stats-Token', ''), STATS_TOKEN)
+
+
+@monitoring_bp.route('/internal/stats')
+def stats():
+    """Connection pool, cache, worker pool and SQL profile metrics as JSON"""
+    if not _stats_allowed():
+        abort(404)
+    
+    return jsonify({
+        'database': get_pool_stats(),
+        'maintenance': maintenance_scheduler.get_stats(),
+        'news_refresher': news_refresher.get_stats(),
+        'preference_cache': preference_manager.get_cache_stats(),
+        'key_derivation': key_derivation_pool.get_stats(),
+        'bulk_crypto': bulk_crypto.get_stats(),
+        'sql_profile': sql_profiler.get_stats()
+    })
@@ -0,0 +1,189 @@
+"""
+Background sports news refresher
+
+Every gunicorn worker runs a daemon thread, but only the holder of the
+'news_refresher' row in scheduler_leases fetches. The others keep trying to
+take the lease and step in within NEWS_REFRESH_LEASE_SECONDS if the leader
+dies. Each source is fetched on its own interval (NEWS_SOURCE_INTERVALS),
+or sooner after someone presses Refresh (no more than once per
+NEWS_REFRESH_MIN_INTERVAL), and its articles go through
+SportsNews.ingest_articles. /sports therefore always reads from the cache.
+
+Per-source outcomes live in news_source_status, so any worker can report
+refresh lag and success rates, and a new leader carries on where the old one
+stopped.
+"""
+
+import os
+import json
+import socket
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, List
+from database import acquire_lease, release_lease
+from models.sports import SportsNews
+
+# Enable with NEWS_REFRESHER=1 (the default); 0 fetches inside the Refresh request instead
+NEWS_REFRESHER = os.environ.get('NEWS_REFRESHER', '1') == '1'
+NEWS_REFRESH_TICK = float(os.environ.get('NEWS_REFRESH_TICK', 15))
+NEWS_REFRESH_LEASE_SECONDS = float(os.environ.get('NEWS_REFRESH_LEASE_SECONDS', 90))
+
+# Seconds between fetches of each source, and the floor for user-requested refreshes
+NEWS_REFRESH_INTERVAL = float(os.environ.get('NEWS_REFRESH_INTERVAL', 900))
+NEWS_REFRESH_MIN_INTERVAL = float(os.environ.get('NEWS_REFRESH_MIN_INTERVAL', 60))
+NEWS_SOURCE_INTERVALS = {
+    'BBC Sport': 600,
+    'Sky Sports': NEWS_REFRESH_INTERVAL,
+    'Goal.com': NEWS_REFRESH_INTERVAL,
+    'Reddit r/soccer': 300,
+}
+
+# Articles older than this are removed once an hour
+NEWS_RETENTION_DAYS = int(os.environ.get('NEWS_RETENTION_DAYS', 7))
+
+LEASE_NAME = 'news_refresher'
+
+
+class NewsRefresher:
+    """Polls news sources on a daemon thread while holding the refresh lease"""
+
+    def __init__(self, tick: float = NEWS_REFRESH_TICK, lease_seconds: float = NEWS_REFRESH_LEASE_SECONDS,
+                 intervals: Dict[str, float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.tick = tick
+        self.lease_seconds = lease_seconds
+        self.intervals = dict(NEWS_SOURCE_INTERVALS, **(intervals or {}))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._leader = False
+        self._last_cleanup = 0.0
+        self._stats = {'ticks': 0, 'ticks_as_leader': 0, 'fetches': 0, 'lease_changes': 0, 'errors': 0}
+
+    def init_app(self, app):
+        """Start the refresher with the app's first request (after any fork)"""
+        if not NEWS_REFRESHER:
+            return
+        app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        """Start the refresher thread if it is not running"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='news-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the thread and hand the lease over"""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        if self._leader:
+            release_lease(LEASE_NAME, self.owner)
+            self._leader = False
+
+    def _run(self):
+        # First tick straight away so a fresh deployment fills the cache
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                self.logger.error(f"News refresh failed: {e}")
+            self._stop.wait(self.tick)
+
+    def run_once(self) -> List[str]:
+        """One tick: renew or take the lease, then fetch the sources that are due"""
+        leader = acquire_lease(LEASE_NAME, self.owner, self.lease_seconds)
+        with self._lock:
+            self._stats['ticks'] += 1
+            if leader != self._leader:
+                self._stats['lease_changes'] += 1
+                self.logger.info(f"News refresher {self.owner} {'acquired' if leader else 'lost'} the lease")
+            self._leader = leader
+            if leader:
+                self._stats['ticks_as_leader'] += 1
+        if not leader:
+            return []
+
+        now = time.time()
+        status = SportsNews.get_source_status()
+        due = [name for name in self.intervals if self._is_due(name, status.get(name), now)]
+        if due:
+            self._refresh(due, now)
+
+        if now - self._last_cleanup >= 3600:
+            self._last_cleanup = now
+            SportsNews.cleanup_old_articles(days=NEWS_RETENTION_DAYS)
+        return due
+
+    def _is_due(self, name: str, row, now: float) -> bool:
+        if row is None or row['last_attempt_at'] is None:
+            return True
+        since = now - row['last_attempt_at']
+        requested = row['refresh_requested_at'] and row['refresh_requested_at'] > row['last_attempt_at']
+        return since >= self.intervals[name] or (requested and since >= NEWS_REFRESH_MIN_INTERVAL)
+
+    def _refresh(self, names: List[str], attempted_at: float):
+        """Fetch names concurrently and save each source's articles"""
+        from sports import HabitStackTransferNewsFetcher
+
+        fetcher = HabitStackTransferNewsFetcher()
+        counts = SportsNews.ingest_articles(fetcher.fetch_all_sources(names=names))
+        # Only now can the next fetch of these pages be conditional
+        fetcher.save_validators()
+
+        for name, outcome in fetcher.last_fetch.items():
+            ingested = counts.get(name, {})
+            SportsNews.record_fetch(name, outcome, ingested.get('inserted', 0), ingested.get('duplicates', 0),
+                                    attempted_at)
+        with self._lock:
+            self._stats['fetches'] += len(fetcher.last_fetch)
+
+    def get_stats(self) -> Dict:
+        """Leadership, and per-source refresh lag and success rate from news_source_status"""
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats, owner=self.owner, leader=self._leader, running=self._thread is not None)
+
+        sources = {}
+        status = SportsNews.get_source_status()
+        for name, interval in self.intervals.items():
+            row = status.get(name) or {}
+            attempts = (row.get('successes') or 0) + (row.get('failures') or 0)
+            last_success = row.get('last_success_at')
+            sources[name] = {
+                'interval_seconds': interval,
+                'refresh_lag_seconds': round(now - last_success, 1) if last_success else None,
+                'last_success': datetime.fromtimestamp(last_success).isoformat(timespec='seconds') if last_success else None,
+                'last_status': row.get('last_status'),
+                'last_error': row.get('last_error'),
+                'last_ms': row.get('last_ms'),
+                'last_articles': row.get('last_articles'),
+                'articles_saved': row.get('articles_saved') or 0,
+                'articles_duplicate': row.get('articles_duplicate') or 0,
+                'successes': row.get('successes') or 0,
+                'failures': row.get('failures') or 0,
+                'success_rate': (row.get('successes') or 0) / attempts if attempts else None
+            }
+        stats['sources'] = sources
+        return stats
+
+    def log_stats(self):
+        self.logger.info(json.dumps({'event': 'news_refresher_stats', **self.get_stats()}))
+
+
+# Global news refresher instance
+news_refresher = NewsRefresher()
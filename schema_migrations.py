@@ -0,0 +1,549 @@
+"""
+Versioned schema migrations for HabitStack
+
+Each step is a function registered with @migration(version, description).
+migrate() applies the steps newer than the database's schema_version, in
+order, each in its own BEGIN IMMEDIATE transaction that also records the
+version and how long the step took. A failing step is rolled back and stops
+the run, leaving earlier steps applied. Several processes starting at once
+are safe: each step re-checks the version once it holds the write lock.
+
+Steps must not call executescript(), which commits the open transaction
+first; pass scripts to run_script() instead.
+
+Usage: uv run python schema_migrations.py [--dry-run] [--target VERSION] [--status]
+"""
+
+import sys
+import hashlib
+import sqlite3
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationError(Exception):
+    """Raised when a migration step fails; the step has been rolled back"""
+
+
+@dataclass
+class Migration:
+    """One ordered schema change"""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Register a step; versions must be added in increasing order"""
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"Migration {version} must be newer than {MIGRATIONS[-1].version}")
+        MIGRATIONS.append(Migration(version, description, fn))
+        return fn
+    return register
+
+
+def run_script(conn, script: str):
+    """Execute a multi-statement script inside the current transaction"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+    if statement.strip():
+        raise MigrationError(f"Incomplete SQL statement: {statement.strip()[:80]}")
+
+
+def add_column(conn, table: str, column: str, definition: str):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    """)
+
+
+def current_version(conn) -> int:
+    """Highest applied version (0 for a new or pre-versioning database)"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def pending_migrations(conn, target: Optional[int] = None) -> List[Migration]:
+    """Steps newer than the database, up to target"""
+    version = current_version(conn)
+    return [step for step in MIGRATIONS
+            if step.version > version and (target is None or step.version <= target)]
+
+
+def migrate(conn, dry_run: bool = False, target: Optional[int] = None) -> List[Dict]:
+    """Apply pending steps, returning one result per step
+
+    With dry_run the pending steps are only listed. The connection must not
+    have a transaction open; it is switched to autocommit for the run.
+    """
+    if dry_run:
+        return [{'version': step.version, 'description': step.description, 'status': 'pending'}
+                for step in pending_migrations(conn, target)]
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        _ensure_version_table(conn)
+        results = []
+        for step in pending_migrations(conn, target):
+            results.append(_apply(conn, step))
+        return results
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def _apply(conn, step: Migration) -> Dict:
+    """Run one step in its own transaction and record it in schema_version"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have applied it while we waited for the lock
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (step.version,)).fetchone():
+            conn.execute("ROLLBACK")
+            return {'version': step.version, 'description': step.description, 'status': 'skipped'}
+
+        started = time.perf_counter()
+        step.apply(conn)
+        duration_ms = (time.perf_counter() - started) * 1000
+        conn.execute(
+            "INSERT INTO schema_version (version, description, duration_ms) VALUES (?, ?, ?)",
+            (step.version, step.description, duration_ms)
+        )
+        conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        logger.error(f"Schema migration {step.version} ({step.description}) failed: {e}")
+        raise MigrationError(f"Migration {step.version} failed: {e}") from e
+
+    logger.info(f"Applied schema migration {step.version} ({step.description}) in {duration_ms:.1f} ms")
+    return {'version': step.version, 'description': step.description,
+            'status': 'applied', 'duration_ms': duration_ms}
+
+
+@migration(1, "Initial tables")
+def _initial_tables(conn):
+    run_script(conn, """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            points INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS habit_completions (
+            id INTEGER PRIMARY KEY,
+            habit_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            completion_date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (habit_id) REFERENCES habits (id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(habit_id, completion_date)
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_notes (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            note_date DATE NOT NULL,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, note_date)
+        );
+
+        CREATE TABLE IF NOT EXISTS birthdays (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            birth_date DATE NOT NULL,
+            relationship_type TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS watchlist (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            type TEXT NOT NULL,
+            genre TEXT,
+            status TEXT NOT NULL DEFAULT 'want_to_watch',
+            priority TEXT DEFAULT 'medium',
+            rating INTEGER,
+            notes TEXT,
+            current_episode INTEGER DEFAULT 0,
+            total_episodes INTEGER,
+            release_year INTEGER,
+            date_added DATE DEFAULT CURRENT_DATE,
+            date_completed DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS todos (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT DEFAULT 'medium',
+            due_date DATE,
+            category TEXT,
+            completed BOOLEAN DEFAULT 0,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS reading_list (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            total_pages INTEGER,
+            current_page INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'want_to_read',
+            rating INTEGER,
+            notes TEXT,
+            date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            date_completed TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        -- Materialized streaks, maintained by Habit
+        CREATE TABLE IF NOT EXISTS habit_streaks (
+            habit_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            last_completion_date DATE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        -- Optional compact history, see models/habit_history.py
+        CREATE TABLE IF NOT EXISTS habit_completion_bitmaps (
+            habit_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            bits BLOB NOT NULL,
+            PRIMARY KEY (habit_id, year),
+            FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS sports_news (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            link TEXT,
+            source TEXT NOT NULL,
+            published TEXT,
+            summary TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(title, source)
+        );
+
+        -- Dynamic field registry
+        CREATE TABLE IF NOT EXISTS encryptable_fields (
+            id INTEGER PRIMARY KEY,
+            module_name TEXT NOT NULL,
+            field_name TEXT NOT NULL,
+            field_display_name TEXT NOT NULL,
+            field_description TEXT,
+            recommended_encrypt BOOLEAN DEFAULT 1,
+            added_version TEXT DEFAULT '1.0',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(module_name, field_name)
+        );
+
+        CREATE TABLE IF NOT EXISTS user_encryption_preferences (
+            user_id INTEGER NOT NULL,
+            field_name TEXT NOT NULL,
+            encrypted BOOLEAN DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, field_name),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+    """)
+
+
+@migration(2, "Add users.deleted_at, encryption_salt and preferences_version")
+def _user_columns(conn):
+    # Databases created before versioning may already have some of these
+    add_column(conn, 'users', 'deleted_at', 'TIMESTAMP NULL')
+    add_column(conn, 'users', 'encryption_salt', 'BLOB')
+    add_column(conn, 'users', 'preferences_version', 'INTEGER DEFAULT 0')
+
+
+@migration(3, "Initial indexes")
+def _initial_indexes(conn):
+    run_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_habits_user_id ON habits(user_id);
+        CREATE INDEX IF NOT EXISTS idx_completions_habit_date ON habit_completions(habit_id, completion_date);
+        CREATE INDEX IF NOT EXISTS idx_completions_user_date ON habit_completions(user_id, completion_date);
+        CREATE INDEX IF NOT EXISTS idx_habit_streaks_user ON habit_streaks(user_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_user_date ON daily_notes(user_id, note_date);
+        CREATE INDEX IF NOT EXISTS idx_birthdays_user_id ON birthdays(user_id);
+        CREATE INDEX IF NOT EXISTS idx_birthdays_birth_date ON birthdays(birth_date);
+        CREATE INDEX IF NOT EXISTS idx_watchlist_user_id ON watchlist(user_id);
+        CREATE INDEX IF NOT EXISTS idx_watchlist_status ON watchlist(status);
+        CREATE INDEX IF NOT EXISTS idx_watchlist_type ON watchlist(type);
+        CREATE INDEX IF NOT EXISTS idx_users_deleted ON users(deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_todos_user_id ON todos(user_id);
+        CREATE INDEX IF NOT EXISTS idx_todos_due_date ON todos(due_date);
+        CREATE INDEX IF NOT EXISTS idx_todos_priority ON todos(priority);
+        CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos(completed);
+        CREATE INDEX IF NOT EXISTS idx_todos_deleted ON todos(deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_reading_user_id ON reading_list(user_id);
+        CREATE INDEX IF NOT EXISTS idx_reading_status ON reading_list(status);
+        CREATE INDEX IF NOT EXISTS idx_reading_deleted ON reading_list(deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_reading_user_status ON reading_list(user_id, status, deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_sports_news_created_at ON sports_news(created_at);
+        CREATE INDEX IF NOT EXISTS idx_sports_news_source ON sports_news(source);
+        CREATE INDEX IF NOT EXISTS idx_encryption_prefs_user ON user_encryption_preferences(user_id);
+        CREATE INDEX IF NOT EXISTS idx_encryptable_fields_module ON encryptable_fields(module_name);
+    """)
+
+
+
+@migration(4, "Replace single-column indexes with indexes matched to model queries")
+def _query_indexes(conn):
+    # Redundant with UNIQUE/PRIMARY KEY indexes, superseded below, or on
+    # low-cardinality columns (completed, status, type) that only slowed writes
+    run_script(conn, """
+        DROP INDEX IF EXISTS idx_habits_user_id;
+        DROP INDEX IF EXISTS idx_completions_habit_date;
+        DROP INDEX IF EXISTS idx_notes_user_date;
+        DROP INDEX IF EXISTS idx_todos_user_id;
+        DROP INDEX IF EXISTS idx_todos_due_date;
+        DROP INDEX IF EXISTS idx_todos_priority;
+        DROP INDEX IF EXISTS idx_todos_completed;
+        DROP INDEX IF EXISTS idx_todos_deleted;
+        DROP INDEX IF EXISTS idx_reading_user_id;
+        DROP INDEX IF EXISTS idx_reading_status;
+        DROP INDEX IF EXISTS idx_reading_deleted;
+        DROP INDEX IF EXISTS idx_reading_user_status;
+        DROP INDEX IF EXISTS idx_watchlist_user_id;
+        DROP INDEX IF EXISTS idx_watchlist_status;
+        DROP INDEX IF EXISTS idx_watchlist_type;
+        DROP INDEX IF EXISTS idx_birthdays_user_id;
+        DROP INDEX IF EXISTS idx_birthdays_birth_date;
+        DROP INDEX IF EXISTS idx_users_deleted;
+        DROP INDEX IF EXISTS idx_encryption_prefs_user;
+        DROP INDEX IF EXISTS idx_encryptable_fields_module;
+    """)
+
+    # Ordered lists read straight from the index (no temp B-tree sort). The
+    # CASE expressions must stay identical to the ORDER BY in models/queries.py.
+    run_script(conn, """
+        CREATE INDEX IF NOT EXISTS idx_habits_user_created ON habits(user_id, created_at);
+
+        -- TODOS_OPEN and TODOS_ALL. Not partial: account deletion and
+        -- re-encryption also look up a user's soft-deleted todos
+        CREATE INDEX IF NOT EXISTS idx_todos_user_open_order ON todos(
+            user_id,
+            completed,
+            CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END,
+            CASE WHEN due_date IS NULL THEN 1 ELSE 0 END,
+            due_date,
+            created_at
+        );
+
+        -- TODOS_FOR_USER, TODO_STATS and TODO_CATEGORIES only read live todos
+        CREATE INDEX IF NOT EXISTS idx_todos_user_status_order ON todos(
+            user_id,
+            completed,
+            CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END,
+            due_date,
+            created_at
+        ) WHERE deleted_at IS NULL;
+
+        CREATE INDEX IF NOT EXISTS idx_reading_user_added ON reading_list(user_id, date_added);
+        CREATE INDEX IF NOT EXISTS idx_watchlist_user_added ON watchlist(user_id, date_added);
+
+        -- Calendar order and today's birthdays
+        CREATE INDEX IF NOT EXISTS idx_birthdays_user_day ON birthdays(user_id, substr(birth_date, 6), name);
+    """)
+
+
+@migration(5, "Add scheduler leases and news source status")
+def _news_refresher_tables(conn):
+    run_script(conn, """
+        -- One row per background job; the owner renews it before expires_at (unix time)
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+
+        -- Last fetch of each sports news source, maintained by news_refresher.py
+        CREATE TABLE IF NOT EXISTS news_source_status (
+            source TEXT PRIMARY KEY,
+            last_attempt_at REAL,
+            last_success_at REAL,
+            last_status TEXT,
+            last_error TEXT,
+            last_ms REAL,
+            last_articles INTEGER DEFAULT 0,
+            articles_saved INTEGER DEFAULT 0,
+            successes INTEGER DEFAULT 0,
+            failures INTEGER DEFAULT 0,
+            refresh_requested_at REAL
+        );
+    """)
+
+
+@migration(6, "Add HTTP validators for conditional news fetches")
+def _http_validators(conn):
+    run_script(conn, """
+        -- Validators from the last changed response per URL, sent back as
+        -- If-None-Match / If-Modified-Since; content_hash catches servers without them
+        CREATE TABLE IF NOT EXISTS http_validators (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            updated_at REAL
+        );
+    """)
+
+
+def _article_hash(title: str, link: str) -> int:
+    # As models.sports.article_hash when this step was written
+    key = ' '.join(title.split()).casefold() + '\n' + (link or '').strip()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@migration(7, "Deduplicate sports news on a content hash instead of (title, source)")
+def _sports_news_content_hash(conn):
+    # The UNIQUE(title, source) constraint can only go by rebuilding the table
+    run_script(conn, """
+        CREATE TABLE sports_news_rebuilt (
+            id INTEGER PRIMARY KEY,
+            content_hash INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            link TEXT,
+            source TEXT NOT NULL,
+            published TEXT,
+            summary TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE UNIQUE INDEX idx_sports_news_content_hash ON sports_news_rebuilt(content_hash);
+    """)
+    rows = conn.execute("""
+        SELECT id, title, link, source, published, summary, created_at FROM sports_news ORDER BY id
+    """).fetchall()
+    # The oldest copy of each article is kept
+    conn.executemany("""
+        INSERT OR IGNORE INTO sports_news_rebuilt
+        (id, content_hash, title, link, source, published, summary, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(row[0], _article_hash(row[1], row[2]), *row[1:]) for row in rows])
+    run_script(conn, """
+        DROP TABLE sports_news;
+        ALTER TABLE sports_news_rebuilt RENAME TO sports_news;
+        CREATE INDEX IF NOT EXISTS idx_sports_news_created_at ON sports_news(created_at);
+        CREATE INDEX IF NOT EXISTS idx_sports_news_source ON sports_news(source);
+    """)
+    add_column(conn, 'news_source_status', 'articles_duplicate', 'INTEGER DEFAULT 0')
+
+
+@migration(8, "Track each habit's next completion after its streak in habit_streaks")
+def _habit_streaks_next_completion(conn):
+    add_column(conn, 'habit_streaks', 'next_completion_date', 'DATE')
+    # Completions after a row's last one were dated in the future when it was saved
+    conn.execute("""
+        UPDATE habit_streaks SET next_completion_date = (
+            SELECT MIN(hc.completion_date) FROM habit_completions hc
+            WHERE hc.habit_id = habit_streaks.habit_id
+              AND hc.completion_date > COALESCE(habit_streaks.last_completion_date, '')
+        )
+    """)
+    # Habits without a row (imported ones) get one that is due if they have
+    # completions, so Habit rebuilds it on the first read
+    conn.execute("""
+        INSERT INTO habit_streaks (habit_id, user_id, next_completion_date)
+        SELECT h.id, h.user_id,
+               (SELECT MIN(hc.completion_date) FROM habit_completions hc WHERE hc.habit_id = h.id)
+        FROM habits h
+        WHERE NOT EXISTS (SELECT 1 FROM habit_streaks s WHERE s.habit_id = h.id)
+    """)
+
+
+def main(args: List[str]) -> int:
+    """Apply, list (--dry-run) or report (--status) migrations for DB_PATH"""
+    import database
+
+    dry_run = '--dry-run' in args
+    target = int(args[args.index('--target') + 1]) if '--target' in args else None
+
+    conn = database.open_connection(database.DB_PATH)
+    try:
+        if '--status' in args:
+            latest = MIGRATIONS[-1].version
+            print(f"{database.DB_PATH}: schema version {current_version(conn)} (latest {latest})")
+            for step in pending_migrations(conn):
+                print(f"  pending {step.version:4}  {step.description}")
+            return 0
+
+        results = migrate(conn, dry_run=dry_run, target=target)
+    except MigrationError as e:
+        print(e)
+        return 1
+    finally:
+        conn.close()
+
+    if not results:
+        print("Schema is up to date")
+    for result in results:
+        timing = f"{result['duration_ms']:10.1f} ms" if 'duration_ms' in result else ''
+        print(f"  {result['status']:8} {result['version']:4}  {result['description']}  {timing}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -4,220 +4,325 @@ Sports news routes for HabitStack
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from datetime import datetime
+import os
 import time
 import re
 import json
+import hashlib
+import logging
+import threading
 import requests
 import feedparser
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
 from models.sports import SportsNews
+from news_refresher import NEWS_REFRESHER
 from utils import require_auth, get_current_user
+from utils.news_extractors import SkyHeadlineExtractor, GoalHeadlineExtractor
 
 sports_bp = Blueprint('sports', __name__, url_prefix='/habitstack')
 
+logger = logging.getLogger(__name__)
+
+# A refresh returns whatever the sources delivered within NEWS_FETCH_DEADLINE seconds
+NEWS_FETCH_DEADLINE = float(os.environ.get('NEWS_FETCH_DEADLINE', 15))
+NEWS_SOURCE_TIMEOUT = float(os.environ.get('NEWS_SOURCE_TIMEOUT', 10))
+
+# Minimum seconds between two requests to the same host, across all refreshes
+NEWS_HOST_DELAY = float(os.environ.get('NEWS_HOST_DELAY', 0.5))
+NEWS_FETCH_WORKERS = int(os.environ.get('NEWS_FETCH_WORKERS', 8))
+
+# Send If-None-Match / If-Modified-Since and skip parsing unchanged responses (0 to disable)
+NEWS_CONDITIONAL_GET = os.environ.get('NEWS_CONDITIONAL_GET', '1') == '1'
+
+
+class FetchDeadlineExceeded(Exception):
+    """Raised when a source cannot start or finish a request before the deadline"""
+
+
+class SourceNotModified(Exception):
+    """Raised when a source's response is the same as last time, so there is nothing to parse"""
+
+
+class HostThrottle:
+    """Spaces requests to the same host at least delay seconds apart
+    
+    Each request reserves the next free slot for its host under the lock and
+    then sleeps until it, so concurrent fetches to one host queue up in order
+    while fetches to other hosts go ahead.
+    """
+    
+    def __init__(self, delay: float = NEWS_HOST_DELAY):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_slot = {}
+    
+    def wait(self, url: str, deadline: float):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            if slot >= deadline:
+                raise FetchDeadlineExceeded(f"No request slot for {host} before the deadline")
+            self._next_slot[host] = slot + self.delay
+        time.sleep(slot - now)
+
+
+# Shared by every fetcher so politeness holds across overlapping refreshes
+host_throttle = HostThrottle()
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+def _get_fetch_executor() -> ThreadPoolExecutor:
+    """Start the fetch pool on first use"""
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS, thread_name_prefix='newsfetch')
+        return _fetch_executor
+
 class TransferNewsFetcher:
-    """Fetches transfer news from multiple sources"""
+    """Fetches transfer news from multiple sources
+    
+    The fetch_* methods raise on network or HTTP errors; fetch_all_sources
+    runs them concurrently and records each source's outcome.
+    """
+    
+    BBC_FEED_URL = "http://feeds.bbci.co.uk/sport/football/rss.xml"
+    REDDIT_SEARCH_URL = "https://www.reddit.com/r/soccer/search.json"
     
-    def __init__(self):
+    def __init__(self, deadline: float = NEWS_FETCH_DEADLINE, throttle: HostThrottle = host_throttle):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.deadline = deadline
+        self.throttle = throttle
+        self._deadline_at = None
+        self._local = threading.local()
+        self.last_fetch = {}
+        self.pending_validators = {}
+    
+    def _get(self, url, params=None):
+        """GET url after the host's politeness delay, timing out by the deadline
+        
+        The request is conditional on the validators saved from the previous
+        changed response. A 304, or a body with the same SHA-256 as last time
+        (for servers that send neither ETag nor Last-Modified), raises
+        SourceNotModified so the caller skips parsing. A changed response's
+        validators are only collected here; save_validators() stores them
+        once its articles are safely cached.
+        """
+        deadline = self._deadline_at or time.monotonic() + self.deadline
+        self.throttle.wait(url, deadline)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FetchDeadlineExceeded(f"Deadline passed before requesting {url}")
+        
+        key = requests.Request('GET', url, params=params).prepare().url
+        validators = SportsNews.get_http_validators(key) if NEWS_CONDITIONAL_GET else None
+        headers = {}
+        if validators and validators['etag']:
+            headers['If-None-Match'] = validators['etag']
+        if validators and validators['last_modified']:
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        response = self.session.get(url, params=params, headers=headers,
+                                    timeout=min(NEWS_SOURCE_TIMEOUT, remaining))
+        if response.status_code == 304:
+            raise SourceNotModified(f"{key} not modified")
+        response.raise_for_status()
+        
+        if NEWS_CONDITIONAL_GET:
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            if validators and validators['content_hash'] == content_hash:
+                raise SourceNotModified(f"{key} unchanged")
+            collected = getattr(self._local, 'validators', None)
+            if collected is not None:
+                collected.append((key, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                  content_hash))
+        return response
+    
+    def save_validators(self, names=None):
+        """Store the validators of sources (default: all) whose articles have been saved"""
+        for name in list(names if names is not None else self.pending_validators):
+            for key, etag, last_modified, content_hash in self.pending_validators.pop(name, []):
+                SportsNews.save_http_validators(key, etag, last_modified, content_hash)
     
     def fetch_bbc_sport_transfers(self):
         """Fetch transfer news from BBC Sport RSS feed"""
-        try:
-            feed_url = "http://feeds.bbci.co.uk/sport/football/rss.xml"
-            feed = feedparser.parse(feed_url)
-            
-            transfers = []
-            for entry in feed.entries[:10]:  # Get latest 10 entries
-                if any(keyword in entry.title.lower() for keyword in ['transfer', 'sign', 'move', 'deal', 'join']):
-                    transfers.append({
-                        'title': entry.title,
-                        'link': entry.link,
-                        'published': entry.get('published', 'No date'),
-                        'summary': entry.get('summary', 'No summary'),
-                        'source': 'BBC Sport'
-                    })
-            return transfers
-        except Exception as e:
-            print(f"Error fetching BBC Sport: {e}")
-            return []
+        # Download through the session so the timeout applies; feedparser only parses
+        feed = feedparser.parse(self._get(self.BBC_FEED_URL).content)
+        
+        transfers = []
+        for entry in feed.entries[:10]:  # Get latest 10 entries
+            if any(keyword in entry.title.lower() for keyword in ['transfer', 'sign', 'move', 'deal', 'join']):
+                transfers.append({
+                    'title': entry.title,
+                    'link': entry.link,
+                    'published': entry.get('published', 'No date'),
+                    'summary': entry.get('summary', 'No summary'),
+                    'source': 'BBC Sport'
+                })
+        return transfers
     
     def fetch_reddit_soccer_transfers(self):
         """Fetch transfer discussions from Reddit Soccer (JSON API)"""
-        try:
-            url = "https://www.reddit.com/r/soccer/search.json"
-            params = {
-                'q': 'transfer OR signing OR deal',
-                'sort': 'new',
-                'limit': 10,
-                'restrict_sr': 1,
-                't': 'day'
-            }
-            response = self.session.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            transfers = []
-            for post in data['data']['children']:
-                post_data = post['data']
-                if any(keyword in post_data['title'].lower() for keyword in ['transfer', 'sign', 'deal', 'move', 'join']):
-                    transfers.append({
-                        'title': post_data['title'],
-                        'link': f"https://reddit.com{post_data['permalink']}",
-                        'published': datetime.fromtimestamp(post_data['created_utc']).strftime('%Y-%m-%d %H:%M'),
-                        'summary': post_data.get('selftext', '')[:200] + '...' if post_data.get('selftext') else post_data['title'],
-                        'source': 'Reddit r/soccer'
-                    })
-            
-            return transfers
-        except Exception as e:
-            print(f"Error fetching Reddit: {e}")
-            return []
+        params = {
+            'q': 'transfer OR signing OR deal',
+            'sort': 'new',
+            'limit': 10,
+            'restrict_sr': 1,
+            't': 'day'
+        }
+        data = self._get(self.REDDIT_SEARCH_URL, params=params).json()
+        
+        transfers = []
+        for post in data['data']['children']:
+            post_data = post['data']
+            if any(keyword in post_data['title'].lower() for keyword in ['transfer', 'sign', 'deal', 'move', 'join']):
+                transfers.append({
+                    'title': post_data['title'],
+                    'link': f"https://reddit.com{post_data['permalink']}",
+                    'published': datetime.fromtimestamp(post_data['created_utc']).strftime('%Y-%m-%d %H:%M'),
+                    'summary': post_data.get('selftext', '')[:200] + '...' if post_data.get('selftext') else post_data['title'],
+                    'source': 'Reddit r/soccer'
+                })
+        
+        return transfers
 
 class HabitStackTransferNewsFetcher(TransferNewsFetcher):
     """Fetches transfer news from multiple sources (reusing original news.py implementation)"""
     
+    SKY_TRANSFERS_URL = "https://www.skysports.com/football/transfer-news"
+    GOAL_TRANSFERS_URL = "https://www.goal.com/en/transfers"
+    TRANSFERMARKT_URL = "https://www.transfermarkt.com/statistik/neuestetransfers"
+    
+
+    # HTML headline extractors (utils/news_extractors.py); swap one in to change how a page is scraped
+    sky_extractor = SkyHeadlineExtractor()
+    goal_extractor = GoalHeadlineExtractor()
+
     def fetch_sky_sports_transfers(self):
         """Fetch transfer news from Sky Sports (updated selectors)"""
-        try:
-            url = "https://www.skysports.com/football/transfer-news"
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            transfers = []
-            # Look for h3 elements with sdc-site-tile__headline class
-            headlines = soup.find_all('h3', class_='sdc-site-tile__headline')
-            
-            for headline in headlines[:6]:  # Limit to 6 for web display
-                title = headline.get_text(strip=True)
-                if title and len(title) > 15:
-                    # Check if it's transfer related
-                    if any(word in title.lower() for word in ['transfer', 'sign', 'move', 'deal', 'join', 'bid']):
-                        # Look for link
-                        link_elem = headline.find('a') or headline.find_parent('a')
-                        link = ''
-                        if link_elem:
-                            link = link_elem.get('href', '')
-                            if link and not link.startswith('http'):
-                                link = 'https://www.skysports.com' + link
-                        
-                        transfers.append({
-                            'title': title,
-                            'link': link,
-                            'published': 'Recent',
-                            'summary': title[:150] + '...' if len(title) > 150 else title,
-                            'source': 'Sky Sports'
-                        })
-            
-            return transfers
-        except Exception as e:
-            print(f"Error fetching Sky Sports: {e}")
-            return []
+        return self.sky_extractor.extract(self._get(self.SKY_TRANSFERS_URL).content)
 
     def fetch_goal_transfers(self):
         """Fetch transfer news from Goal.com (updated URL)"""
-        try:
-            url = "https://www.goal.com/en/transfers"
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            transfers = []
-            # Look for headlines
-            headlines = soup.find_all(['h1', 'h2', 'h3', 'h4'])
-            
-            for headline in headlines[:8]:  # Limit to 8 for web display
-                title = headline.get_text(strip=True)
-                if title and len(title) > 15:
-                    # Check if it's transfer related
-                    if any(word in title.lower() for word in ['transfer', 'sign', 'move', 'deal', 'join']):
-                        # Look for link
-                        link_elem = headline.find('a') or headline.find_parent('a')
-                        link = ''
-                        if link_elem:
-                            link = link_elem.get('href', '')
-                            if link and not link.startswith('http'):
-                                link = 'https://www.goal.com' + link
-                        
-                        transfers.append({
-                            'title': title,
-                            'link': link,
-                            'published': 'Recent',
-                            'summary': title[:150] + '...' if len(title) > 150 else title,
-                            'source': 'Goal.com'
-                        })
-            
-            return transfers
-        except Exception as e:
-            print(f"Error fetching Goal.com: {e}")
-            return []
+        return self.goal_extractor.extract(self._get(self.GOAL_TRANSFERS_URL).content)
 
     def fetch_transfermarkt_news(self):
         """Fetch news from Transfermarkt (updated URL)"""
-        try:
-            url = "https://www.transfermarkt.com/statistik/neuestetransfers"
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            transfers = []
-            # Look for transfer items in the table or list
-            rows = soup.find_all('tr')
-            
-            for row in rows[:8]:  # Limit to 8 for web display
-                # Look for player names and club information
-                cells = row.find_all(['td', 'th'])
-                if len(cells) >= 3:
-                    # Try to extract player and club info
-                    player_cell = None
-                    club_cells = []
-                    
-                    for cell in cells:
-                        text = cell.get_text(strip=True)
-                        if text and len(text) > 2:
-                            if any(word in text.lower() for word in ['fc', 'united', 'city', 'real', 'barcelona']):
-                                club_cells.append(text)
-                            elif text and not any(char in text for char in ['€', '$', 'mil', 'k']):
-                                if not player_cell:
-                                    player_cell = text
-                    
-                    if player_cell and club_cells:
-                        title = f"{player_cell} - {' to '.join(club_cells[:2])}"
-                        transfers.append({
-                            'title': title,
-                            'link': 'https://www.transfermarkt.com/statistik/neuestetransfers',
-                            'published': 'Recent',
-                            'summary': title,
-                            'source': 'Transfermarkt'
-                        })
-            
-            return transfers
-        except Exception as e:
-            print(f"Error fetching Transfermarkt: {e}")
-            return []
-    
-    def fetch_all_sources(self):
-        """Fetch from all sources with error handling - adapted for HabitStack"""
-        all_transfers = []
+        response = self._get(self.TRANSFERMARKT_URL)
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        transfers = []
+        # Look for transfer items in the table or list
+        rows = soup.find_all('tr')
         
-        # Use the original sources from news.py
-        sources = [
+        for row in rows[:8]:  # Limit to 8 for web display
+            # Look for player names and club information
+            cells = row.find_all(['td', 'th'])
+            if len(cells) >= 3:
+                # Try to extract player and club info
+                player_cell = None
+                club_cells = []
+                
+                for cell in cells:
+                    text = cell.get_text(strip=True)
+                    if text and len(text) > 2:
+                        if any(word in text.lower() for word in ['fc', 'united', 'city', 'real', 'barcelona']):
+                            club_cells.append(text)
+                        elif text and not any(char in text for char in ['€', '$', 'mil', 'k']):
+                            if not player_cell:
+                                player_cell = text
+                
+                if player_cell and club_cells:
+                    title = f"{player_cell} - {' to '.join(club_cells[:2])}"
+                    transfers.append({
+                        'title': title,
+                        'link': 'https://www.transfermarkt.com/statistik/neuestetransfers',
+                        'published': 'Recent',
+                        'summary': title,
+                        'source': 'Transfermarkt'
+                    })
+        
+        return transfers
+    
+    def sources(self):
+        """(name, fetch function) for every enabled source, in display order"""
+        return [
             ("BBC Sport", self.fetch_bbc_sport_transfers),
             ("Sky Sports", self.fetch_sky_sports_transfers),
             ("Goal.com", self.fetch_goal_transfers),
             # ("Transfermarkt", self.fetch_transfermarkt_news),  # Disabled due to complex structure
             ("Reddit r/soccer", self.fetch_reddit_soccer_transfers),
         ]
+    
+    def _fetch_source(self, name, fetch_func):
+        """Run one source, returning its articles, outcome and the validators of
+        the responses it parsed instead of raising"""
+        started = time.perf_counter()
+        validators = self._local.validators = []
+        try:
+            articles = fetch_func()
+            outcome = {'status': 'ok', 'articles': len(articles)}
+        except SourceNotModified:
+            # Its articles are already cached from the fetch that saw this content
+            articles, validators = [], []
+            outcome = {'status': 'unchanged', 'articles': 0}
+        except Exception as e:
+            articles, validators = [], []
+            outcome = {'status': 'timeout' if isinstance(e, (FetchDeadlineExceeded, requests.Timeout)) else 'error',
+                       'error': str(e)[:200]}
+            logger.warning(f"Error fetching {name}: {e}")
+        finally:
+            self._local.validators = None
+        outcome['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return articles, outcome, validators
+    
+    def fetch_all_sources(self, names=None):
+        """Fetch every source (or those in names) concurrently and return what
+        arrived by the deadline
+        
+        A slow or failing source only loses its own articles. Per-source
+        outcomes (ok / unchanged / error / timeout, article count,
+        milliseconds) are left in last_fetch. Call save_validators() after
+        saving the articles so the next fetch can be conditional; a source
+        given up on at the deadline keeps its old validators.
+        """
+        started = time.perf_counter()
+        self._deadline_at = time.monotonic() + self.deadline
+        executor = _get_fetch_executor()
+        futures = [(name, executor.submit(self._fetch_source, name, fetch_func))
+                   for name, fetch_func in self.sources() if names is None or name in names]
         
-        for source_name, fetch_func in sources:
-            try:
-                transfers = fetch_func()
-                all_transfers.extend(transfers)
-                time.sleep(0.5)  # Be respectful to servers
-            except Exception as e:
-                print(f"Failed to fetch from {source_name}: {e}")
-                continue
+        # Sources still running at the deadline are left to time out on their own
+        wait([future for _, future in futures], timeout=self.deadline)
         
+        all_transfers = []
+        self.last_fetch = {}
+        self.pending_validators = {}
+        for name, future in futures:
+            if future.done():
+                articles, outcome, validators = future.result()
+                all_transfers.extend(articles)
+                if validators:
+                    self.pending_validators[name] = validators
+            else:
+                future.cancel()
+                outcome = {'status': 'timeout', 'error': f"No response within {self.deadline}s"}
+                logger.warning(f"Gave up on {name} at the {self.deadline}s deadline")
+            self.last_fetch[name] = outcome
+        
+        logger.info(json.dumps({
+            'event': 'news_fetch',
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'articles': len(all_transfers),
+            'sources': self.last_fetch
+        }))
         return all_transfers
 
 @sports_bp.route('/sports')
@@ -253,13 +358,22 @@ def refresh_news():
         # Initialize table if it doesn't exist
         SportsNews.create_table()
         
+        # The background refresher fetches on its next tick; the page stays cached
+        if NEWS_REFRESHER:
+            SportsNews.request_refresh()
+            flash('Refresh requested. New articles will appear within a minute or so.', 'info')
+            return redirect(url_for('sports.sports_news'))
+        
         # Fetch new articles
         fetcher = HabitStackTransferNewsFetcher()
         new_articles = fetcher.fetch_all_sources()
+        missed = [name for name, outcome in fetcher.last_fetch.items()
+                  if outcome['status'] not in ('ok', 'unchanged')]
         
         if new_articles:
             # Save to database
             saved_count = SportsNews.save_articles(new_articles)
+            fetcher.save_validators()
             
             # Clean up old articles (keep last 7 days)
             cleaned_count = SportsNews.cleanup_old_articles(days=7)
@@ -268,6 +382,10 @@ def refresh_news():
                 flash(f'Successfully refreshed! Added {saved_count} new articles.', 'success')
             else:
                 flash('Refresh completed. No new articles found.', 'info')
+            if missed:
+                flash(f"No response from {', '.join(missed)}; showing the other sources.", 'warning')
+        elif len(missed) < len(fetcher.last_fetch):
+            flash('Refresh completed. No new articles found.', 'info')
         else:
             flash('Unable to fetch news at this time. Please try again later.', 'warning')
             
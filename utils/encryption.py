@@ -3,11 +3,47 @@ Encryption utilities for user-controlled field encryption
 """
 
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.fernet import Fernet
+from collections import OrderedDict
+from typing import List, Optional
 import os
+import re
 import base64
 import logging
+import threading
+import time
+
+# Number of per-key cipher objects kept (one per active user key and algorithm)
+CIPHER_CACHE_SIZE = 256
+
+# Versioned envelope: prefix tag + urlsafe base64 (unpadded) of nonce || ciphertext || tag.
+# Values without a known prefix are read as legacy Fernet tokens.
+ENVELOPE_PREFIXES = {
+    'aesgcm': 'hs2a:',    # AES-256-GCM
+    'chacha20': 'hs2c:',  # ChaCha20-Poly1305
+}
+ENVELOPE_PREFIX_LENGTH = 5
+AEAD_NONCE_BYTES = 12
+AEAD_TAG_BYTES = 16
+
+# Cipher for new writes: aesgcm (default), chacha20, or fernet (legacy format)
+ENCRYPTION_CIPHER = os.environ.get('ENCRYPTION_CIPHER', 'aesgcm')
+
+# Legacy Fernet token layout: 1 version + 8 timestamp + 16 IV + 32 HMAC bytes
+# around a ciphertext of at least one 16-byte block
+FERNET_OVERHEAD_BYTES = 57
+FERNET_BLOCK_BYTES = 16
+FERNET_MIN_LENGTH = 100  # base64 length of the smallest (73-byte) token
+FERNET_MIN_TIMESTAMP = 1420070400  # 2015-01-01, before any HabitStack data
+FERNET_MAX_CLOCK_SKEW = 60 * 60 * 24 * 365
+
+# Shortest possible envelope: prefix + base64 of nonce, one byte and tag
+MIN_ENVELOPE_LENGTH = ENVELOPE_PREFIX_LENGTH + ((AEAD_NONCE_BYTES + 1 + AEAD_TAG_BYTES) * 4 + 2) // 3
+URLSAFE_BASE64_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+ENVELOPE_PAYLOAD = re.compile(r'[A-Za-z0-9_-]+')
 
 
 class EncryptionManager:
@@ -15,6 +51,69 @@ class EncryptionManager:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self._ciphers = OrderedDict()
+        self._ciphers_lock = threading.Lock()
+    
+    def _get_cipher(self, key: bytes, algorithm: str = 'fernet'):
+        """Get a cipher instance for key and algorithm, reusing one built earlier"""
+        cache_key = (algorithm, key)
+        with self._ciphers_lock:
+            cipher = self._ciphers.get(cache_key)
+            if cipher is not None:
+                self._ciphers.move_to_end(cache_key)
+                return cipher
+        
+        # Building a cipher decodes (and for AEAD derives) the key; do it outside the lock
+        if algorithm == 'aesgcm':
+            cipher = AESGCM(self._derive_aead_key(key))
+        elif algorithm == 'chacha20':
+            cipher = ChaCha20Poly1305(self._derive_aead_key(key))
+        else:
+            cipher = Fernet(key)
+        
+        with self._ciphers_lock:
+            self._ciphers[cache_key] = cipher
+            while len(self._ciphers) > CIPHER_CACHE_SIZE:
+                self._ciphers.popitem(last=False)
+        return cipher
+    
+    def _derive_aead_key(self, key: bytes) -> bytes:
+        """Derive a separate 256-bit AEAD key from the user's Fernet-format key"""
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b'habitstack field encryption v2',
+        ).derive(base64.urlsafe_b64decode(key))
+    
+    def _envelope_algorithm(self, text: str) -> Optional[str]:
+        """Get the algorithm of a versioned envelope from its prefix tag"""
+        prefix = text[:ENVELOPE_PREFIX_LENGTH]
+        for algorithm, tag in ENVELOPE_PREFIXES.items():
+            if prefix == tag:
+                return algorithm
+        return None
+    
+    def _encrypt_value(self, plaintext: str, key: bytes) -> str:
+        """Encrypt a non-empty string with the configured cipher"""
+        if ENCRYPTION_CIPHER not in ENVELOPE_PREFIXES:
+            return self._get_cipher(key).encrypt(plaintext.encode()).decode()
+        
+        nonce = os.urandom(AEAD_NONCE_BYTES)
+        sealed = self._get_cipher(key, ENCRYPTION_CIPHER).encrypt(nonce, plaintext.encode(), None)
+        payload = base64.urlsafe_b64encode(nonce + sealed).rstrip(b'=').decode()
+        return ENVELOPE_PREFIXES[ENCRYPTION_CIPHER] + payload
+    
+    def _decrypt_value(self, ciphertext: str, key: bytes) -> str:
+        """Decrypt an envelope or legacy Fernet token"""
+        algorithm = self._envelope_algorithm(ciphertext)
+        if algorithm is None:
+            return self._get_cipher(key).decrypt(ciphertext.encode()).decode()
+        
+        payload = ciphertext[ENVELOPE_PREFIX_LENGTH:]
+        raw = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+        cipher = self._get_cipher(key, algorithm)
+        return cipher.decrypt(raw[:AEAD_NONCE_BYTES], raw[AEAD_NONCE_BYTES:], None).decode()
     
     def generate_user_salt(self) -> bytes:
         """Generate unique salt for user encryption"""
@@ -35,7 +134,7 @@ class EncryptionManager:
         return base64.urlsafe_b64encode(key)
     
     def encrypt_data(self, plaintext: str, key: bytes) -> str:
-        """Encrypt string data using Fernet (AES 128)"""
+        """Encrypt string data using the configured cipher (AES-256-GCM by default)"""
         if not plaintext:
             return plaintext
         
@@ -44,16 +143,14 @@ class EncryptionManager:
             return plaintext
         
         try:
-            f = Fernet(key)
-            encrypted_bytes = f.encrypt(plaintext.encode())
-            return encrypted_bytes.decode()
+            return self._encrypt_value(plaintext, key)
         except Exception as e:
             self.logger.error(f"Encryption failed: {e}")
             # Return plaintext to avoid data loss
             return plaintext
     
     def decrypt_data(self, ciphertext: str, key: bytes) -> str:
-        """Decrypt string data using Fernet"""
+        """Decrypt string data (versioned envelope or legacy Fernet)"""
         if not ciphertext:
             return ciphertext
         
@@ -66,35 +163,69 @@ class EncryptionManager:
             if not self.is_encrypted(ciphertext):
                 return ciphertext
             
-            f = Fernet(key)
-            decrypted_bytes = f.decrypt(ciphertext.encode())
-            return decrypted_bytes.decode()
+            return self._decrypt_value(ciphertext, key)
         except Exception as e:
             self.logger.error(f"Decryption failed: {e}")
             # Return corrupted data marker for debugging
             return f"[CORRUPTED: {ciphertext[:20]}...]"
     
     def is_encrypted(self, text: str) -> bool:
-        """Check if text appears to be Fernet-encrypted"""
+        """Check if text appears to be encrypted (envelope or legacy Fernet)"""
         try:
             if not isinstance(text, str):
                 return False
             
-            # Fernet tokens are base64 and start with 'gAAAAA' (timestamp)
-            # and are typically much longer than normal text
-            return (text.startswith('gAAAAA') and 
-                    len(text) > 60 and 
-                    self._is_base64(text))
+            if self._envelope_algorithm(text) is not None:
+                return self._is_envelope(text)
+            
+            return self._is_fernet_token(text)
         except:
             return False
     
-    def _is_base64(self, text: str) -> bool:
-        """Check if text is valid base64"""
+    def _is_envelope(self, text: str) -> bool:
+        """Check the structure of a versioned envelope after its prefix tag.
+
+        The payload is unpadded urlsafe base64 of a 12-byte nonce, at least one
+        byte of ciphertext and a 16-byte tag, as _encrypt_value writes it: only
+        base64url characters, a length base64 can produce (not 1 mod 4), enough
+        bytes for nonce and tag, and zero bits after the last byte.
+        """
+        payload = text[ENVELOPE_PREFIX_LENGTH:]
+        remainder = len(payload) % 4
+        if len(text) < MIN_ENVELOPE_LENGTH or remainder == 1 or not ENVELOPE_PAYLOAD.fullmatch(payload):
+            return False
+        # The last character of a partial group carries 2 or 4 unused bits
+        if remainder:
+            return URLSAFE_BASE64_ALPHABET.index(payload[-1]) % (16 if remainder == 2 else 4) == 0
+        return True
+    
+    def _is_fernet_token(self, text: str) -> bool:
+        """Check the structure of a legacy Fernet token without decoding all of it.
+
+        A token is padded urlsafe base64 of version byte 0x80, an 8-byte
+        timestamp, a 16-byte IV, AES-CBC ciphertext (whole 16-byte blocks)
+        and a 32-byte HMAC. Only the length, the padding and the first
+        twelve characters (version and timestamp) are inspected.
+        """
+        # Fernet tokens start with 'gAAAAA' (version byte and high timestamp bytes)
+        length = len(text)
+        if not text.startswith('gAAAAA') or length % 4 or length < FERNET_MIN_LENGTH:
+            return False
+        
+        padding = 2 if text.endswith('==') else 1 if text.endswith('=') else 0
+        decoded_length = length // 4 * 3 - padding
+        if (decoded_length - FERNET_OVERHEAD_BYTES) % FERNET_BLOCK_BYTES:
+            return False
+        
         try:
-            base64.urlsafe_b64decode(text + '==')  # Add padding
-            return True
-        except:
+            header = base64.urlsafe_b64decode(text[:12])
+        except ValueError:
             return False
+        if len(header) != 9 or header[0] != 0x80:
+            return False
+        
+        timestamp = int.from_bytes(header[1:9], 'big')
+        return FERNET_MIN_TIMESTAMP <= timestamp <= time.time() + FERNET_MAX_CLOCK_SKEW
     
     def smart_decrypt(self, value: str, key: bytes) -> str:
         """Attempt to decrypt data, return as-is if not encrypted"""
@@ -105,6 +236,43 @@ class EncryptionManager:
             return self.decrypt_data(value, key)
         else:
             return value
+    
+    def encrypt_many(self, values: List[Optional[str]], key: bytes) -> List[Optional[str]]:
+        """Encrypt a batch of values with cached ciphers, keeping order; empty values pass through"""
+        if not key:
+            self.logger.warning("No encryption key provided, returning plaintext")
+            return list(values)
+        
+        result = []
+        for value in values:
+            if not value:
+                result.append(value)
+                continue
+            try:
+                result.append(self._encrypt_value(value, key))
+            except Exception as e:
+                self.logger.error(f"Encryption failed: {e}")
+                # Return plaintext to avoid data loss
+                result.append(value)
+        return result
+    
+    def decrypt_many(self, values: List[Optional[str]], key: bytes) -> List[Optional[str]]:
+        """Smart-decrypt a batch of values with cached ciphers, keeping order;
+        values that are not encrypted pass through"""
+        if not key:
+            return list(values)
+        
+        result = []
+        for value in values:
+            if not value or not self.is_encrypted(value):
+                result.append(value)
+                continue
+            try:
+                result.append(self._decrypt_value(value, key))
+            except Exception as e:
+                self.logger.error(f"Decryption failed: {e}")
+                result.append(f"[CORRUPTED: {value[:20]}...]")
+        return result
 
 
 # Global encryption manager instance
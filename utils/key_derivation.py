@@ -0,0 +1,121 @@
+"""
+Bounded worker pool for password-based key derivation and hashing
+
+PBKDF2 (and bcrypt) are deliberately slow. Running them on a small shared pool
+caps how many run at once per worker process, so a burst of logins queues up
+here instead of saturating every gunicorn thread, and the queue depth shows
+how far behind logins are.
+"""
+
+import os
+import bcrypt
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+from utils.encryption import encryption_manager
+
+# Derivations running at once, and logins allowed to wait behind them
+KEY_DERIVATION_WORKERS = int(os.environ.get('KEY_DERIVATION_WORKERS', 2))
+KEY_DERIVATION_MAX_QUEUE = int(os.environ.get('KEY_DERIVATION_MAX_QUEUE', 32))
+KEY_DERIVATION_TIMEOUT = float(os.environ.get('KEY_DERIVATION_TIMEOUT', 10))
+
+# Also run bcrypt password checks on the pool
+KEY_DERIVATION_POOL_BCRYPT = os.environ.get('KEY_DERIVATION_POOL_BCRYPT') == '1'
+
+
+class KeyDerivationBusy(Exception):
+    """Raised when the pool queue is full or a task waited too long"""
+
+
+class KeyDerivationPool:
+    """Runs slow password operations on a bounded thread pool"""
+
+    def __init__(self, max_workers: int = KEY_DERIVATION_WORKERS,
+                 max_queue: int = KEY_DERIVATION_MAX_QUEUE,
+                 timeout: float = KEY_DERIVATION_TIMEOUT):
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='keyderive')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def run(self, func: Callable, *args):
+        """Run func(*args) on the pool and wait for its result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise KeyDerivationBusy("Too many logins in progress")
+
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_seconds += started - submitted
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._run_seconds += time.perf_counter() - started
+                self._slots.release()
+
+        future = self._executor.submit(task)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # A task that never started gives its slot back here
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+                self._slots.release()
+            with self._lock:
+                self._rejected += 1
+            raise KeyDerivationBusy("Key derivation timed out")
+
+    def derive_key(self, password: str, salt: bytes) -> bytes:
+        """Derive a user's encryption key on the pool"""
+        return self.run(encryption_manager.derive_encryption_key, password, salt)
+
+    def check_password(self, password: str, password_hash: bytes) -> bool:
+        """Verify a bcrypt password hash, on the pool if configured"""
+        if not KEY_DERIVATION_POOL_BCRYPT:
+            return bcrypt.checkpw(password.encode(), password_hash)
+        return self.run(bcrypt.checkpw, password.encode(), password_hash)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get pool counters for monitoring"""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queue_depth': self._queued,
+                'max_queue_depth': self._max_queued,
+                'running': self._running,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': self._wait_seconds / completed * 1000,
+                'avg_run_ms': self._run_seconds / completed * 1000
+            }
+
+
+# Global key derivation pool instance
+key_derivation_pool = KeyDerivationPool()
@@ -3,6 +3,7 @@ Data migration system for encryption preference changes
 """
 
 from utils.encryption import encryption_manager
+from utils.bulk_crypto import bulk_crypto
 from utils.preferences import preference_manager
 from utils.field_registry import field_registry
 from database import get_db
@@ -72,170 +73,63 @@ class DataMigrator:
                 'modules_processed': 0
             }
     
-    def _re_encrypt_habits(self, user_id: int, encryption_key: bytes) -> int:
-        """Re-encrypt habits based on current preferences"""
+    def _re_encrypt_table(self, user_id: int, encryption_key: bytes, table: str, module: str,
+                          fields: List[str]) -> int:
+        """Re-encrypt a module's fields based on current preferences, in bulk"""
         with get_db() as conn:
-            habits = conn.execute("SELECT * FROM habits WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for habit in habits:
-                # Decrypt current data (might be plain or encrypted)
-                current_name = self._smart_decrypt(habit['name'], encryption_key)
-                current_desc = self._smart_decrypt(habit['description'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_name = self._encrypt_if_preferred(current_name, user_id, 'habits', 'name', encryption_key)
-                new_desc = self._encrypt_if_preferred(current_desc, user_id, 'habits', 'description', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE habits SET name = ?, description = ? WHERE id = ?
-                """, (new_name, new_desc, habit['id']))
-                records_updated += 1
+            rows = conn.execute(
+                f"SELECT id, {', '.join(fields)} FROM {table} WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            if not rows:
+                return 0
+            
+            # Decrypt current data (might be plain or encrypted), then re-encrypt
+            # the fields the user wants encrypted
+            columns = {field: self._is_preferred(user_id, module, field) for field in fields}
+            updated = bulk_crypto.re_encrypt_rows(rows, columns, encryption_key, module)
+            
+            # Update database
+            assignments = ', '.join(f"{field} = ?" for field in fields)
+            conn.executemany(
+                f"UPDATE {table} SET {assignments} WHERE id = ?",
+                [tuple(row[field] for field in fields) + (row['id'],) for row in updated]
+            )
             
             conn.commit()
-            return records_updated
+            return len(updated)
+    
+    def _re_encrypt_habits(self, user_id: int, encryption_key: bytes) -> int:
+        """Re-encrypt habits based on current preferences"""
+        return self._re_encrypt_table(user_id, encryption_key, 'habits', 'habits', ['name', 'description'])
     
     def _re_encrypt_notes(self, user_id: int, encryption_key: bytes) -> int:
         """Re-encrypt notes based on current preferences"""
-        with get_db() as conn:
-            notes = conn.execute("SELECT * FROM daily_notes WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for note in notes:
-                # Decrypt current data
-                current_content = self._smart_decrypt(note['content'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_content = self._encrypt_if_preferred(current_content, user_id, 'notes', 'content', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE daily_notes SET content = ? WHERE id = ?
-                """, (new_content, note['id']))
-                records_updated += 1
-            
-            conn.commit()
-            return records_updated
+        return self._re_encrypt_table(user_id, encryption_key, 'daily_notes', 'notes', ['content'])
     
     def _re_encrypt_todos(self, user_id: int, encryption_key: bytes) -> int:
         """Re-encrypt todos based on current preferences"""
-        with get_db() as conn:
-            todos = conn.execute("SELECT * FROM todos WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for todo in todos:
-                # Decrypt current data
-                current_title = self._smart_decrypt(todo['title'], encryption_key)
-                current_desc = self._smart_decrypt(todo['description'], encryption_key)
-                current_category = self._smart_decrypt(todo['category'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_title = self._encrypt_if_preferred(current_title, user_id, 'todos', 'title', encryption_key)
-                new_desc = self._encrypt_if_preferred(current_desc, user_id, 'todos', 'description', encryption_key)
-                new_category = self._encrypt_if_preferred(current_category, user_id, 'todos', 'category', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE todos SET title = ?, description = ?, category = ? WHERE id = ?
-                """, (new_title, new_desc, new_category, todo['id']))
-                records_updated += 1
-            
-            conn.commit()
-            return records_updated
+        return self._re_encrypt_table(user_id, encryption_key, 'todos', 'todos',
+                                      ['title', 'description', 'category'])
     
     def _re_encrypt_reading(self, user_id: int, encryption_key: bytes) -> int:
         """Re-encrypt reading list based on current preferences"""
-        with get_db() as conn:
-            books = conn.execute("SELECT * FROM reading_list WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for book in books:
-                # Decrypt current data
-                current_notes = self._smart_decrypt(book['notes'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_notes = self._encrypt_if_preferred(current_notes, user_id, 'reading', 'notes', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE reading_list SET notes = ? WHERE id = ?
-                """, (new_notes, book['id']))
-                records_updated += 1
-            
-            conn.commit()
-            return records_updated
+        return self._re_encrypt_table(user_id, encryption_key, 'reading_list', 'reading', ['notes'])
     
     def _re_encrypt_birthdays(self, user_id: int, encryption_key: bytes) -> int:
         """Re-encrypt birthdays based on current preferences"""
-        with get_db() as conn:
-            birthdays = conn.execute("SELECT * FROM birthdays WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for birthday in birthdays:
-                # Decrypt current data
-                current_name = self._smart_decrypt(birthday['name'], encryption_key)
-                current_notes = self._smart_decrypt(birthday['notes'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_name = self._encrypt_if_preferred(current_name, user_id, 'birthdays', 'name', encryption_key)
-                new_notes = self._encrypt_if_preferred(current_notes, user_id, 'birthdays', 'notes', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE birthdays SET name = ?, notes = ? WHERE id = ?
-                """, (new_name, new_notes, birthday['id']))
-                records_updated += 1
-            
-            conn.commit()
-            return records_updated
+        return self._re_encrypt_table(user_id, encryption_key, 'birthdays', 'birthdays', ['name', 'notes'])
     
     def _re_encrypt_watchlist(self, user_id: int, encryption_key: bytes) -> int:
         """Re-encrypt watchlist based on current preferences"""
-        with get_db() as conn:
-            items = conn.execute("SELECT * FROM watchlist WHERE user_id = ?", (user_id,)).fetchall()
-            records_updated = 0
-            
-            for item in items:
-                # Decrypt current data
-                current_notes = self._smart_decrypt(item['notes'], encryption_key)
-                
-                # Re-encrypt based on current preferences
-                new_notes = self._encrypt_if_preferred(current_notes, user_id, 'watchlist', 'notes', encryption_key)
-                
-                # Update database
-                conn.execute("""
-                    UPDATE watchlist SET notes = ? WHERE id = ?
-                """, (new_notes, item['id']))
-                records_updated += 1
-            
-            conn.commit()
-            return records_updated
+        return self._re_encrypt_table(user_id, encryption_key, 'watchlist', 'watchlist', ['notes'])
     
-    def _smart_decrypt(self, value: str, encryption_key: bytes) -> str:
-        """Attempt to decrypt data, return as-is if not encrypted"""
-        if not value:
-            return value or ''
-        
-        try:
-            return encryption_manager.smart_decrypt(value, encryption_key)
-        except Exception as e:
-            self.logger.warning(f"Failed to decrypt value: {e}")
-            return value
-    
-    def _encrypt_if_preferred(self, value: str, user_id: int, module: str, field: str, encryption_key: bytes) -> str:
-        """Encrypt value if user preference is set"""
-        if not value:
-            return value or ''
-        
+    def _is_preferred(self, user_id: int, module: str, field: str) -> bool:
+        """Check the user's preference for a field, leaving it plain on error"""
         try:
-            if preference_manager.should_encrypt_field(user_id, module, field):
-                return encryption_manager.encrypt_data(value, encryption_key)
-            else:
-                return value
+            return preference_manager.should_encrypt_field(user_id, module, field)
         except Exception as e:
             self.logger.error(f"Migration encryption failed for {module}.{field}: {e}")
-            return value
+            return False
     
     def migrate_on_password_change(self, user_id: int, old_password: str, new_password: str) -> Dict[str, any]:
         """Migrate user data when password changes"""
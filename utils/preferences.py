@@ -2,32 +2,133 @@
 User encryption preference management
 """
 
+import os
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional
-from database import get_db
+from flask import g, has_app_context
+from database import get_db, get_read_db
 from utils.field_registry import field_registry, EncryptableField
 import logging
 
+# Users whose preferences are kept in each worker's LRU cache
+PREFERENCE_CACHE_SIZE = int(os.environ.get('PREFERENCE_CACHE_SIZE', 1024))
+
 
 class PreferenceManager:
     """Manages user encryption preferences"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = PREFERENCE_CACHE_SIZE):
         self.logger = logging.getLogger(__name__)
+        
+        # user_id -> (preferences_version, preferences), least recently used first
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
     
     def get_user_preferences(self, user_id: int) -> Dict[str, bool]:
         """Get user's encryption preferences for all fields"""
+        return dict(self._get_cached_preferences(user_id))
+    
+    def _load_preferences(self, user_id: int) -> Optional[Dict[str, bool]]:
+        """Load user's encryption preferences, from the worker cache when its
+        version still matches users.preferences_version (None on error)"""
         try:
-            with get_db() as conn:
+            version = self._get_preferences_version(user_id)
+            
+            with self._cache_lock:
+                entry = self._cache.get(user_id)
+                if entry is not None and version is not None and entry[0] == version:
+                    self._cache.move_to_end(user_id)
+                    self._cache_hits += 1
+                    return entry[1]
+                self._cache_misses += 1
+            
+            # Version is read before the preferences, so a concurrent change can
+            # only leave an entry that looks outdated, never one that looks current
+            with get_read_db() as conn:
                 rows = conn.execute("""
                     SELECT field_name, encrypted 
                     FROM user_encryption_preferences 
                     WHERE user_id = ?
                 """, (user_id,)).fetchall()
                 
-                return {row['field_name']: bool(row['encrypted']) for row in rows}
+                prefs = {row['field_name']: bool(row['encrypted']) for row in rows}
+            
+            if version is not None:
+                with self._cache_lock:
+                    self._cache[user_id] = (version, prefs)
+                    self._cache.move_to_end(user_id)
+                    while len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+                        self._cache_evictions += 1
+            
+            return prefs
         except Exception as e:
             self.logger.error(f"Failed to get user preferences for user {user_id}: {e}")
-            return {}
+            return None
+    
+    def _get_preferences_version(self, user_id: int) -> Optional[int]:
+        """Get the user's preferences version, reusing one noted this request"""
+        if has_app_context():
+            noted = g.get('_preference_versions', {})
+            if user_id in noted:
+                return noted[user_id]
+        
+        with get_read_db() as conn:
+            row = conn.execute(
+                "SELECT preferences_version FROM users WHERE id = ?", (user_id,)
+            ).fetchone()
+            return row['preferences_version'] if row else None
+    
+    def note_preferences_version(self, user_id: int, version: Optional[int]):
+        """Remember a preferences version already loaded this request (e.g. with
+        the user row) so cache validation doesn't need its own query"""
+        if has_app_context() and version is not None:
+            g.setdefault('_preference_versions', {})[user_id] = version
+    
+    def _bump_version(self, conn, user_id: int):
+        """Mark the user's preferences as changed for every worker (caller commits)"""
+        conn.execute(
+            "UPDATE users SET preferences_version = COALESCE(preferences_version, 0) + 1 WHERE id = ?",
+            (user_id,)
+        )
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get preference cache counters for monitoring"""
+        with self._cache_lock:
+            return {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'evictions': self._cache_evictions,
+                'size': len(self._cache),
+                'max_size': self._cache_size
+            }
+    
+    def _get_cached_preferences(self, user_id: int) -> Dict[str, bool]:
+        """Get preferences loaded at most once per request (callers must not mutate)"""
+        if not has_app_context():
+            return self._load_preferences(user_id) or {}
+        
+        cache = g.setdefault('_encryption_preferences', {})
+        if user_id not in cache:
+            prefs = self._load_preferences(user_id)
+            if prefs is None:
+                return {}
+            cache[user_id] = prefs
+        return cache[user_id]
+    
+    def invalidate_user_preferences(self, user_id: int):
+        """Drop cached preferences after they change"""
+        if has_app_context():
+            g.get('_encryption_preferences', {}).pop(user_id, None)
+            g.get('_preference_versions', {}).pop(user_id, None)
+        
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
     
     def set_preference(self, user_id: int, field_name: str, encrypt: bool):
         """Set encryption preference for a specific field"""
@@ -38,16 +139,19 @@ class PreferenceManager:
                     (user_id, field_name, encrypted, updated_at)
                     VALUES (?, ?, ?, CURRENT_TIMESTAMP)
                 """, (user_id, field_name, encrypt))
+                self._bump_version(conn, user_id)
                 conn.commit()
                 
                 self.logger.info(f"Set encryption preference for user {user_id}, field {field_name}: {encrypt}")
         except Exception as e:
             self.logger.error(f"Failed to set preference for user {user_id}, field {field_name}: {e}")
+        finally:
+            self.invalidate_user_preferences(user_id)
     
     def should_encrypt_field(self, user_id: int, module: str, field_name: str) -> bool:
         """Check if a specific field should be encrypted for the user"""
         field_key = field_registry.get_field_key(module, field_name)
-        prefs = self.get_user_preferences(user_id)
+        prefs = self._get_cached_preferences(user_id)
         return prefs.get(field_key, False)
     
     def bulk_set_preferences(self, user_id: int, preferences: Dict[str, bool]):
@@ -65,10 +169,13 @@ class PreferenceManager:
                         VALUES (?, ?, ?, CURRENT_TIMESTAMP)
                     """, (user_id, field_name, encrypt))
                 
+                self._bump_version(conn, user_id)
                 conn.commit()
                 self.logger.info(f"Bulk updated {len(preferences)} preferences for user {user_id}")
         except Exception as e:
             self.logger.error(f"Failed to bulk set preferences for user {user_id}: {e}")
+        finally:
+            self.invalidate_user_preferences(user_id)
     
     def apply_smart_defaults(self, user_id: int):
         """Apply smart defaults for new fields based on user patterns"""
@@ -166,10 +273,13 @@ class PreferenceManager:
         try:
             with get_db() as conn:
                 conn.execute("DELETE FROM user_encryption_preferences WHERE user_id = ?", (user_id,))
+                self._bump_version(conn, user_id)
                 conn.commit()
                 self.logger.info(f"Deleted all encryption preferences for user {user_id}")
         except Exception as e:
             self.logger.error(f"Failed to delete preferences for user {user_id}: {e}")
+        finally:
+            self.invalidate_user_preferences(user_id)
     
     def migrate_preferences_on_field_changes(self, user_id: int, old_field_key: str, new_field_key: str):
         """Migrate preferences when field keys change (for app updates)"""
@@ -195,11 +305,14 @@ class PreferenceManager:
                         WHERE user_id = ? AND field_name = ?
                     """, (user_id, old_field_key))
                     
+                    self._bump_version(conn, user_id)
                     conn.commit()
                     self.logger.info(f"Migrated preference from {old_field_key} to {new_field_key} for user {user_id}")
                     
         except Exception as e:
             self.logger.error(f"Failed to migrate preference for user {user_id}: {e}")
+        finally:
+            self.invalidate_user_preferences(user_id)
 
 
 # Global preference manager instance
@@ -0,0 +1,229 @@
+"""
+Opt-in per-request SQL profiler
+
+A sampled request gets a RequestProfile on flask.g. get_db and get_read_db
+hand out connections wrapped by it, so every statement the request runs is
+timed and its rows counted. Identical statements run more often than
+SQL_PROFILE_REPEAT_THRESHOLD times in one request (a query per habit, per
+field, per module) are flagged as N+1 candidates, and per-endpoint totals are
+kept for the stats endpoint and logged as JSON every SQL_PROFILE_LOG_INTERVAL
+seconds. Requests that are not sampled only pay for one random() call.
+
+Writes applied by the single-writer queue run on the writer thread and are
+not attributed to the request.
+"""
+
+import os
+import json
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from flask import g, request
+
+# Fraction of requests profiled (0 disables the profiler, 1 profiles every request)
+SQL_PROFILE_SAMPLE_RATE = float(os.environ.get('SQL_PROFILE_SAMPLE_RATE', 0))
+
+# Identical statements run more than this many times in one request are flagged
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILE_REPEAT_THRESHOLD', 5))
+
+# Requests that match no route (404s, scanners) share one key so the totals stay bounded
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+# Seconds between sql_profile_summary log lines (0 disables them)
+SQL_PROFILE_LOG_INTERVAL = float(os.environ.get('SQL_PROFILE_LOG_INTERVAL', 300))
+
+
+def _normalize(sql: str) -> str:
+    """Collapse whitespace so a statement fits on one log line"""
+    return ' '.join(sql.split())
+
+
+class RequestProfile:
+    """Statements run by one request, keyed by SQL text: [count, ms, rows]"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements: Dict[str, list] = {}
+
+    def record(self, sql: str, ms: float, rows: int):
+        entry = self.statements.get(sql)
+        if entry is None:
+            self.statements[sql] = [1, ms, rows]
+        else:
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] += rows
+
+    def add_fetch(self, sql: str, ms: float, rows: int):
+        """Add time and rows of a fetch to a statement already recorded"""
+        entry = self.statements[sql]
+        entry[1] += ms
+        entry[2] += rows
+
+    def wrap(self, conn):
+        """Connection proxy that records into this profile"""
+        return _ProfilingConnection(conn, self)
+
+
+class _ProfilingCursor:
+    """Cursor proxy that adds fetched rows (and fetch time) to its statement"""
+
+    def __init__(self, cursor, sql, profile):
+        self._cursor = cursor
+        self._sql = sql
+        self._profile = profile
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        rows = len(result) if isinstance(result, list) else int(result is not None)
+        self._profile.add_fetch(self._sql, (time.perf_counter() - started) * 1000, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _ProfilingConnection:
+    """Connection proxy that times execute() and executemany()"""
+
+    def __init__(self, conn, profile):
+        self._conn = conn
+        self._profile = profile
+
+    def _run(self, method, sql, *args):
+        started = time.perf_counter()
+        cursor = getattr(self._conn, method)(sql, *args)
+        self._profile.record(sql, (time.perf_counter() - started) * 1000, max(cursor.rowcount, 0))
+        return _ProfilingCursor(cursor, sql, self._profile)
+
+    def execute(self, sql, *args):
+        return self._run('execute', sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._run('executemany', sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLProfiler:
+    """Samples requests, flags repeated statements and keeps per-endpoint totals"""
+
+    def __init__(self, sample_rate: float = SQL_PROFILE_SAMPLE_RATE,
+                 repeat_threshold: int = SQL_PROFILE_REPEAT_THRESHOLD,
+                 log_interval: float = SQL_PROFILE_LOG_INTERVAL):
+        self.logger = logging.getLogger(__name__)
+        self.sample_rate = sample_rate
+        self.repeat_threshold = repeat_threshold
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict] = {}
+        self._last_log = time.monotonic()
+
+    def init_app(self, app):
+        """Profile a sample of the app's requests (nothing is registered when disabled)"""
+        if self.sample_rate <= 0:
+            return
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+    def _start(self):
+        if random.random() < self.sample_rate:
+            g._sql_profile = RequestProfile()
+
+    def _finish(self, exc):
+        profile: Optional[RequestProfile] = g.pop('_sql_profile', None)
+        if profile is not None:
+            self.finish(request.endpoint or UNMATCHED_ENDPOINT, profile)
+
+    def finish(self, endpoint: str, profile: RequestProfile):
+        """Fold a finished request into its endpoint's totals and log repeats"""
+        request_ms = (time.perf_counter() - profile.started) * 1000
+        statements = sum(entry[0] for entry in profile.statements.values())
+        sql_ms = sum(entry[1] for entry in profile.statements.values())
+        rows = sum(entry[2] for entry in profile.statements.values())
+        repeated = sorted(
+            ((_normalize(sql), count, ms) for sql, (count, ms, _) in profile.statements.items()
+             if count > self.repeat_threshold),
+            key=lambda item: -item[1]
+        )
+
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'statements': 0, 'max_statements': 0, 'sql_ms': 0.0,
+                'request_ms': 0.0, 'rows': 0, 'n_plus_one_requests': 0, 'repeated': {}
+            })
+            totals['requests'] += 1
+            totals['statements'] += statements
+            totals['max_statements'] = max(totals['max_statements'], statements)
+            totals['sql_ms'] += sql_ms
+            totals['request_ms'] += request_ms
+            totals['rows'] += rows
+            if repeated:
+                totals['n_plus_one_requests'] += 1
+                for sql, count, _ in repeated:
+                    totals['repeated'][sql] = max(totals['repeated'].get(sql, 0), count)
+
+        if repeated:
+            self._log('sql_n_plus_one', {
+                'endpoint': endpoint,
+                'statements': statements,
+                'sql_ms': round(sql_ms, 3),
+                'request_ms': round(request_ms, 3),
+                'repeated': [{'sql': sql, 'count': count, 'ms': round(ms, 3)} for sql, count, ms in repeated]
+            }, logging.WARNING)
+        self._maybe_log_summary()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per-endpoint averages and the statements flagged as repeated"""
+        with self._lock:
+            stats = {}
+            for endpoint, totals in self._endpoints.items():
+                requests = totals['requests']
+                stats[endpoint] = {
+                    'requests': requests,
+                    'avg_statements': totals['statements'] / requests,
+                    'max_statements': totals['max_statements'],
+                    'avg_sql_ms': totals['sql_ms'] / requests,
+                    'avg_request_ms': totals['request_ms'] / requests,
+                    'avg_rows': totals['rows'] / requests,
+                    'sql_share': totals['sql_ms'] / totals['request_ms'] if totals['request_ms'] else 0.0,
+                    'n_plus_one_requests': totals['n_plus_one_requests'],
+                    'repeated': dict(totals['repeated'])
+                }
+            return {'sample_rate': self.sample_rate, 'repeat_threshold': self.repeat_threshold,
+                    'endpoints': stats}
+
+    def _maybe_log_summary(self):
+        """Log one sql_profile_summary line per endpoint every log_interval seconds"""
+        if self.log_interval <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < self.log_interval:
+                return
+            self._last_log = now
+        for endpoint, stats in self.get_stats()['endpoints'].items():
+            self._log('sql_profile_summary', dict(stats, endpoint=endpoint))
+
+    def _log(self, event: str, fields: Dict, level=logging.INFO):
+        self.logger.log(level, json.dumps(dict({'event': event}, **fields)))
+
+
+# Global SQL profiler instance
+sql_profiler = SQLProfiler()